@@ -1,30 +1,217 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, g, has_app_context
 from flask_cors import CORS
 import xml.etree.ElementTree as ET
-from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, DetalleFactura
+from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, DetalleFactura, AlmacenConsumos
+from models.facturacion import MOTORES_FACTURACION
 from utils.validators import Validador
 from utils.xml_manager import XMLManager
+from utils.sqlite_manager import SQLiteManager
 from utils.pdf_generator import PDFGenerator
+from utils.journal_manager import JournalManager
+from utils.escritor_persistencia import EscritorPersistencia
+from utils.configuracion_loader import CargaConfiguracion
+from utils.consumo_stream import LectorLimitado, TamanoExcedidoError, iterar_consumos
+from utils.bloqueo_archivo import BloqueoArchivo
+from utils.analisis import COLECCIONES_ANALISIS, obtener_datos_analisis
+from utils.cache_http import CacheHTTP
+from utils.bloqueo_lectura_escritura import BloqueoLecturaEscritura
+from utils.sincronizacion_procesos import SincronizadorProcesos
+import config
+import atexit
 import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
+from functools import wraps
 
 app = Flask(__name__)
 CORS(app)
 
-# Inicializar el sistema global con persistencia
-xml_manager = XMLManager()
-sistema = xml_manager.cargar_sistema()
-pdf_generator = PDFGenerator()
+# El servidor es el único escritor del directorio de datos mientras está en
+# ejecución; la línea de comandos (run_cli.py) toma el mismo bloqueo. El proceso
+# vigilante del recargador de Flask no lo toma, solo el que atiende peticiones.
+# Con varios procesos (MULTIPROCESO, ver gunicorn.conf.py) el bloqueo se toma en
+# cada escritura y los procesos se sincronizan con el sello de versión de los datos.
+if config.MULTIPROCESO and (config.ALMACENAMIENTO != 'xml' or config.JOURNAL_HABILITADO or config.PERSISTENCIA_ASINCRONA):
+    raise RuntimeError(
+        "El modo multiproceso requiere ALMACENAMIENTO=xml sin journal ni persistencia asíncrona "
+        "(cada escritura debe quedar guardada antes de soltar el bloqueo)"
+    )
+
+# Los procesos de la facturación en paralelo se crean con 'spawn', que vuelve a
+# importar el módulo principal como __mp_main__ (con `python app.py`). Esos
+# procesos solo ejecutan models.facturacion: no toman el bloqueo, no abren el
+# almacenamiento ni cargan los datos.
+PROCESO_AUXILIAR = __name__ == '__mp_main__'
+bloqueo_datos = BloqueoArchivo(config.DATABASE_PATH)
+if not config.MULTIPROCESO and not PROCESO_AUXILIAR and (__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    bloqueo_datos.adquirir()
+    atexit.register(bloqueo_datos.liberar)
 
-def guardar_sistema():
-    """Guarda el estado del sistema en XML"""
-    xml_manager.guardar_sistema(sistema)
+# Inicializar el sistema global con persistencia
+almacenamiento = None
+journal_manager = None
+if PROCESO_AUXILIAR:
+    sistema = Sistema()
+else:
+    if config.ALMACENAMIENTO == 'sqlite':
+        almacenamiento = SQLiteManager(config.DATABASE_PATH, politica_fsync=config.FSYNC_POLITICA)
+    else:
+        almacenamiento = XMLManager(
+            config.DATABASE_PATH,
+            politica_fsync=config.FSYNC_POLITICA,
+            intervalo_fsync=config.FSYNC_INTERVALO_MS / 1000.0
+        )
+    if config.JOURNAL_HABILITADO:
+        journal_manager = JournalManager(almacenamiento, max_bytes=config.JOURNAL_MAX_BYTES, fsync=config.JOURNAL_FSYNC)
+        sistema = journal_manager.cargar_sistema()
+    else:
+        sistema = almacenamiento.cargar_sistema()
+sistema.cache_json.habilitado = config.CACHE_JSON_HABILITADO
+if hasattr(os, 'register_at_fork'):
+    # Los trabajadores de gunicorn (preload_app) heredan este sistema: cada uno etiqueta
+    # con su propio origen lo que todavía no guardó
+    os.register_at_fork(after_in_child=lambda: sistema.renovar_origen())
+pdf_generator = PDFGenerator(cache_max_bytes=config.REPORTES_CACHE_MAX_BYTES)
+
+# Acceso concurrente al sistema: los GET leen con el bloqueo compartido y las
+# mutaciones con el exclusivo. Los guardados se hacen después de soltar el
+# exclusivo, bajo el compartido (el estado no cambia mientras se escribe, pero
+# las lecturas siguen), y _bloqueo_guardado los ordena entre sí. Orden de
+# adquisición: _bloqueo_guardado antes que bloqueo_sistema, nunca al revés.
+bloqueo_sistema = BloqueoLecturaEscritura()
+_bloqueo_guardado = threading.Lock()
+sincronizador = SincronizadorProcesos(almacenamiento, config.DATABASE_PATH) if config.MULTIPROCESO and not PROCESO_AUXILIAR else None
+
+# ETag / Last-Modified de los GET a partir de las versiones de las colecciones
+cache_http = CacheHTTP(lambda: sistema, max_age_facturas=config.CACHE_FACTURAS_MAX_AGE)
+
+# Escritor en segundo plano (solo para el modo snapshot sin journal)
+escritor = None
+if config.PERSISTENCIA_ASINCRONA and not journal_manager and not PROCESO_AUXILIAR:
+    escritor = EscritorPersistencia(
+        almacenamiento, lambda: sistema, intervalo_ms=config.ESCRITOR_INTERVALO_MS, bloqueo=bloqueo_sistema.lectura
+    )
+    escritor.iniciar()
+    atexit.register(escritor.detener)
+
+def guardar_sistema(esperar: bool = False):
+    """Guarda el estado del sistema en el almacenamiento o, en modo journal, agrega los cambios al journal.
+    
+    Con el escritor en segundo plano solo marca el sistema como pendiente; con
+    esperar=True no retorna hasta que el siguiente commit quede escrito. Dentro
+    de una vista @modifica_sistema solo anota el guardado, que se hace al
+    soltar el bloqueo exclusivo.
+    """
+    if has_app_context() and 'guardado_pendiente' in g:
+        g.guardado_pendiente = g.guardado_pendiente or esperar
+        return
+    
+    if escritor:
+        generacion = escritor.marcar_pendiente()
+        if esperar and not escritor.esperar_commit(generacion):
+            raise IOError("Tiempo de espera agotado guardando el sistema")
+        return
+    
+    with _bloqueo_guardado, bloqueo_sistema.lectura():
+        if journal_manager:
+            journal_manager.registrar(sistema)
+        else:
+            almacenamiento.guardar_sistema(sistema)
+
+@contextmanager
+def lectura_sistema():
+    """Bloqueo compartido del sistema; en modo multiproceso antes recarga lo que otros procesos guardaron"""
+    if sincronizador and sincronizador.hay_version_nueva(sistema):
+        with sincronizador.escritura(), bloqueo_sistema.escritura():
+            sincronizador.recargar(sistema)
+    with bloqueo_sistema.lectura():
+        yield
+
+@contextmanager
+def escritura_sistema():
+    """Bloqueo exclusivo del sistema; en modo multiproceso antes recarga lo que otros procesos guardaron.
+    
+    En modo multiproceso debe usarse dentro de escritor_procesos() para que nadie más
+    guarde entre la recarga y el guardado de este cambio.
+    """
+    with bloqueo_sistema.escritura():
+        if sincronizador:
+            sincronizador.recargar(sistema)
+        yield
+
+def escritor_procesos():
+    """Bloqueo del directorio de datos entre procesos (solo en modo multiproceso)"""
+    return sincronizador.escritura() if sincronizador else nullcontext()
+
+def lee_sistema(vista):
+    """Ejecuta la vista con el bloqueo compartido del sistema"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        with lectura_sistema():
+            return vista(*args, **kwargs)
+    return envoltura
+
+def modifica_sistema(vista):
+    """Ejecuta la vista con el bloqueo exclusivo del sistema y guarda después de soltarlo"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        with escritor_procesos():
+            g.guardado_pendiente = None
+            try:
+                with escritura_sistema():
+                    respuesta = vista(*args, **kwargs)
+            finally:
+                esperar = g.pop('guardado_pendiente')
+            
+            if esperar is not None:
+                try:
+                    guardar_sistema(esperar)
+                except Exception as e:
+                    return jsonify({"error": f"Error guardando el sistema: {str(e)}"}), 500
+            return respuesta
+    return envoltura
+
+def _parametro_lista(nombre: str, tipo=str):
+    """Lee un parámetro de consulta con varios valores (?nit=a,b,c o ?nit=a&nit=b)"""
+    valores = []
+    for valor in request.args.getlist(nombre):
+        valores.extend(v.strip() for v in valor.split(',') if v.strip())
+    return [tipo(v) for v in valores] if valores else None
+
+def _parametros_pagina(tipo_cursor=str):
+    """Lee cursor y límite de la consulta; el límite se acota a PAGINA_LIMITE_MAXIMO"""
+    limite = int(request.args.get('limit', config.PAGINA_LIMITE))
+    limite = max(1, min(limite, config.PAGINA_LIMITE_MAXIMO))
+    cursor = request.args.get('cursor')
+    return (tipo_cursor(cursor) if cursor else None), limite
+
+def _fragmento(tipo: str, clave, entidad, serializar):
+    """Texto JSON de una entidad, tomado de la caché de serialización del sistema"""
+    return sistema.cache_json.obtener(tipo, clave, entidad, lambda: app.json.dumps(serializar(entidad)))
+
+def _respuesta_lista(fragmentos):
+    """Respuesta JSON de una lista armada con fragmentos ya serializados"""
+    return app.response_class('[' + ','.join(fragmentos) + ']', mimetype='application/json')
+
+def _respuesta_pagina(pagina, limite, fragmento):
+    """Respuesta JSON de un listado paginado; fragmento(elemento) devuelve el texto JSON de cada elemento"""
+    dumps = app.json.dumps
+    cuerpo = (
+        '{"items":[' + ','.join(fragmento(elemento) for elemento in pagina.elementos) + ']'
+        + ',"limit":' + dumps(limite)
+        + ',"next_cursor":' + dumps(pagina.siguiente_cursor)
+        + ',"total":' + dumps(pagina.total) + '}'
+    )
+    return app.response_class(cuerpo, mimetype='application/json')
 
 @app.route('/')
 def home():
     return jsonify({"message": "API de Tecnologías Chapinas, S.A."})
 
 @app.route('/api/configuracion', methods=['POST'])
+@modifica_sistema
 def procesar_configuracion():
     """Procesa mensaje XML de configuración"""
     try:
@@ -36,179 +223,23 @@ def procesar_configuracion():
         # Procesar el XML
         root = ET.fromstring(xml_data)
         
-        # Contadores para respuesta
-        recursos_creados = 0
-        categorias_creadas = 0
-        clientes_creados = 0
-        instancias_creadas = 0
-        
-        # Procesar recursos
-        lista_recursos = root.find('.//listaRecursos')
-        if lista_recursos is not None:
-            for recurso_elem in lista_recursos.findall('recurso'):
-                recurso_id = int(recurso_elem.get('id'))
-                
-                # Verificar si el recurso ya existe
-                if sistema.obtener_recurso_por_id(recurso_id) is None:
-                    tipo = recurso_elem.find('tipo').text.strip()
-                    tipo_normalizado = Validador.normalizar_tipo_recurso(tipo)
-                    if not Validador.validar_tipo_recurso(tipo):
-                        return jsonify({"error": f"Tipo de recurso inválido: {tipo}"}), 400
-                    
-                    recurso = Recurso(
-                        id=recurso_id,
-                        nombre=recurso_elem.find('nombre').text.strip(),
-                        abreviatura=recurso_elem.find('abreviatura').text.strip(),
-                        metrica=recurso_elem.find('metrica').text.strip(),
-                        tipo=tipo_normalizado,
-                        valor_x_hora=float(recurso_elem.find('valorXhora').text)
-                    )
-                    sistema.agregar_recurso(recurso)
-                    recursos_creados += 1
-        
-        # Procesar categorías
-        lista_categorias = root.find('.//listaCategoria')
-        if lista_categorias is None:
-            lista_categorias = root.find('.//listaCategorias')
-            
-        if lista_categorias is not None:
-            for categoria_elem in lista_categorias.findall('categoria'):
-                categoria_id = int(categoria_elem.get('id'))
-                
-                if sistema.obtener_categoria_por_id(categoria_id) is None:
-                    # Manejar diferentes nombres de tags
-                    nombre_elem = categoria_elem.find('nombre')
-                    descripcion_elem = categoria_elem.find('description')
-                    if descripcion_elem is None:
-                        descripcion_elem = categoria_elem.find('descripcion')
-                    carga_trabajo_elem = categoria_elem.find('cargaTrabajo')
-                    
-                    categoria = Categoria(
-                        id=categoria_id,
-                        nombre=nombre_elem.text.strip() if nombre_elem is not None else "",
-                        descripcion=descripcion_elem.text.strip() if descripcion_elem is not None else "",
-                        carga_trabajo=carga_trabajo_elem.text.strip() if carga_trabajo_elem is not None else ""
-                    )
-                    
-                    # Procesar configuraciones de la categoría
-                    lista_configs = categoria_elem.find('.//listaConfigurationes')
-                    if lista_configs is None:
-                        lista_configs = categoria_elem.find('.//listaConfiguraciones')
-                        
-                    if lista_configs is not None:
-                        for config_elem in lista_configs.findall('configuration'):
-                            config_id = int(config_elem.get('id'))
-                            
-                            # Manejar diferentes nombres de tags
-                            config_nombre_elem = config_elem.find('nombre')
-                            config_descripcion_elem = config_elem.find('description')
-                            if config_descripcion_elem is None:
-                                config_descripcion_elem = config_elem.find('descripcion')
-                            
-                            configuracion = Configuracion(
-                                id=config_id,
-                                nombre=config_nombre_elem.text.strip() if config_nombre_elem is not None else "",
-                                descripcion=config_descripcion_elem.text.strip() if config_descripcion_elem is not None else ""
-                            )
-                            
-                            # Procesar recursos de la configuración
-                            recursos_config = config_elem.find('.//recurso%Configuration')
-                            if recursos_config is None:
-                                recursos_config = config_elem.find('.//recursosConfiguracion')
-                                
-                            if recursos_config is not None:
-                                for recurso_config in recursos_config.findall('recurso'):
-                                    recurso_id_config = int(recurso_config.get('id'))
-                                    cantidad = float(recurso_config.text)
-                                    configuracion.agregar_recurso(recurso_id_config, cantidad)
-                            
-                            categoria.agregar_configuracion(configuracion)
-                    
-                    sistema.agregar_categoria(categoria)
-                    categorias_creadas += 1
-        
-        # Procesar clientes
-        lista_clientes = root.find('.//listaClientes')
-        if lista_clientes is not None:
-            for cliente_elem in lista_clientes.findall('cliente'):
-                # Manejar diferentes nombres de atributos
-                nit = cliente_elem.get('nlt')
-                if nit is None:
-                    nit = cliente_elem.get('nit')
-                
-                # Validar NIT
-                if not Validador.validar_nit(nit):
-                    return jsonify({"error": f"NIT inválido: {nit}"}), 400
-                
-                if sistema.obtener_cliente_por_nit(nit) is None:
-                    cliente = Cliente(
-                        nit=nit,
-                        nombre=cliente_elem.find('nombre').text.strip(),
-                        usuario=cliente_elem.find('usuario').text.strip(),
-                        clave=cliente_elem.find('clave').text.strip(),
-                        direccion=cliente_elem.find('direccion').text.strip(),
-                        correo_electronico=cliente_elem.find('correoElectronico').text.strip()
-                    )
-                    
-                    # Procesar instancias del cliente
-                    lista_instancias = cliente_elem.find('.//listaInstancia')
-                    if lista_instancias is None:
-                        lista_instancias = cliente_elem.find('.//listaInstancias')
-                        
-                    if lista_instancias is not None:
-                        for instancia_elem in lista_instancias.findall('instancia'):
-                            instancia_id = int(instancia_elem.get('id'))
-                            
-                            # Extraer fecha de inicio
-                            fecha_inicio_texto = instancia_elem.find('fechaInicio').text
-                            fecha_inicio = Validador.extraer_fecha(fecha_inicio_texto)
-                            if not fecha_inicio:
-                                return jsonify({"error": f"Fecha de inicio inválida: {fecha_inicio_texto}"}), 400
-                            
-                            estado = instancia_elem.find('estado').text.strip()
-                            estado_normalizado = Validador.normalizar_estado_instancia(estado)
-                            if not Validador.validar_estado_instancia(estado):
-                                return jsonify({"error": f"Estado de instancia inválido: {estado}"}), 400
-                            
-                            # Manejar diferentes nombres de tags
-                            id_configuracion_elem = instancia_elem.find('idConfiguration')
-                            if id_configuracion_elem is None:
-                                id_configuracion_elem = instancia_elem.find('idConfiguracion')
-                            
-                            instancia = Instancia(
-                                id=instancia_id,
-                                id_configuracion=int(id_configuracion_elem.text),
-                                nombre=instancia_elem.find('nombre').text.strip(),
-                                fecha_inicio=fecha_inicio,
-                                estado=estado_normalizado
-                            )
-                            
-                            # Si tiene fecha final, extraerla
-                            fecha_final_elem = instancia_elem.find('fechaFinal')
-                            if fecha_final_elem is not None and fecha_final_elem.text:
-                                fecha_final = Validador.extraer_fecha(fecha_final_elem.text)
-                                if fecha_final:
-                                    instancia.fecha_final = fecha_final
-                            
-                            cliente.agregar_instancia(instancia)
-                            instancias_creadas += 1
-                    
-                    sistema.agregar_cliente(cliente)
-                    clientes_creados += 1
-        
-        # Guardar cambios en XML
+        # Fase 1: validar el mensaje completo sin modificar el sistema
+        carga = CargaConfiguracion(sistema)
+        if not carga.preparar(root):
+            return jsonify({
+                "error": f"Se encontraron {len(carga.errores)} errores en la configuración",
+                "errores": carga.errores
+            }), 400
+        
+        # Fase 2: aplicar todo y guardar una sola vez
+        carga.aplicar()
         guardar_sistema()
         
         return jsonify({
             "mensaje": "Configuración procesada exitosamente",
-            "detalle": {
-                "recursos_creados": recursos_creados,
-                "categorias_creadas": categorias_creadas,
-                "clientes_creados": clientes_creados,
-                "instancias_creadas": instancias_creadas
-            }
+            "detalle": carga.resumen()
         }), 200
-        
+    
     except ET.ParseError as e:
         return jsonify({"error": f"Error parsing XML: {str(e)}"}), 400
     except Exception as e:
@@ -216,92 +247,212 @@ def procesar_configuracion():
 
 @app.route('/api/consumo', methods=['POST'])
 def procesar_consumo():
-    """Procesa mensaje XML de consumo"""
+    """Procesa mensaje XML de consumo leyendo el cuerpo de forma incremental"""
     try:
-        xml_data = request.data.decode('utf-8')
-        root = ET.fromstring(xml_data)
-        
-        consumos_procesados = 0
-        
-        for consumo_elem in root.findall('.//consumo'):
-            # Manejar diferentes nombres de atributos
-            nit_cliente = consumo_elem.get('nicClientes')
-            if nit_cliente is None:
-                nit_cliente = consumo_elem.get('nitCliente')
-                
-            id_instancia = int(consumo_elem.get('idInstanceia'))
-            if id_instancia is None:
-                id_instancia = int(consumo_elem.get('idInstancia'))
-                
-            tiempo = float(consumo_elem.find('tiempo').text)
-            
-            # Manejar diferentes nombres de tags
-            fechahora_elem = consumo_elem.find('fechahora')
-            if fechahora_elem is None:
-                fechahora_elem = consumo_elem.find('fechaHora')
-            fechahora_texto = fechahora_elem.text.strip()
+        if request.content_length is not None and request.content_length > config.CONSUMO_MAX_BYTES:
+            return jsonify({"error": f"El mensaje supera el máximo de {config.CONSUMO_MAX_BYTES} bytes"}), 413
+        
+        lector = LectorLimitado(request.stream, config.CONSUMO_MAX_BYTES)
+        inicio = time.perf_counter()
+        
+        # Leer el mensaje por lotes y validar sus fechas antes de tomar ningún bloqueo. Cada
+        # lote pasa a un almacén columnar temporal, así que solo un lote vive como tuplas
+        recibidos = AlmacenConsumos()
+        instancias = {}  # (nit, id_instancia) distintos del mensaje, en orden de aparición
+        lote = []
+        for consumo_datos in iterar_consumos(lector):
+            lote.append(consumo_datos)
+            if len(lote) >= config.CONSUMO_TAMANO_LOTE:
+                error = _preparar_lote_consumos(lote, recibidos, instancias)
+                if error:
+                    return error
+                lote = []
+        if lote:
+            error = _preparar_lote_consumos(lote, recibidos, instancias)
+            if error:
+                return error
+        consumos_procesados = len(recibidos)
+        segundos = time.perf_counter() - inicio
+        
+        # Aplicar el mensaje en un solo paso: si un consumo es inválido no se agrega ninguno
+        with escritor_procesos():
+            with escritura_sistema():
+                error = _aplicar_consumos(recibidos, instancias)
+            if error:
+                return error
             
-            # Extraer fecha y hora
-            fechahora = Validador.extraer_fecha_hora(fechahora_texto)
-            if not fechahora:
-                return jsonify({"error": f"Fecha/hora inválida: {fechahora_texto}"}), 400
-
-            # Verificar que el cliente existe
-            cliente = sistema.obtener_cliente_por_nit(nit_cliente)
-            if not cliente:
-                return jsonify({"error": f"Cliente con NIT {nit_cliente} no encontrado"}), 404
-
-            # Verificar que la instancia existe y pertenece al cliente
-            instancia = cliente.obtener_instancia_por_id(id_instancia)
-            if not instancia:
-                return jsonify({"error": f"Instancia {id_instancia} no encontrada para el cliente {nit_cliente}"}), 404
-
-            # Crear consumo con ID único
-            consumo = Consumo(
-                id=sistema.generar_id_consumo(),
-                nit_cliente=nit_cliente,
-                id_instancia=id_instancia,
-                tiempo=tiempo,
-                fechahora=fechahora,
-                facturado=False
-            )
-            sistema.agregar_consumo(consumo)
-            consumos_procesados += 1
-        
-        # Guardar cambios en XML
-        guardar_sistema()
+            # Guardar cambios en XML
+            guardar_sistema()
         
         return jsonify({
             "mensaje": "Consumo procesado exitosamente",
-            "consumos_procesados": consumos_procesados
+            "consumos_procesados": consumos_procesados,
+            "tasa_parseo": {
+                "segundos": round(segundos, 6),
+                "bytes_leidos": lector.bytes_leidos,
+                "consumos_por_segundo": round(consumos_procesados / segundos, 2) if segundos > 0 else None,
+                "bytes_por_segundo": round(lector.bytes_leidos / segundos, 2) if segundos > 0 else None
+            }
         }), 200
-        
+    
+    except TamanoExcedidoError as e:
+        return jsonify({"error": str(e)}), 413
+    except ET.ParseError as e:
+        return jsonify({"error": f"Error parsing XML: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": f"Error procesando consumo: {str(e)}"}), 500
 
+def _preparar_lote_consumos(lote, recibidos, instancias):
+    """Valida las fechas de un lote leído y lo agrega al almacén temporal; devuelve la respuesta de error si alguna es inválida"""
+    for nit_cliente, id_instancia, tiempo, fechahora_texto in lote:
+        fechahora = Validador.extraer_fecha_hora(fechahora_texto)
+        if not fechahora:
+            return jsonify({"error": f"Fecha/hora inválida: {fechahora_texto}"}), 400
+        recibidos.agregar(len(recibidos), nit_cliente, id_instancia, tiempo, fechahora)
+        instancias[(nit_cliente, id_instancia)] = None
+    return None
+
+def _aplicar_consumos(recibidos, instancias):
+    """Agrega al sistema los consumos del almacén temporal; devuelve la respuesta de error sin agregar nada si alguno es inválido"""
+    for nit_cliente, id_instancia in instancias:
+        # Verificar que el cliente existe
+        cliente = sistema.obtener_cliente_por_nit(nit_cliente)
+        if not cliente:
+            return jsonify({"error": f"Cliente con NIT {nit_cliente} no encontrado"}), 404
+        
+        # Verificar que la instancia existe y pertenece al cliente
+        if not cliente.obtener_instancia_por_id(id_instancia):
+            return jsonify({"error": f"Instancia {id_instancia} no encontrada para el cliente {nit_cliente}"}), 404
+    
+    for consumo_recibido in recibidos:
+        # Crear consumo con ID único
+        consumo = Consumo(
+            id=sistema.generar_id_consumo(),
+            nit_cliente=consumo_recibido.nit_cliente,
+            id_instancia=consumo_recibido.id_instancia,
+            tiempo=consumo_recibido.tiempo,
+            fechahora=consumo_recibido.fechahora,
+            facturado=False
+        )
+        sistema.agregar_consumo(consumo)
+    return None
+
 # ... (los demás endpoints se mantienen igual que en la versión anterior)
 
 @app.route('/api/reset', methods=['POST'])
+@modifica_sistema
 def resetear_sistema():
     """Resetea todos los datos del sistema"""
     global sistema
+    anterior = sistema
     sistema = Sistema()
-    guardar_sistema()
+    sistema.cache_json.habilitado = config.CACHE_JSON_HABILITADO
+    # El sello de versión continúa para que los demás procesos vean el reset como una versión nueva
+    sistema.version_datos = anterior.version_datos
+    if journal_manager:
+        sistema.activar_registro_cambios()
+        journal_manager.checkpoint(sistema)
+    else:
+        guardar_sistema(esperar=True)
     return jsonify({"mensaje": "Sistema reseteado exitosamente"})
 
+@app.route('/api/persistencia/estadisticas', methods=['GET'])
+def obtener_estadisticas_persistencia():
+    """Obtiene los contadores de archivos y bytes escritos por los guardados"""
+    estadisticas = almacenamiento.estadisticas()
+    if escritor:
+        estadisticas['escritor'] = escritor.estadisticas()
+    if sincronizador:
+        estadisticas['sincronizacion'] = sincronizador.estadisticas()
+    return jsonify(estadisticas)
+
+@app.route('/api/cache/estadisticas', methods=['GET'])
+def obtener_estadisticas_cache():
+    """Obtiene aciertos, fallos e invalidaciones de la caché de serialización JSON"""
+    return jsonify(sistema.cache_json.estadisticas())
+
 @app.route('/api/datos', methods=['GET'])
+@lee_sistema
+@cache_http.condicional()
 def obtener_datos():
-    """Obtiene todos los datos del sistema"""
-    return jsonify(sistema.to_dict())
+    """Obtiene todos los datos del sistema como JSON transmitido por bloques, colección por colección"""
+    datos = _instantanea_datos(sistema)
+    return Response(_bloques_json_datos(datos, config.DATOS_TAMANO_BLOQUE), content_type='application/json')
+
+# Colecciones de /api/datos cuyos elementos se toman de la caché de serialización: {clave: (tipo, atributo clave)}
+_FRAGMENTOS_DATOS = {
+    'recursos': ('recurso', 'id'),
+    'categorias': ('categoria', 'id'),
+    'clientes': ('cliente', 'nit'),
+    'facturas': ('factura', 'numero_factura')
+}
+
+def _instantanea_datos(sistema_actual):
+    """Toma, con el bloqueo compartido, todo lo que necesita /api/datos para transmitirse sin él.
+    
+    Las entidades se modifican en su lugar, así que de cada una se guarda su
+    fragmento JSON (casi siempre ya está en la caché de serialización). Los
+    consumos, la mayor parte del documento, se copian como columnas y se
+    serializan mientras se transmiten, ya sin el bloqueo, de modo que un cliente
+    lento no detiene a los escritores.
+    """
+    dumps = app.json.dumps
+    cache = sistema_actual.cache_json
+    datos = []
+    for clave, valor in sistema_actual.iterar_datos():
+        if clave == 'consumos':
+            valor = sistema_actual.consumos.instantanea()
+        elif clave in _FRAGMENTOS_DATOS:
+            tipo, atributo = _FRAGMENTOS_DATOS[clave]
+            fragmentos = []
+            for elemento in valor:
+                fragmentos.append(cache.obtener(tipo, getattr(elemento, atributo), elemento, lambda: dumps(elemento.to_dict())))
+            valor = fragmentos
+        datos.append((clave, valor))
+    return datos
+
+def _bloques_json_datos(datos, tamano_bloque):
+    """Genera el JSON de /api/datos en bloques de ~tamano_bloque bytes sin construir el documento completo"""
+    dumps = app.json.dumps
+    partes = []
+    pendientes = 0
+    
+    def agregar(texto):
+        nonlocal pendientes
+        partes.append(texto)
+        pendientes += len(texto)
+    
+    yield '{'
+    for indice, (clave, valor) in enumerate(datos):
+        agregar((',' if indice else '') + dumps(clave) + ':')
+        if isinstance(valor, (int, float, str)) or valor is None:
+            agregar(dumps(valor))
+            continue
+        
+        agregar('[')
+        for posicion, elemento in enumerate(valor):
+            texto = elemento if isinstance(elemento, str) else dumps(elemento.to_dict())
+            agregar((',' if posicion else '') + texto)
+            if pendientes >= tamano_bloque:
+                yield ''.join(partes)
+                partes.clear()
+                pendientes = 0
+        agregar(']')
+    agregar('}')
+    yield ''.join(partes)
 
 # Endpoints CRUD para Categorías
 @app.route('/api/categorias', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('categorias')
 def obtener_categorias():
     """Obtiene todas las categorías"""
-    categorias_data = [categoria.to_dict() for categoria in sistema.categorias]
-    return jsonify(categorias_data)
+    return _respuesta_lista(
+        _fragmento('categoria', categoria.id, categoria, Categoria.to_dict) for categoria in sistema.categorias
+    )
 
 @app.route('/api/categorias', methods=['POST'])
+@modifica_sistema
 def crear_categoria():
     """Crea una nueva categoría"""
     try:
@@ -322,11 +473,12 @@ def crear_categoria():
             "mensaje": "Categoría creada exitosamente",
             "categoria": categoria.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error creando categoría: {str(e)}"}), 500
 
 @app.route('/api/categorias/<int:categoria_id>', methods=['DELETE'])
+@modifica_sistema
 def eliminar_categoria(categoria_id):
     """Elimina una categoría"""
     try:
@@ -338,22 +490,26 @@ def eliminar_categoria(categoria_id):
         if categoria.configuraciones:
             return jsonify({"error": "No se puede eliminar una categoría con configuraciones"}), 400
         
-        sistema.categorias = [c for c in sistema.categorias if c.id != categoria_id]
+        sistema.eliminar_categoria(categoria_id)
         guardar_sistema()
         
         return jsonify({"mensaje": "Categoría eliminada exitosamente"}), 200
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error eliminando categoría: {str(e)}"}), 500
 
 # Endpoints CRUD para Recursos
 @app.route('/api/recursos', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('recursos')
 def obtener_recursos():
     """Obtiene todos los recursos"""
-    recursos_data = [recurso.to_dict() for recurso in sistema.recursos]
-    return jsonify(recursos_data)
+    return _respuesta_lista(
+        _fragmento('recurso', recurso.id, recurso, Recurso.to_dict) for recurso in sistema.recursos
+    )
 
 @app.route('/api/recursos', methods=['POST'])
+@modifica_sistema
 def crear_recurso():
     """Crea un nuevo recurso"""
     try:
@@ -381,11 +537,12 @@ def crear_recurso():
             "mensaje": "Recurso creado exitosamente",
             "recurso": recurso.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error creando recurso: {str(e)}"}), 500
 
 @app.route('/api/recursos/<int:recurso_id>', methods=['DELETE'])
+@modifica_sistema
 def eliminar_recurso(recurso_id):
     """Elimina un recurso"""
     try:
@@ -399,22 +556,35 @@ def eliminar_recurso(recurso_id):
                 if recurso_id in configuracion.recursos:
                     return jsonify({"error": "No se puede eliminar un recurso que está en uso"}), 400
         
-        sistema.recursos = [r for r in sistema.recursos if r.id != recurso_id]
+        sistema.eliminar_recurso(recurso_id)
         guardar_sistema()
         
         return jsonify({"mensaje": "Recurso eliminado exitosamente"}), 200
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error eliminando recurso: {str(e)}"}), 500
 
 # Endpoints CRUD para Clientes
 @app.route('/api/clientes', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('clientes')
 def obtener_clientes():
-    """Obtiene todos los clientes"""
-    clientes_data = [cliente.to_dict() for cliente in sistema.clientes]
-    return jsonify(clientes_data)
+    """Obtiene los clientes; con parámetros de consulta pagina y filtra (?nit=a,b&limit=&cursor=)"""
+    if not request.args:
+        return _respuesta_lista(_fragmento_cliente(cliente) for cliente in sistema.clientes)
+    
+    try:
+        cursor, limite = _parametros_pagina()
+        pagina = sistema.listar_clientes(_parametro_lista('nit'), cursor, limite)
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {str(e)}"}), 400
+    return _respuesta_pagina(pagina, limite, _fragmento_cliente)
+
+def _fragmento_cliente(cliente):
+    return _fragmento('cliente', cliente.nit, cliente, Cliente.to_dict)
 
 @app.route('/api/clientes', methods=['POST'])
+@modifica_sistema
 def crear_cliente():
     """Crea un nuevo cliente"""
     try:
@@ -444,11 +614,12 @@ def crear_cliente():
             "mensaje": "Cliente creado exitosamente",
             "cliente": cliente.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error creando cliente: {str(e)}"}), 500
 
 @app.route('/api/clientes/<string:nit>', methods=['DELETE'])
+@modifica_sistema
 def eliminar_cliente(nit):
     """Elimina un cliente"""
     try:
@@ -456,29 +627,53 @@ def eliminar_cliente(nit):
         if not cliente:
             return jsonify({"error": "Cliente no encontrado"}), 404
         
-        sistema.clientes = [c for c in sistema.clientes if c.nit != nit]
+        sistema.eliminar_cliente(nit)
         guardar_sistema()
         
         return jsonify({"mensaje": "Cliente eliminado exitosamente"}), 200
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error eliminando cliente: {str(e)}"}), 500
 
 # Endpoints CRUD para Instancias
 @app.route('/api/instancias', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('clientes', 'categorias', 'recursos')
 def obtener_instancias():
-    """Obtiene todas las instancias de todos los clientes"""
-    instancias_data = []
-    for cliente in sistema.clientes:
-        for instancia in cliente.instancias:
-            instancia_data = instancia.to_dict()
-            instancia_data['cliente_nit'] = cliente.nit
-            instancia_data['cliente_nombre'] = cliente.nombre
-            instancias_data.append(instancia_data)
+    """Obtiene las instancias de todos los clientes; con parámetros de consulta pagina y filtra
+    (?id=1,2&nit=a,b&estado=Vigente&limit=&cursor=)"""
+    if not request.args:
+        return _respuesta_lista(
+            _fragmento_instancia(instancia, cliente)
+            for cliente in sistema.clientes
+            for instancia in cliente.instancias
+        )
     
-    return jsonify(instancias_data)
+    try:
+        cursor, limite = _parametros_pagina(int)
+        pagina = sistema.listar_instancias(
+            _parametro_lista('id', int), _parametro_lista('nit'), request.args.get('estado'), cursor, limite
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {str(e)}"}), 400
+    return _respuesta_pagina(
+        pagina, limite, lambda instancia: _fragmento_instancia(instancia, sistema.obtener_cliente_de_instancia(instancia.id))
+    )
+
+def _fragmento_instancia(instancia, cliente):
+    return _fragmento('instancia', instancia.id, instancia, lambda i: _serializar_instancia(i, cliente))
+
+def _serializar_instancia(instancia, cliente):
+    """Instancia con su costo por hora y los datos de su cliente"""
+    instancia_data = instancia.to_dict()
+    configuracion = sistema.obtener_configuracion_de_instancia(instancia)
+    instancia_data['costo_hora'] = configuracion.calcular_costo_hora(sistema) if configuracion else None
+    instancia_data['cliente_nit'] = cliente.nit
+    instancia_data['cliente_nombre'] = cliente.nombre
+    return instancia_data
 
 @app.route('/api/instancias', methods=['POST'])
+@modifica_sistema
 def crear_instancia():
     """Crea una nueva instancia"""
     try:
@@ -510,18 +705,19 @@ def crear_instancia():
             estado="Vigente"
         )
         
-        cliente.agregar_instancia(instancia)
+        sistema.agregar_instancia(cliente, instancia)
         guardar_sistema()
         
         return jsonify({
             "mensaje": "Instancia creada exitosamente",
             "instancia": instancia.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error creando instancia: {str(e)}"}), 500
 
 @app.route('/api/instancias/cancelar', methods=['POST'])
+@modifica_sistema
 def cancelar_instancia():
     """Cancela una instancia"""
     try:
@@ -541,32 +737,59 @@ def cancelar_instancia():
             return jsonify({"error": "La instancia ya está cancelada"}), 400
         
         fecha_final = datetime.now().strftime("%d/%m/%Y")
-        instancia.cancelar(fecha_final)
+        sistema.cancelar_instancia(cliente_nit, instancia_id, fecha_final)
         guardar_sistema()
         
         return jsonify({
             "mensaje": "Instancia cancelada exitosamente",
             "instancia": instancia.to_dict()
         }), 200
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error cancelando instancia: {str(e)}"}), 500
 
 # Endpoints para Configuraciones
 @app.route('/api/configuraciones', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('categorias', 'recursos')
 def obtener_configuraciones():
-    """Obtiene todas las configuraciones de todas las categorías"""
-    configuraciones_data = []
-    for categoria in sistema.categorias:
-        for configuracion in categoria.configuraciones:
-            config_data = configuracion.to_dict()
-            config_data['categoria_id'] = categoria.id
-            config_data['categoria_nombre'] = categoria.nombre
-            configuraciones_data.append(config_data)
+    """Obtiene las configuraciones de todas las categorías; con parámetros de consulta pagina y filtra
+    (?id=1,2&categoria=3&limit=&cursor=)"""
+    if not request.args:
+        return _respuesta_lista(
+            _fragmento_configuracion(configuracion, categoria)
+            for categoria in sistema.categorias
+            for configuracion in categoria.configuraciones
+        )
     
-    return jsonify(configuraciones_data)
+    try:
+        cursor, limite = _parametros_pagina(int)
+        categoria_id = request.args.get('categoria')
+        pagina = sistema.listar_configuraciones(
+            _parametro_lista('id', int), int(categoria_id) if categoria_id else None, cursor, limite
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {str(e)}"}), 400
+    return _respuesta_pagina(
+        pagina, limite,
+        lambda configuracion: _fragmento_configuracion(configuracion, sistema.obtener_categoria_de_configuracion(configuracion.id))
+    )
+
+def _fragmento_configuracion(configuracion, categoria):
+    return _fragmento('configuracion', configuracion.id, configuracion, lambda c: _serializar_configuracion(c, categoria))
+
+def _serializar_configuracion(configuracion, categoria):
+    """Configuración con su tarifa por hora y los datos de su categoría"""
+    config_data = configuracion.to_dict()
+    tarifa = sistema.obtener_tarifa_configuracion(configuracion)
+    config_data['costo_hora'] = tarifa.costo_hora
+    config_data['tarifa'] = [linea.to_dict() for linea in tarifa.recursos]
+    config_data['categoria_id'] = categoria.id
+    config_data['categoria_nombre'] = categoria.nombre
+    return config_data
 
 @app.route('/api/configuraciones', methods=['POST'])
+@modifica_sistema
 def crear_configuracion():
     """Crea una nueva configuración"""
     try:
@@ -592,19 +815,20 @@ def crear_configuracion():
                 float(recurso_data['cantidad'])
             )
         
-        categoria.agregar_configuracion(configuracion)
+        sistema.agregar_configuracion(categoria, configuracion)
         guardar_sistema()
         
         return jsonify({
             "mensaje": "Configuración creada exitosamente",
             "configuracion": configuracion.to_dict()
         }), 201
-        
+    
     except Exception as e:
         return jsonify({"error": f"Error creando configuración: {str(e)}"}), 500
 
 # Endpoints para Facturación
 @app.route('/api/facturacion/generar', methods=['POST'])
+@modifica_sistema
 def generar_facturacion():
     """Genera facturas para un rango de fechas"""
     try:
@@ -617,53 +841,82 @@ def generar_facturacion():
         fecha_fin_dt = Validador.extraer_fecha(fecha_fin)
         if not fecha_inicio_dt or not fecha_fin_dt:
             return jsonify({"error": "Fechas inválidas"}), 400
-
-        # Generar facturación
-        facturas_generadas = sistema.generar_facturacion(fecha_inicio_dt, fecha_fin_dt)
         
-        # Guardar cambios
-        guardar_sistema()
+        # Generar facturación
+        resumen = {}
+        trabajadores = data.get('trabajadores', config.FACTURACION_TRABAJADORES)
+        if isinstance(trabajadores, bool) or not isinstance(trabajadores, int) or trabajadores < 1:
+            return jsonify({"error": "trabajadores debe ser un entero mayor o igual a 1"}), 400
+        motor = data.get('motor', config.FACTURACION_MOTOR)
+        if motor not in MOTORES_FACTURACION:
+            return jsonify({"error": f"Motor de facturación inválido (opciones: {', '.join(MOTORES_FACTURACION)})"}), 400
+        facturas_generadas = sistema.generar_facturacion(fecha_inicio_dt, fecha_fin_dt, resumen, trabajadores, motor)
+        
+        # Guardar cambios (las facturas deben quedar escritas antes de responder)
+        guardar_sistema(esperar=True)
         
         return jsonify({
             "mensaje": "Facturación generada exitosamente",
             "facturas_generadas": len(facturas_generadas),
+            "consumos_escaneados": resumen['consumos_escaneados'],
+            "consumos_facturados": resumen['consumos_facturados'],
+            "consumos_sin_fecha": resumen['consumos_sin_fecha'],
             "facturas": [factura.to_dict() for factura in facturas_generadas]
         }), 200
     except Exception as e:
         return jsonify({"error": f"Error generando facturación: {str(e)}"}), 500
 
 @app.route('/api/facturas', methods=['GET'])
+@lee_sistema
+@cache_http.condicional('facturas')
 def obtener_facturas():
-    """Obtiene todas las facturas del sistema"""
-    facturas_data = [factura.to_dict() for factura in sistema.facturas]
-    return jsonify(facturas_data)
+    """Obtiene las facturas del sistema; con parámetros de consulta pagina y filtra
+    (?numero=a,b&nit=a,b&fecha_inicio=dd/mm/yyyy&fecha_fin=dd/mm/yyyy&limit=&cursor=)"""
+    if not request.args:
+        return _respuesta_lista(_fragmento_factura(factura) for factura in sistema.facturas)
+    
+    try:
+        cursor, limite = _parametros_pagina(int)
+        fechas = {}
+        for nombre in ('fecha_inicio', 'fecha_fin'):
+            if request.args.get(nombre):
+                fechas[nombre] = Validador.extraer_fecha(request.args[nombre])
+                if not fechas[nombre]:
+                    raise ValueError(f"{nombre} inválida")
+        pagina = sistema.listar_facturas(
+            _parametro_lista('numero'), _parametro_lista('nit'),
+            fechas.get('fecha_inicio'), fechas.get('fecha_fin'), cursor, limite
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Parámetros inválidos: {str(e)}"}), 400
+    return _respuesta_pagina(pagina, limite, _fragmento_factura)
+
+def _fragmento_factura(factura):
+    return _fragmento('factura', factura.numero_factura, factura, Factura.to_dict)
 
 @app.route('/api/facturas/<numero_factura>', methods=['GET'])
+@lee_sistema
+@cache_http.factura_inmutable
 def obtener_factura(numero_factura):
     """Obtiene una factura específica por número"""
-    for factura in sistema.facturas:
-        if factura.numero_factura == numero_factura:
-            return jsonify(factura.to_dict())
+    factura = sistema.obtener_factura_por_numero(numero_factura)
+    if factura:
+        return app.response_class(_fragmento_factura(factura), mimetype='application/json')
     return jsonify({"error": "Factura no encontrada"}), 404
 
 # Endpoints para Reportes PDF
 @app.route('/api/reportes/detalle-factura/<numero_factura>', methods=['GET'])
+@cache_http.factura_inmutable
 def generar_reporte_detalle_factura(numero_factura):
     """Genera un PDF con el detalle de una factura"""
     try:
-        # Buscar la factura
-        factura = None
-        for f in sistema.facturas:
-            if f.numero_factura == numero_factura:
-                factura = f
-                break
-        
+        # Buscar la factura y el cliente (el PDF se genera fuera del bloqueo)
+        with lectura_sistema():
+            factura = sistema.obtener_factura_por_numero(numero_factura)
+            cliente = sistema.obtener_cliente_por_nit(factura.nit_cliente) if factura else None
         if not factura:
             return jsonify({"error": "Factura no encontrada"}), 404
         
-        # Buscar el cliente
-        cliente = sistema.obtener_cliente_por_nit(factura.nit_cliente)
-        
         # Generar PDF
         filepath = pdf_generator.generar_detalle_factura(factura, cliente)
         
@@ -672,7 +925,7 @@ def generar_reporte_detalle_factura(numero_factura):
             response = Response(f.read(), content_type='application/pdf')
             response.headers['Content-Disposition'] = f'attachment; filename=detalle_factura_{numero_factura}.pdf'
             return response
-            
+    
     except Exception as e:
         return jsonify({"error": f"Error generando reporte: {str(e)}"}), 500
 
@@ -691,15 +944,18 @@ def generar_reporte_analisis_ventas():
         if not fecha_inicio_dt or not fecha_fin_dt:
             return jsonify({"error": "Fechas inválidas"}), 400
         
-        # Obtener datos para el análisis
-        if tipo_analisis == 'categorias':
-            datos = _obtener_datos_analisis_categorias(fecha_inicio_dt, fecha_fin_dt)
-        else:
-            datos = _obtener_datos_analisis_recursos(fecha_inicio_dt, fecha_fin_dt)
+        # Con la versión de los datos, un reporte en caché se devuelve sin calcular el análisis;
+        # si no está, los datos se calculan con esa misma versión y el PDF se genera fuera del bloqueo
+        rango_fechas = {'inicio': fecha_inicio_dt, 'fin': fecha_fin_dt}
+        with lectura_sistema():
+            version, _ = sistema.version_colecciones(COLECCIONES_ANALISIS)
+            filepath = pdf_generator.analisis_ventas_en_cache(tipo_analisis, rango_fechas, version)
+            if filepath is None:
+                datos = obtener_datos_analisis(sistema, tipo_analisis, fecha_inicio_dt, fecha_fin_dt)
         
         # Generar PDF
-        rango_fechas = {'inicio': fecha_inicio_dt, 'fin': fecha_fin_dt}
-        filepath = pdf_generator.generar_analisis_ventas(tipo_analisis, datos, rango_fechas)
+        if filepath is None:
+            filepath = pdf_generator.generar_analisis_ventas(tipo_analisis, datos, rango_fechas, version_datos=version)
         
         # Devolver el archivo
         with open(filepath, 'rb') as f:
@@ -707,81 +963,32 @@ def generar_reporte_analisis_ventas():
             filename = f"analisis_ventas_{tipo_analisis}_{fecha_inicio_dt}_{fecha_fin_dt}.pdf"
             response.headers['Content-Disposition'] = f'attachment; filename={filename}'
             return response
-            
+    
     except Exception as e:
         return jsonify({"error": f"Error generando reporte: {str(e)}"}), 500
 
-def _obtener_datos_analisis_categorias(fecha_inicio, fecha_fin):
-    """Obtiene datos para análisis por categorías"""
-    datos = []
-    
-    for categoria in sistema.categorias:
-        ingreso_categoria = 0
-        configuraciones_data = []
-        
-        for configuracion in categoria.configuraciones:
-            # Calcular ingreso de esta configuración
-            ingreso_config = 0
-            
-            # Buscar facturas que incluyan esta configuración en el rango de fechas
-            for factura in sistema.facturas:
-                # Verificar si la factura está en el rango
-                fecha_factura = Validador.extraer_fecha(factura.fecha)
-                if fecha_factura and fecha_inicio <= fecha_factura <= fecha_fin:
-                    for detalle in factura.detalles:
-                        instancia = sistema.obtener_instancia_por_id(detalle.id_instancia)
-                        if instancia and instancia.id_configuracion == configuracion.id:
-                            # Sumar el monto de esta instancia
-                            ingreso_config += detalle.monto_instancia
-            
-            if ingreso_config > 0:
-                configuraciones_data.append({
-                    'nombre': configuracion.nombre,
-                    'ingreso': ingreso_config
-                })
-                ingreso_categoria += ingreso_config
-        
-        if ingreso_categoria > 0:
-            datos.append({
-                'nombre': categoria.nombre,
-                'descripcion': categoria.descripcion,
-                'carga_trabajo': categoria.carga_trabajo,
-                'ingreso_total': ingreso_categoria,
-                'configuraciones': configuraciones_data
-            })
-    
-    # Ordenar por ingreso descendente
-    datos.sort(key=lambda x: x['ingreso_total'], reverse=True)
-    return datos
-
-def _obtener_datos_analisis_recursos(fecha_inicio, fecha_fin):
-    """Obtiene datos para análisis por recursos"""
-    datos = []
-    
-    for recurso in sistema.recursos:
-        ingreso_total = 0
-        
-        # Buscar en todas las facturas en el rango
-        for factura in sistema.facturas:
-            fecha_factura = Validador.extraer_fecha(factura.fecha)
-            if fecha_factura and fecha_inicio <= fecha_factura <= fecha_fin:
-                for detalle in factura.detalles:
-                    for recurso_det in detalle.detalles_recursos:
-                        if recurso_det['id_recurso'] == recurso.id:
-                            ingreso_total += recurso_det['costo']
-        
-        if ingreso_total > 0:
-            datos.append({
-                'nombre': recurso.nombre,
-                'tipo': recurso.tipo,
-                'metrica': recurso.metrica,
-                'valor_x_hora': recurso.valor_x_hora,
-                'ingreso_total': ingreso_total
-            })
-    
-    # Ordenar por ingreso descendente
-    datos.sort(key=lambda x: x['ingreso_total'], reverse=True)
-    return datos
+@app.route('/api/reportes/cache/estadisticas', methods=['GET'])
+def obtener_estadisticas_cache_reportes():
+    """Obtiene aciertos, fallos y desalojos de la caché de PDF generados"""
+    if not pdf_generator.cache:
+        return jsonify({"habilitado": False})
+    return jsonify({"habilitado": True, **pdf_generator.cache.estadisticas()})
+
+@app.route('/api/reportes/consulta', methods=['POST'])
+@lee_sistema
+def consultar_lineas_factura():
+    """Agrupa las líneas de factura por dimensiones con filtros y medidas (sum, count, avg)"""
+    try:
+        data = request.json or {}
+        dimensiones = data.get('dimensiones', [])
+        if isinstance(dimensiones, str):
+            dimensiones = [dimensiones]
+        resultado = sistema.consultar_lineas_factura(dimensiones, data.get('medidas', []), data.get('filtros', {}))
+        return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error ejecutando consulta: {str(e)}"}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""Prueba de estrés del acceso concurrente al sistema.
+
+Levanta la aplicación sobre un directorio de datos temporal y lanza a la vez
+hilos lectores (listados, /api/datos, consultas) y escritores (clientes,
+instancias, consumos, cancelaciones y facturación) contra el cliente de pruebas
+de Flask. Comprueba que ninguna petición falle, que cada documento de
+/api/datos sea consistente consigo mismo, que no se pierdan escrituras y que
+lo guardado en disco coincida con el estado en memoria. Ejecutar desde backend/:
+
+    python -m benchmarks.benchmark_concurrencia [lectores] [escritores] [operaciones_por_escritor]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ['DATABASE_PATH'] = tempfile.mkdtemp(prefix="estres_")
+
+import app as servidor
+from benchmarks.benchmark_facturacion import construir_sistema
+
+LISTADOS = (
+    '/api/recursos', '/api/categorias', '/api/clientes', '/api/instancias',
+    '/api/configuraciones', '/api/facturas', '/api/clientes?limit=7', '/api/instancias?estado=Vigente&limit=11'
+)
+
+def _consumo_xml(nit, id_instancia, tiempo, dia):
+    return (
+        f'<listadoConsumos><consumo nitCliente="{nit}" idInstancia="{id_instancia}">'
+        f'<tiempo>{tiempo}</tiempo><fechahora>{dia:02d}/02/2024 10:00</fechahora>'
+        f'</consumo></listadoConsumos>'
+    )
+
+def _verificar_datos(datos):
+    """Invariantes de un documento de /api/datos: todo lo referenciado existe en el mismo documento"""
+    instancias = {
+        instancia['id']: cliente['nit']
+        for cliente in datos['clientes']
+        for instancia in cliente['instancias']
+    }
+    configuraciones = {configuracion['id'] for categoria in datos['categorias'] for configuracion in categoria['configuraciones']}
+    for cliente in datos['clientes']:
+        for instancia in cliente['instancias']:
+            assert instancia['id_configuracion'] in configuraciones, instancia
+    for consumo in datos['consumos']:
+        assert instancias.get(consumo['id_instancia']) == consumo['nit_cliente'], consumo
+    numeros = [factura['numero_factura'] for factura in datos['facturas']]
+    assert len(numeros) == len(set(numeros)), "números de factura repetidos"
+
+def lector(cliente_http, detener, errores, contador):
+    while not detener.is_set():
+        for ruta in LISTADOS:
+            respuesta = cliente_http.get(ruta)
+            if respuesta.status_code != 200:
+                errores.append((ruta, respuesta.status_code, respuesta.get_data(as_text=True)[:200]))
+            json.loads(respuesta.get_data())
+            contador[0] += 1
+        try:
+            _verificar_datos(json.loads(cliente_http.get('/api/datos').get_data()))
+        except AssertionError as e:
+            errores.append(('/api/datos', 'inconsistente', str(e)))
+        contador[0] += 1
+
+def escritor(cliente_http, indice, operaciones, errores, creados):
+    def revisar(respuesta, esperado, contexto):
+        if respuesta.status_code != esperado:
+            errores.append((contexto, respuesta.status_code, respuesta.get_data(as_text=True)[:200]))
+            return False
+        return True
+    
+    for k in range(operaciones):
+        nit = f"{9000000 + indice * 10000 + k}-{k % 10}"
+        if not revisar(cliente_http.post('/api/clientes', json={
+            'nit': nit, 'nombre': f"Estrés {indice}-{k}", 'usuario': f"e{indice}_{k}", 'clave': "clave",
+            'direccion': "Dirección", 'correo_electronico': f"e{indice}_{k}@correo.com"
+        }), 201, 'crear cliente'):
+            continue
+        respuesta = cliente_http.post('/api/instancias', json={
+            'cliente_nit': nit, 'configuracion_id': 1 + k % 10, 'nombre': f"Instancia {indice}-{k}", 'fecha_inicio': "01/02/2024"
+        })
+        if not revisar(respuesta, 201, 'crear instancia'):
+            continue
+        id_instancia = respuesta.get_json()['instancia']['id']
+        creados.append((nit, id_instancia))
+        
+        revisar(cliente_http.post('/api/consumo', data=_consumo_xml(nit, id_instancia, 1.5, 1 + k % 28)), 200, 'consumo')
+        if k % 5 == 4:
+            revisar(cliente_http.post('/api/instancias/cancelar', json={
+                'cliente_nit': nit, 'instancia_id': id_instancia
+            }), 200, 'cancelar instancia')
+        if k % 10 == 9:
+            revisar(cliente_http.post('/api/facturacion/generar', json={
+                'fecha_inicio': "01/02/2024", 'fecha_fin': "29/02/2024"
+            }), 200, 'facturar')
+
+def main(n_lectores=4, n_escritores=4, operaciones_por_escritor=20):
+    servidor.sistema = construir_sistema(100, 2, 5)
+    servidor.sistema.cache_json.habilitado = servidor.config.CACHE_JSON_HABILITADO
+    if servidor.journal_manager:
+        servidor.sistema.activar_registro_cambios()
+        servidor.journal_manager.checkpoint(servidor.sistema)
+    else:
+        servidor.almacenamiento.guardar_sistema(servidor.sistema)
+    clientes_iniciales = len(servidor.sistema.clientes)
+    
+    errores = []
+    creados = []
+    detener = threading.Event()
+    contadores = [[0] for _ in range(n_lectores)]
+    lectores = [
+        threading.Thread(target=lector, args=(servidor.app.test_client(), detener, errores, contadores[i]))
+        for i in range(n_lectores)
+    ]
+    escritores = [
+        threading.Thread(target=escritor, args=(servidor.app.test_client(), i, operaciones_por_escritor, errores, creados))
+        for i in range(n_escritores)
+    ]
+    
+    inicio = time.perf_counter()
+    for hilo in lectores + escritores:
+        hilo.start()
+    for hilo in escritores:
+        hilo.join()
+    detener.set()
+    for hilo in lectores:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+    
+    sistema = servidor.sistema
+    esperados = n_escritores * operaciones_por_escritor
+    ids_instancia = [instancia.id for cliente in sistema.clientes for instancia in cliente.instancias]
+    if len(creados) != esperados or len(sistema.clientes) != clientes_iniciales + esperados:
+        errores.append(('escrituras perdidas', len(creados), len(sistema.clientes) - clientes_iniciales))
+    if len(ids_instancia) != len(set(ids_instancia)):
+        errores.append(('ids de instancia repetidos', len(ids_instancia), len(set(ids_instancia))))
+    
+    servidor.guardar_sistema(esperar=True)
+    if servidor.journal_manager:
+        guardado = servidor.journal_manager.cargar_sistema()
+    else:
+        guardado = servidor.almacenamiento.cargar_sistema()
+    if guardado.to_dict() != sistema.to_dict():
+        errores.append(('el estado guardado no coincide con el de memoria',))
+    
+    lecturas = sum(contador[0] for contador in contadores)
+    print(f"{n_lectores} lectores, {n_escritores} escritores x {operaciones_por_escritor} operaciones: {segundos:.2f}s")
+    print(f"  lecturas: {lecturas} ({lecturas / segundos:.0f}/s), escrituras: {len(creados)}, facturas: {len(sistema.facturas)}")
+    print(f"  caché JSON: {sistema.cache_json.estadisticas()['tasa_aciertos']}")
+    if errores:
+        print(f"  {len(errores)} error(es):")
+        for error in errores[:20]:
+            print("   ", error)
+        return 1
+    print("  sin errores")
+    return 0
+
+if __name__ == '__main__':
+    argumentos = [int(a) for a in sys.argv[1:4]]
+    sys.exit(main(*argumentos))
@@ -0,0 +1,115 @@
+"""Benchmark de escalado de la facturación paralela y del motor NumPy.
+
+Genera un Sistema sintético y factura el mismo rango con distintos números de
+procesos y con el motor vectorizado (si NumPy está instalado), comprobando que
+las facturas resultantes (números, montos y líneas) son idénticas a las del
+cálculo serial, o iguales salvo redondeo (tolerancia relativa TOLERANCIA) en el
+caso del motor NumPy. Termina con código 1 si alguna corrida no coincide.
+Las corridas con varios procesos ignoran el umbral MIN_CONSUMOS_PARALELO para
+que el conjunto sintético se reparta siempre entre los procesos.
+Ejecutar desde backend/:
+
+    python -m benchmarks.benchmark_facturacion [clientes] [instancias_por_cliente] [consumos_por_instancia]
+"""
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia
+from models import facturacion
+from models.facturacion import np
+
+# Tolerancia relativa con la que se comparan los montos del motor NumPy con los del serial
+TOLERANCIA = 1e-9
+
+def construir_sistema(n_clientes, instancias_por_cliente, consumos_por_instancia):
+    sistema = Sistema()
+    for r in range(1, 9):
+        sistema.agregar_recurso(Recurso(r, f"Recurso {r}", "abr", "metrica", "Hardware", 0.25 * r))
+    
+    categoria = Categoria(1, "General", "Sintética", "Media")
+    sistema.agregar_categoria(categoria)
+    for c in range(1, 11):
+        configuracion = Configuracion(c, f"Config {c}", "Sintética")
+        for r in range(1, 9):
+            if (c + r) % 3:
+                configuracion.agregar_recurso(r, 1 + (c * r) % 4)
+        sistema.agregar_configuracion(categoria, configuracion)
+    
+    instancias = []
+    for i in range(n_clientes):
+        nit = f"{1000000 + i}-{i % 10}"
+        cliente = Cliente(nit, f"Cliente {i}", f"usuario{i}", "clave", "Dirección", f"cliente{i}@correo.com")
+        sistema.agregar_cliente(cliente)
+        for _ in range(instancias_por_cliente):
+            id_instancia = len(instancias) + 1
+            sistema.agregar_instancia(cliente, Instancia(id_instancia, 1 + id_instancia % 10, f"Instancia {id_instancia}", "01/01/2024"))
+            instancias.append((nit, id_instancia))
+    
+    # Consumos en orden cronológico a lo largo de enero, como llegan normalmente
+    paso = timedelta(days=28) / max(1, consumos_por_instancia)
+    for k in range(consumos_por_instancia):
+        fechahora = (datetime(2024, 1, 1) + paso * k).strftime("%d/%m/%Y %H:%M")
+        for nit, id_instancia in instancias:
+            sistema.consumos.agregar(sistema.generar_id_consumo(), nit, id_instancia, 0.5 + (k + id_instancia) % 5, fechahora)
+    
+    sistema.reconstruir_indices()
+    return sistema
+
+def _firma(facturas):
+    """Representación comparable de un lote de facturas"""
+    return [factura.to_dict() for factura in facturas]
+
+def _coinciden(a, b, tolerancia):
+    """Compara dos firmas; los números de coma flotante con tolerancia relativa si se indica"""
+    if isinstance(a, float) and isinstance(b, float) and tolerancia:
+        return math.isclose(a, b, rel_tol=tolerancia, abs_tol=tolerancia)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_coinciden(a[k], b[k], tolerancia) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_coinciden(x, y, tolerancia) for x, y in zip(a, b))
+    return a == b
+
+def main(n_clientes=2000, instancias_por_cliente=5, consumos_por_instancia=20):
+    print(
+        f"Conjunto sintético: {n_clientes} clientes x {instancias_por_cliente} instancias "
+        f"x {consumos_por_instancia} consumos"
+    )
+    corridas = [(f"{t:>2} proceso(s)", 'python', t) for t in (1, 2, 4, 8) if t == 1 or t <= (os.cpu_count() or 1)]
+    if np is not None:
+        corridas.append(("motor numpy ", 'numpy', 1))
+    else:
+        print("NumPy no está instalado: se omite el motor vectorizado")
+    facturacion.MIN_CONSUMOS_PARALELO = 0
+    
+    referencia = None
+    tiempo_serial = None
+    diferentes = []
+    for nombre, motor, trabajadores in corridas:
+        sistema = construir_sistema(n_clientes, instancias_por_cliente, consumos_por_instancia)
+        inicio = time.perf_counter()
+        facturas = sistema.generar_facturacion("01/01/2024", "31/01/2024", trabajadores=trabajadores, motor=motor)
+        duracion = time.perf_counter() - inicio
+        
+        firma = _firma(facturas)
+        if referencia is None:
+            referencia, tiempo_serial = firma, duracion
+        if motor == 'numpy':
+            iguales = "iguales (con tolerancia)" if _coinciden(firma, referencia, TOLERANCIA) else "DIFERENTES"
+        else:
+            iguales = "idénticas" if firma == referencia else "DIFERENTES"
+        if iguales == "DIFERENTES":
+            diferentes.append(nombre.strip())
+        print(
+            f"{nombre}: {duracion:7.3f} s "
+            f"(x{tiempo_serial / duracion:4.2f}), {len(facturas)} facturas {iguales} al serial"
+        )
+    return diferentes
+
+if __name__ == '__main__':
+    argumentos = [int(a) for a in sys.argv[1:4]]
+    diferentes = main(*argumentos)
+    if diferentes:
+        print(f"Resultados distintos al serial: {', '.join(diferentes)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""Benchmark de memoria de los modelos.
+
+Compara los bytes por entidad de la representación anterior (clases con
+__dict__, consumos como objetos y líneas de recurso como dicts) con la actual
+(__slots__, almacén columnar de consumos y DetalleRecurso) sobre un conjunto
+sintético. Ejecutar desde backend/:
+
+    python -m benchmarks.benchmark_memoria [consumos] [facturas]
+"""
+import sys
+import tracemalloc
+from models import AlmacenConsumos, Factura, DetalleFactura, DetalleRecurso
+
+class _ConsumoAnterior:
+    """Consumo tal como se representaba antes (objeto con __dict__)"""
+    def __init__(self, id, nit_cliente, id_instancia, tiempo, fechahora, facturado=False):
+        self.id = id
+        self.nit_cliente = nit_cliente
+        self.id_instancia = id_instancia
+        self.tiempo = tiempo
+        self.fechahora = fechahora
+        self.facturado = facturado
+
+class _DetalleFacturaAnterior:
+    def __init__(self, id_instancia, nombre_instancia, tiempo_consumido, monto_instancia, detalles_recursos):
+        self.id_instancia = id_instancia
+        self.nombre_instancia = nombre_instancia
+        self.tiempo_consumido = tiempo_consumido
+        self.monto_instancia = monto_instancia
+        self.detalles_recursos = detalles_recursos
+
+class _FacturaAnterior:
+    def __init__(self, numero_factura, nit_cliente, fecha, monto_total):
+        self.numero_factura = numero_factura
+        self.nit_cliente = nit_cliente
+        self.fecha = fecha
+        self.monto_total = monto_total
+        self.detalles = []
+
+def _medir(construir):
+    """Devuelve (resultado, bytes asignados) de construir el conjunto de datos"""
+    tracemalloc.start()
+    resultado = construir()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, actual
+
+def _datos_consumo(i):
+    """Valores sintéticos de un consumo"""
+    nit = f"{1000000 + i % 5000}-{i % 10}"
+    fechahora = f"{1 + i % 28:02d}/{1 + i % 12:02d}/2024 {i % 24:02d}:{i % 60:02d}"
+    return i + 1, nit, i % 20000, 1.5 + (i % 7), fechahora
+
+def consumos_anteriores(n):
+    return [_ConsumoAnterior(*_datos_consumo(i)) for i in range(n)]
+
+def consumos_actuales(n):
+    almacen = AlmacenConsumos()
+    for i in range(n):
+        almacen.agregar(*_datos_consumo(i))
+    return almacen
+
+def _lineas_recurso(i):
+    return [(r, f"Recurso {r}", 2.0, 0.5 * r, 10.0 * r) for r in range(1, 4)]
+
+def facturas_anteriores(n):
+    facturas = []
+    for i in range(n):
+        factura = _FacturaAnterior(f"FACT-{i:06d}", f"{1000000 + i % 5000}-{i % 10}", "31/01/2024", 100.0)
+        for d in range(2):
+            lineas = [
+                {'id_recurso': r, 'nombre_recurso': nombre, 'cantidad': cantidad, 'valor_x_hora': valor, 'costo': costo}
+                for r, nombre, cantidad, valor, costo in _lineas_recurso(i)
+            ]
+            factura.detalles.append(_DetalleFacturaAnterior(i * 2 + d, f"Instancia {d}", 10.0, 50.0, lineas))
+        facturas.append(factura)
+    return facturas
+
+def facturas_actuales(n):
+    facturas = []
+    for i in range(n):
+        factura = Factura(f"FACT-{i:06d}", f"{1000000 + i % 5000}-{i % 10}", "31/01/2024", 100.0)
+        for d in range(2):
+            lineas = [DetalleRecurso(*linea) for linea in _lineas_recurso(i)]
+            factura.agregar_detalle(DetalleFactura(i * 2 + d, f"Instancia {d}", 10.0, 50.0, lineas))
+        facturas.append(factura)
+    return facturas
+
+def main(n_consumos=1_000_000, n_facturas=100_000):
+    print(f"Conjunto sintético: {n_consumos} consumos, {n_facturas} facturas (2 detalles x 3 recursos)")
+    for nombre, n, anterior, actual in (
+        ("consumo", n_consumos, consumos_anteriores, consumos_actuales),
+        ("factura", n_facturas, facturas_anteriores, facturas_actuales),
+    ):
+        datos, bytes_antes = _medir(lambda: anterior(n))
+        del datos
+        datos, bytes_despues = _medir(lambda: actual(n))
+        del datos
+        print(
+            f"{nombre:>8}: antes {bytes_antes / n:8.1f} B/entidad, "
+            f"después {bytes_despues / n:8.1f} B/entidad "
+            f"({100.0 * (1 - bytes_despues / bytes_antes):.1f}% menos)"
+        )
+
+if __name__ == '__main__':
+    argumentos = [int(a) for a in sys.argv[1:3]]
+    main(*argumentos)
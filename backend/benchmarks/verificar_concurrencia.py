@@ -0,0 +1,160 @@
+"""Verificación determinista del bloqueo de lectores y escritor y de /api/datos.
+
+benchmark_concurrencia depende de cómo el planificador intercale los hilos;
+aquí el intercalado se fuerza con eventos:
+
+1. Escritor sin inanición: con un lector dentro, un escritor espera y un lector
+   que llega después queda detrás del escritor aunque el primero siga dentro.
+   El orden de entrada debe ser lector 1, escritor, lector 2.
+2. Instantánea de /api/datos: con la respuesta transmitida a medias se crean un
+   cliente, una instancia y un consumo, se cancela una instancia existente y se
+   factura (lo que modifica en su lugar instancias y consumos ya transmitidos o
+   por transmitir). Ninguna escritura debe esperar a la transmisión y el
+   documento recibido debe ser idéntico al estado anterior a las escrituras.
+
+Termina con código 1 si alguna comprobación falla. Ejecutar desde backend/:
+
+    python -m benchmarks.verificar_concurrencia
+"""
+import json
+import sys
+import threading
+import time
+
+from benchmarks.benchmark_concurrencia import servidor, _consumo_xml, _verificar_datos
+from benchmarks.benchmark_facturacion import construir_sistema
+from utils.bloqueo_lectura_escritura import BloqueoLecturaEscritura
+
+# Segundos que se espera algo que debe ocurrir, y que se espera para confirmar que algo no ocurre
+ESPERA = 5.0
+PAUSA = 0.2
+
+def _esperar(condicion, segundos=ESPERA):
+    """Espera hasta que la condición se cumpla; False si no se cumplió en el plazo"""
+    limite = time.monotonic() + segundos
+    while not condicion():
+        if time.monotonic() > limite:
+            return False
+        time.sleep(0.005)
+    return True
+
+def verificar_escritor_sin_inanicion():
+    bloqueo = BloqueoLecturaEscritura()
+    orden = []
+    salir = {nombre: threading.Event() for nombre in ('lector 1', 'escritor', 'lector 2')}
+    
+    def entrar(nombre, seccion):
+        with seccion():
+            orden.append(nombre)
+            salir[nombre].wait(ESPERA)
+    
+    def lanzar(nombre, seccion):
+        hilo = threading.Thread(target=entrar, args=(nombre, seccion), daemon=True)
+        hilo.start()
+        return hilo
+    
+    errores = []
+    hilos = [lanzar('lector 1', bloqueo.lectura)]
+    if not _esperar(lambda: orden == ['lector 1']):
+        return ["el primer lector no obtuvo el bloqueo"]
+    hilos.append(lanzar('escritor', bloqueo.escritura))
+    if not _esperar(lambda: bloqueo.estadisticas()['escritores_esperando'] == 1):
+        return ["el escritor no quedó esperando"]
+    hilos.append(lanzar('lector 2', bloqueo.lectura))
+    time.sleep(PAUSA)
+    if orden != ['lector 1']:
+        errores.append(f"un lector nuevo entró delante del escritor que esperaba: {orden}")
+    
+    # Cada uno sale solo cuando el siguiente ya debería haber entrado
+    for nombre, entrados in (('lector 1', 2), ('escritor', 3), ('lector 2', 3)):
+        salir[nombre].set()
+        _esperar(lambda: len(orden) >= entrados)
+    for hilo in hilos:
+        hilo.join(ESPERA)
+    if orden != ['lector 1', 'escritor', 'lector 2']:
+        errores.append(f"orden de entrada {orden}")
+    if bloqueo.estadisticas() != {'lectores': 0, 'escribiendo': False, 'escritores_esperando': 0}:
+        errores.append(f"el bloqueo quedó tomado: {bloqueo.estadisticas()}")
+    return errores
+
+def _escrituras(cliente_http, existente, errores):
+    """Escrituras ejecutadas con /api/datos transmitiéndose; anota las que no responden lo esperado"""
+    nit_existente, id_existente = existente
+    nit = "7000000-7"
+    peticiones = [
+        ('crear cliente', '/api/clientes', {'json': {
+            'nit': nit, 'nombre': "Durante la transmisión", 'usuario': "transmision", 'clave': "clave",
+            'direccion': "Dirección", 'correo_electronico': "transmision@correo.com"
+        }}, 201),
+        ('crear instancia', '/api/instancias', {'json': {
+            'cliente_nit': nit, 'configuracion_id': 1, 'nombre': "Instancia nueva", 'fecha_inicio': "01/01/2024"
+        }}, 201),
+        ('cancelar instancia', '/api/instancias/cancelar', {'json': {
+            'cliente_nit': nit_existente, 'instancia_id': id_existente
+        }}, 200),
+        ('consumo', '/api/consumo', {'data': _consumo_xml(nit_existente, id_existente, 2.5, 3)}, 200),
+        ('facturar', '/api/facturacion/generar', {'json': {
+            'fecha_inicio': "01/01/2024", 'fecha_fin': "29/02/2024"
+        }}, 200),
+    ]
+    for contexto, ruta, cuerpo, esperado in peticiones:
+        respuesta = cliente_http.post(ruta, **cuerpo)
+        if respuesta.status_code != esperado:
+            errores.append(f"{contexto}: {respuesta.status_code} {respuesta.get_data(as_text=True)[:200]}")
+
+def verificar_instantanea_datos():
+    servidor.sistema = construir_sistema(30, 2, 4)
+    servidor.sistema.cache_json.habilitado = servidor.config.CACHE_JSON_HABILITADO
+    servidor.almacenamiento.guardar_sistema(servidor.sistema)
+    servidor.config.DATOS_TAMANO_BLOQUE = 1024
+    cliente = servidor.sistema.clientes[0]
+    existente = (cliente.nit, cliente.instancias[0].id)
+    cliente_http = servidor.app.test_client()
+    
+    errores = []
+    antes = json.loads(cliente_http.get('/api/datos').get_data())
+    respuesta = cliente_http.get('/api/datos', buffered=False)
+    bloques = iter(respuesta.response)
+    recibido = [next(bloques)]
+    if servidor.bloqueo_sistema.estadisticas()['lectores']:
+        errores.append("la transmisión de /api/datos conserva el bloqueo compartido")
+    
+    escrituras = threading.Thread(target=_escrituras, args=(servidor.app.test_client(), existente, errores), daemon=True)
+    escrituras.start()
+    escrituras.join(ESPERA)
+    if escrituras.is_alive():
+        errores.append("las escrituras esperan a que termine la transmisión de /api/datos")
+        escrituras.join()
+    
+    recibido.extend(bloques)
+    respuesta.close()
+    documento = json.loads(b"".join(recibido))
+    if len(recibido) < 3:
+        errores.append(f"el documento se transmitió en {len(recibido)} bloque(s); no hubo escrituras a mitad")
+    if documento != antes:
+        errores.append("el documento transmitido no coincide con el estado anterior a las escrituras")
+    try:
+        _verificar_datos(documento)
+    except AssertionError as e:
+        errores.append(f"documento inconsistente: {e}")
+    
+    despues = json.loads(cliente_http.get('/api/datos').get_data())
+    if despues == antes or len(despues['facturas']) <= len(antes['facturas']):
+        errores.append("las escrituras no se reflejan en /api/datos después de la transmisión")
+    return errores
+
+def main():
+    fallos = 0
+    for nombre, verificacion in (
+        ("escritor sin inanición", verificar_escritor_sin_inanicion),
+        ("instantánea de /api/datos", verificar_instantanea_datos),
+    ):
+        errores = verificacion()
+        print(f"{nombre}: {'correcto' if not errores else 'FALLA'}")
+        for error in errores:
+            print(f"  {error}")
+        fallos += bool(errores)
+    return 1 if fallos else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
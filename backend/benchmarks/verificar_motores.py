@@ -0,0 +1,112 @@
+"""Verificación determinista del motor NumPy contra el cálculo serial.
+
+A diferencia de benchmark_facturacion, usa un Sistema pequeño armado a mano con
+los casos borde del cálculo: consumos de tiempo cero (un cliente solo con ellos
+no se factura), instancias cuya configuración no existe, consumos justo en los
+extremos de la ventana (y un minuto fuera) y consumos sin fecha válida. Factura
+enero y luego febrero con cada motor y compara las facturas (con la tolerancia
+de benchmark_facturacion), los resúmenes y los consumos que quedan pendientes.
+Termina con código 1 si algo no coincide; sin NumPy no verifica nada. Ejecutar
+desde backend/:
+
+    python -m benchmarks.verificar_motores
+"""
+import sys
+from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia
+from models.facturacion import np
+from benchmarks.benchmark_facturacion import TOLERANCIA, _coinciden, _firma
+
+# Ventanas facturadas en orden: la segunda recoge lo que la primera dejó fuera
+VENTANAS = [("01/01/2024", "31/01/2024"), ("01/02/2024", "29/02/2024")]
+
+def construir_sistema():
+    sistema = Sistema()
+    sistema.agregar_recurso(Recurso(1, "CPU", "vCPU", "núcleos", "Hardware", 0.35))
+    sistema.agregar_recurso(Recurso(2, "RAM", "GB", "gigabytes", "Hardware", 0.1))
+    sistema.agregar_recurso(Recurso(3, "Licencia", "lic", "licencias", "Software", 1.75))
+    
+    categoria = Categoria(1, "General", "Casos borde", "Media")
+    sistema.agregar_categoria(categoria)
+    configuracion = Configuracion(1, "Básica", "CPU y RAM")
+    configuracion.agregar_recurso(1, 2)
+    configuracion.agregar_recurso(2, 3.5)
+    sistema.agregar_configuracion(categoria, configuracion)
+    configuracion = Configuracion(2, "Licenciada", "Licencia")
+    configuracion.agregar_recurso(3, 0.5)
+    sistema.agregar_configuracion(categoria, configuracion)
+    
+    # (nit, [(id_instancia, id_configuracion)]); la configuración 99 no existe
+    clientes = [
+        ("100-1", [(1, 1), (2, 99), (3, 2)]),
+        ("200-2", [(4, 1)]),
+        ("300-3", [(5, 2), (6, 99)]),
+    ]
+    for nit, instancias in clientes:
+        cliente = Cliente(nit, f"Cliente {nit}", f"usuario{nit}", "clave", "Dirección", f"{nit}@correo.com")
+        sistema.agregar_cliente(cliente)
+        for id_instancia, id_configuracion in instancias:
+            sistema.agregar_instancia(cliente, Instancia(id_instancia, id_configuracion, f"Instancia {id_instancia}", "01/01/2024"))
+    
+    # Fuera de orden cronológico a propósito, para que el índice temporal se reordene
+    consumos = [
+        ("100-1", 1, 1.25, "15/01/2024 10:30"),
+        ("100-1", 2, 4.0, "15/01/2024 10:30"),
+        ("100-1", 3, 0.0, "10/01/2024 08:00"),
+        ("100-1", 1, 2.5, "01/01/2024 00:00"),
+        ("100-1", 3, 3.0, "31/01/2024 23:59"),
+        ("100-1", 1, 0.75, "31/12/2023 23:59"),
+        ("100-1", 3, 1.0, "01/02/2024 00:00"),
+        ("200-2", 4, 0.0, "05/01/2024 12:00"),
+        ("200-2", 4, 0.0, "29/02/2024 23:59"),
+        ("300-3", 6, 8.0, "20/01/2024 09:15"),
+        ("300-3", 5, 0.5, "31/01/2024 23:59"),
+        ("300-3", 5, 2.0, "31/02/2024 10:00"),
+        ("300-3", 5, 0.0, "01/01/2024 00:00"),
+        ("300-3", 5, 1.5, "01/03/2024 00:00"),
+    ]
+    for nit, id_instancia, tiempo, fechahora in consumos:
+        sistema.consumos.agregar(sistema.generar_id_consumo(), nit, id_instancia, tiempo, fechahora)
+    
+    sistema.reconstruir_indices()
+    return sistema
+
+def facturar(motor):
+    """Factura las VENTANAS con un motor; devuelve [(firma, resumen)] y los ids pendientes al final"""
+    sistema = construir_sistema()
+    corridas = []
+    for fecha_inicio, fecha_fin in VENTANAS:
+        resumen = {}
+        facturas = sistema.generar_facturacion(fecha_inicio, fecha_fin, resumen, motor=motor)
+        corridas.append((_firma(facturas), resumen))
+    pendientes = sorted(consumo.id for consumo in sistema.obtener_consumos_no_facturados())
+    return corridas, pendientes
+
+def main():
+    if np is None:
+        print("NumPy no está instalado: no hay motor vectorizado que verificar")
+        return None
+    
+    corridas_serial, pendientes_serial = facturar('python')
+    corridas_numpy, pendientes_numpy = facturar('numpy')
+    
+    diferentes = []
+    for (fecha_inicio, fecha_fin), (firma_serial, resumen_serial), (firma_numpy, resumen_numpy) in zip(
+            VENTANAS, corridas_serial, corridas_numpy):
+        ventana = f"{fecha_inicio} - {fecha_fin}"
+        if not _coinciden(firma_numpy, firma_serial, TOLERANCIA):
+            diferentes.append(f"facturas {ventana}")
+        if resumen_numpy != resumen_serial:
+            diferentes.append(f"resumen {ventana}")
+        print(f"{ventana}: {len(firma_serial)} facturas, {resumen_serial}")
+    if pendientes_numpy != pendientes_serial:
+        diferentes.append("consumos pendientes")
+    print(f"Consumos pendientes al final: {pendientes_serial}")
+    return diferentes
+
+if __name__ == '__main__':
+    diferentes = main()
+    if diferentes:
+        print(f"El motor numpy difiere del serial en: {', '.join(diferentes)}", file=sys.stderr)
+        sys.exit(1)
+    if diferentes is not None:
+        print("El motor numpy coincide con el serial")
@@ -0,0 +1,66 @@
+import os
+
+# Configuración del backend, sobreescribible con variables de entorno
+
+def _env_bool(nombre: str, por_defecto: bool) -> bool:
+    """Lee una variable de entorno booleana"""
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return por_defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes")
+
+# Directorio de los archivos XML de la base de datos
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "database")
+
+# Journal de escritura anticipada: cada mutación se agrega al journal y el
+# snapshot XML completo solo se reescribe en los checkpoints
+JOURNAL_HABILITADO = _env_bool("JOURNAL_HABILITADO", False)
+JOURNAL_MAX_BYTES = int(os.environ.get("JOURNAL_MAX_BYTES", 4 * 1024 * 1024))
+JOURNAL_FSYNC = _env_bool("JOURNAL_FSYNC", True)
+
+# Ingesta de consumos: tamaño máximo del mensaje y consumos leídos por lote (cada lote se
+# valida y se pasa a un almacén columnar temporal antes de aplicar el mensaje completo)
+CONSUMO_MAX_BYTES = int(os.environ.get("CONSUMO_MAX_BYTES", 1024 * 1024 * 1024))
+CONSUMO_TAMANO_LOTE = int(os.environ.get("CONSUMO_TAMANO_LOTE", 5000))
+
+# Escritor en segundo plano: agrupa las mutaciones y escribe un snapshot cada
+# ESCRITOR_INTERVALO_MS. FSYNC_POLITICA puede ser "always", "interval" o "never"
+PERSISTENCIA_ASINCRONA = _env_bool("PERSISTENCIA_ASINCRONA", False)
+ESCRITOR_INTERVALO_MS = int(os.environ.get("ESCRITOR_INTERVALO_MS", 200))
+FSYNC_POLITICA = os.environ.get("FSYNC_POLITICA", "never")
+FSYNC_INTERVALO_MS = int(os.environ.get("FSYNC_INTERVALO_MS", 1000))
+
+# Almacenamiento: "xml" (archivos en DATABASE_PATH) o "sqlite" (DATABASE_PATH/sistema.db)
+ALMACENAMIENTO = os.environ.get("ALMACENAMIENTO", "xml").strip().lower()
+
+# Procesos usados para facturar (1 = cálculo serial; se limita al número de CPU y solo se
+# reparte desde models.facturacion.MIN_CONSUMOS_PARALELO consumos en el rango)
+FACTURACION_TRABAJADORES = int(os.environ.get("FACTURACION_TRABAJADORES", 1))
+
+# Motor de cálculo de las facturas: "python" o "numpy" (vectorizado, requiere NumPy)
+FACTURACION_MOTOR = os.environ.get("FACTURACION_MOTOR", "python").strip().lower()
+
+# Paginación de los listados (?limit=&cursor=): tamaño por defecto y máximo de página
+PAGINA_LIMITE = int(os.environ.get("PAGINA_LIMITE", 100))
+PAGINA_LIMITE_MAXIMO = int(os.environ.get("PAGINA_LIMITE_MAXIMO", 1000))
+
+# Segundos que los clientes pueden guardar en caché el detalle y el PDF de una factura
+# (no cambian después de emitirse; un /api/reset vuelve a usar los mismos números)
+CACHE_FACTURAS_MAX_AGE = int(os.environ.get("CACHE_FACTURAS_MAX_AGE", 86400))
+
+# Bytes máximos de los PDF guardados en reports/ para reutilizarlos mientras sus datos no
+# cambien; al pasarse se eliminan los menos usados (0 = generar cada reporte de nuevo)
+REPORTES_CACHE_MAX_BYTES = int(os.environ.get("REPORTES_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Guardar el JSON serializado de cada entidad para los listados (se invalida al modificarla)
+CACHE_JSON_HABILITADO = _env_bool("CACHE_JSON_HABILITADO", True)
+
+# Tamaño aproximado (bytes) de cada bloque de la respuesta transmitida de /api/datos
+DATOS_TAMANO_BLOQUE = int(os.environ.get("DATOS_TAMANO_BLOQUE", 64 * 1024))
+
+# Servidor de producción (run_backend.py --produccion, ver gunicorn.conf.py): varios procesos
+# que cargan el sistema una vez antes de crearse y se sincronizan por el directorio de datos
+MULTIPROCESO = _env_bool("MULTIPROCESO", False)
+SERVIDOR_DIRECCION = os.environ.get("SERVIDOR_DIRECCION", "127.0.0.1:5000")
+SERVIDOR_TRABAJADORES = int(os.environ.get("SERVIDOR_TRABAJADORES", os.cpu_count() or 1))
+SERVIDOR_HILOS = int(os.environ.get("SERVIDOR_HILOS", 4))
@@ -0,0 +1,22 @@
+"""Configuración de gunicorn para el modo producción (run_backend.py --produccion).
+
+La aplicación se importa una vez en el proceso maestro (preload_app): el sistema
+se carga de disco antes de crear los trabajadores, que lo heredan. Cada
+trabajador atiende con varios hilos y, como hay varias copias del sistema, el
+modo multiproceso coordina las escrituras con el bloqueo del directorio de datos
+y el sello de versión de metadata.xml.
+"""
+import os
+
+os.environ.setdefault("MULTIPROCESO", "true")
+
+# Import por nombre: "config" es también un ajuste de gunicorn
+from config import SERVIDOR_DIRECCION, SERVIDOR_TRABAJADORES, SERVIDOR_HILOS
+
+bind = SERVIDOR_DIRECCION
+workers = SERVIDOR_TRABAJADORES
+threads = SERVIDOR_HILOS
+worker_class = "gthread"
+preload_app = True
+# La facturación y los reportes pueden tardar más que el valor por defecto (30 s)
+timeout = 300
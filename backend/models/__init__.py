@@ -0,0 +1,9 @@
+from .recurso import Recurso
+from .categoria import Categoria
+from .configuracion import Configuracion, TarifaConfiguracion, TarifaRecurso
+from .cliente import Cliente
+from .instancia import Instancia
+from .consumo import Consumo
+from .almacen_consumos import AlmacenConsumos, ConsumoVista
+from .factura import Factura, DetalleFactura, DetalleRecurso
+from .sistema import Sistema
\ No newline at end of file
@@ -0,0 +1,64 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List
+
+class AgregadosIngresos:
+    """Ingresos pre-agregados por día de factura, por instancia y por recurso.
+    
+    Se actualizan con cada factura agregada, así los análisis de ventas de un
+    rango suman un bucket por día en lugar de recorrer todas las facturas y sus
+    detalles. Las claves salen solo del detalle de la factura: la configuración
+    de cada instancia se resuelve al consultar, igual que al recorrer las
+    facturas, por lo que agregar o eliminar instancias después no deja los
+    buckets desactualizados. El ingreso de una categoría es la suma de sus
+    configuraciones.
+    """
+    
+    def __init__(self):
+        self._dias: List[int] = []  # Ordinales de fecha con ingresos, ordenados
+        self._por_instancia: Dict[int, Dict[int, float]] = {}  # {ordinal: {id_instancia: monto}}
+        self._por_recurso: Dict[int, Dict[int, float]] = {}  # {ordinal: {id_recurso: monto}}
+    
+    def agregar_factura(self, factura):
+        """Suma los montos de una factura en el bucket de su día"""
+        dia = factura.fecha_ordinal
+        if dia is None:
+            return
+        
+        por_instancia = self._por_instancia.get(dia)
+        if por_instancia is None:
+            insort(self._dias, dia)
+            por_instancia = self._por_instancia[dia] = {}
+            self._por_recurso[dia] = {}
+        por_recurso = self._por_recurso[dia]
+        
+        for detalle in factura.detalles:
+            por_instancia[detalle.id_instancia] = por_instancia.get(detalle.id_instancia, 0) + detalle.monto_instancia
+            for recurso_det in detalle.detalles_recursos:
+                por_recurso[recurso_det.id_recurso] = por_recurso.get(recurso_det.id_recurso, 0) + recurso_det.costo
+    
+    def reconstruir(self, facturas):
+        """Vuelve a calcular todos los buckets a partir de las facturas"""
+        self.__init__()
+        for factura in facturas:
+            self.agregar_factura(factura)
+    
+    def sumar_por_configuracion(self, desde: int, hasta: int, obtener_instancia) -> Dict[int, float]:
+        """Ingreso por configuración entre dos ordinales de fecha (inclusive), según la
+        configuración actual de cada instancia; las que ya no existen no se cuentan"""
+        totales = {}
+        for id_instancia, monto in self._sumar(self._por_instancia, desde, hasta).items():
+            instancia = obtener_instancia(id_instancia)
+            if instancia:
+                totales[instancia.id_configuracion] = totales.get(instancia.id_configuracion, 0) + monto
+        return totales
+    
+    def sumar_por_recurso(self, desde: int, hasta: int) -> Dict[int, float]:
+        """Ingreso por recurso entre dos ordinales de fecha (inclusive)"""
+        return self._sumar(self._por_recurso, desde, hasta)
+    
+    def _sumar(self, buckets, desde, hasta):
+        totales = {}
+        for dia in self._dias[bisect_left(self._dias, desde):bisect_right(self._dias, hasta)]:
+            for clave, monto in buckets[dia].items():
+                totales[clave] = totales.get(clave, 0) + monto
+        return totales
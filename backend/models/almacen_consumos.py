@@ -0,0 +1,231 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List
+from .consumo import Consumo
+from .fechas import fechahora_a_epoch, epoch_a_fechahora
+
+class ConsumoVista:
+    """Vista liviana de una fila del almacén con la misma interfaz que Consumo"""
+    __slots__ = ('_almacen', 'fila')
+    
+    def __init__(self, almacen, fila: int):
+        self._almacen = almacen
+        self.fila = fila
+    
+    @property
+    def id(self) -> int:
+        return self._almacen.ids[self.fila]
+    
+    @property
+    def nit_cliente(self) -> str:
+        return self._almacen.nits[self._almacen.claves_cliente[self.fila]]
+    
+    @property
+    def id_instancia(self) -> int:
+        return self._almacen.ids_instancia[self.fila]
+    
+    @property
+    def tiempo(self) -> float:
+        return self._almacen.tiempos[self.fila]
+    
+    @property
+    def epoch(self) -> float:
+        return self._almacen.epochs[self.fila]
+    
+    @property
+    def fechahora(self) -> str:
+        return self._almacen.fechahora(self.fila)
+    
+    @property
+    def facturado(self) -> bool:
+        return bool(self._almacen.facturados[self.fila])
+    
+    def marcar_como_facturado(self):
+        """Marca el consumo como facturado"""
+        self._almacen.facturados[self.fila] = 1
+    
+    def to_dict(self):
+        """Convierte el objeto a diccionario para serialización"""
+        return {
+            'id': self.id,
+            'nit_cliente': self.nit_cliente,
+            'id_instancia': self.id_instancia,
+            'tiempo': self.tiempo,
+            'fechahora': self.fechahora,
+            'facturado': self.facturado
+        }
+    
+    def __eq__(self, otro):
+        return isinstance(otro, ConsumoVista) and otro._almacen is self._almacen and otro.fila == self.fila
+    
+    def __hash__(self):
+        return hash((id(self._almacen), self.fila))
+
+class AlmacenConsumos:
+    """Almacén columnar de consumos.
+    
+    Cada campo vive en un arreglo tipado paralelo (id, clave de cliente internada,
+    id de instancia, horas, timestamp epoch y bandera de facturado), en lugar de
+    un objeto Consumo por registro. Iterar o indexar devuelve ConsumoVista, y los
+    métodos de filtro y suma trabajan sobre columnas completas o listas de filas.
+    Un índice ordenado por timestamp permite consultas por rango con bisect.
+    """
+    
+    def __init__(self):
+        self.ids = array('q')
+        self.claves_cliente = array('i')
+        self.ids_instancia = array('q')
+        self.tiempos = array('d')
+        self.epochs = array('d')
+        self.facturados = array('b')
+        
+        # NITs internados: cada NIT se guarda una sola vez
+        self.nits: List[str] = []
+        self._clave_por_nit: Dict[str, int] = {}
+        
+        # Textos de fecha que no se pueden reconstruir desde el epoch: {fila: texto}
+        self._fechahora_texto: Dict[int, str] = {}
+        
+        # Índice temporal: (epochs ordenados, fila de cada uno). Las filas se agregan al final y, si
+        # alguna llegó fuera de orden, el índice se ordena una sola vez en la siguiente consulta
+        self._indice_temporal = (array('d'), array('q'))
+        self._indice_ordenado = True
+        
+        # Filas cuya fecha no corresponde a un día real: no tienen lugar en el índice temporal
+        self.filas_sin_fecha = array('q')
+    
+    def clave_cliente(self, nit: str) -> int:
+        """Obtiene (o crea) la clave internada de un NIT"""
+        clave = self._clave_por_nit.get(nit)
+        if clave is None:
+            clave = len(self.nits)
+            self._clave_por_nit[nit] = clave
+            self.nits.append(nit)
+        return clave
+    
+    def agregar(self, id: int, nit_cliente: str, id_instancia: int, tiempo: float, fechahora: str, facturado: bool = False) -> int:
+        """Agrega un consumo y devuelve su número de fila"""
+        fila = len(self.ids)
+        epoch = fechahora_a_epoch(fechahora)
+        if epoch != epoch or epoch_a_fechahora(epoch) != fechahora:
+            self._fechahora_texto[fila] = fechahora
+        
+        self.ids.append(id)
+        self.claves_cliente.append(self.clave_cliente(nit_cliente))
+        self.ids_instancia.append(id_instancia)
+        self.tiempos.append(tiempo)
+        self.epochs.append(epoch)
+        self.facturados.append(1 if facturado else 0)
+        
+        if epoch == epoch:
+            epochs, filas = self._indice_temporal
+            if epochs and epoch < epochs[-1]:
+                self._indice_ordenado = False
+            epochs.append(epoch)
+            filas.append(fila)
+        else:
+            self.filas_sin_fecha.append(fila)
+        return fila
+    
+    def append(self, consumo: Consumo) -> int:
+        """Agrega un objeto Consumo (compatibilidad con la lista anterior)"""
+        return self.agregar(
+            consumo.id, consumo.nit_cliente, consumo.id_instancia,
+            consumo.tiempo, consumo.fechahora, consumo.facturado
+        )
+    
+    def instantanea(self) -> 'AlmacenConsumos':
+        """Copia independiente del almacén (columnas e índices), para recorrerlo sin el bloqueo del sistema"""
+        copia = AlmacenConsumos()
+        copia.ids = self.ids[:]
+        copia.claves_cliente = self.claves_cliente[:]
+        copia.ids_instancia = self.ids_instancia[:]
+        copia.tiempos = self.tiempos[:]
+        copia.epochs = self.epochs[:]
+        copia.facturados = self.facturados[:]
+        copia.nits = list(self.nits)
+        copia._clave_por_nit = dict(self._clave_por_nit)
+        copia._fechahora_texto = dict(self._fechahora_texto)
+        epochs, filas = self._indice_temporal
+        copia._indice_temporal = (epochs[:], filas[:])
+        copia._indice_ordenado = self._indice_ordenado
+        copia.filas_sin_fecha = self.filas_sin_fecha[:]
+        return copia
+    
+    def fechahora(self, fila: int) -> str:
+        """Obtiene el texto de fecha y hora de una fila"""
+        texto = self._fechahora_texto.get(fila)
+        if texto is not None:
+            return texto
+        return epoch_a_fechahora(self.epochs[fila])
+    
+    def filas_en_rango(self, desde: float = None, hasta: float = None):
+        """Filas con timestamp en [desde, hasta] en orden temporal, en O(log n + k)"""
+        epochs, filas = self._indice()
+        inicio = 0 if desde is None else bisect_left(epochs, desde)
+        fin = len(epochs) if hasta is None else bisect_right(epochs, hasta)
+        return filas[inicio:fin]
+    
+    def _indice(self):
+        """Índice temporal ordenado; lo ordena si desde la última consulta llegaron filas fuera de orden"""
+        if not self._indice_ordenado:
+            # Orden estable: a igual timestamp se conserva el orden de llegada. Se reemplaza la
+            # tupla completa para que una consulta concurrente nunca mezcle dos versiones
+            epochs, filas = self._indice_temporal
+            orden = sorted(range(len(epochs)), key=epochs.__getitem__)
+            self._indice_temporal = (array('d', (epochs[i] for i in orden)), array('q', (filas[i] for i in orden)))
+            self._indice_ordenado = True
+        return self._indice_temporal
+    
+    def filtrar(self, nit_cliente: str = None, id_instancia: int = None, facturado: bool = None,
+                desde: float = None, hasta: float = None) -> List[int]:
+        """Devuelve las filas que cumplen todos los filtros indicados"""
+        if desde is not None or hasta is not None:
+            filas = self.filas_en_rango(desde, hasta)
+        else:
+            filas = range(len(self.ids))
+        if nit_cliente is not None:
+            clave = self._clave_por_nit.get(nit_cliente)
+            if clave is None:
+                return []
+            columna = self.claves_cliente
+            filas = [f for f in filas if columna[f] == clave]
+        if id_instancia is not None:
+            columna = self.ids_instancia
+            filas = [f for f in filas if columna[f] == id_instancia]
+        if facturado is not None:
+            columna = self.facturados
+            valor = 1 if facturado else 0
+            filas = [f for f in filas if columna[f] == valor]
+        return list(filas)
+    
+    def sumar_tiempo(self, filas=None) -> float:
+        """Suma las horas de las filas indicadas (o de toda la columna)"""
+        if filas is None:
+            return sum(self.tiempos)
+        tiempos = self.tiempos
+        return sum(tiempos[f] for f in filas)
+    
+    def marcar_facturados(self, filas):
+        """Marca como facturadas las filas indicadas"""
+        facturados = self.facturados
+        for f in filas:
+            facturados[f] = 1
+    
+    def vista(self, fila: int) -> ConsumoVista:
+        """Obtiene la vista de una fila"""
+        return ConsumoVista(self, fila)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, fila: int) -> ConsumoVista:
+        if fila < 0:
+            fila += len(self.ids)
+        if not 0 <= fila < len(self.ids):
+            raise IndexError("fila fuera de rango")
+        return ConsumoVista(self, fila)
+    
+    def __iter__(self):
+        for fila in range(len(self.ids)):
+            yield ConsumoVista(self, fila)
@@ -0,0 +1,73 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+class CacheSerializacion:
+    """Caché de la forma serializada (texto JSON) de cada entidad.
+    
+    Las entradas se agrupan por tipo ('recurso', 'categoria', 'cliente',
+    'instancia', 'configuracion', 'factura') y clave (id o NIT). El Sistema
+    invalida la entrada de una entidad cuando ella o sus hijos cambian, así
+    los listados solo unen fragmentos ya serializados. Cada entrada recuerda
+    el objeto del que salió: si la entidad fue reemplazada cuenta como fallo.
+    
+    Varios lectores pueden usarla a la vez (el servidor la consulta bajo el
+    bloqueo compartido del sistema): los contadores y las entradas se
+    actualizan con un candado propio y la serialización se hace fuera de él.
+    """
+    
+    def __init__(self, habilitado: bool = True):
+        self.habilitado = habilitado
+        self._fragmentos: Dict[str, Dict[object, Tuple[object, str]]] = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self._candado = threading.Lock()
+    
+    def obtener(self, tipo: str, clave, entidad, serializar: Callable[[], str]) -> str:
+        """Obtiene el texto serializado de una entidad, generándolo con `serializar` si no está"""
+        if not self.habilitado:
+            return serializar()
+        
+        with self._candado:
+            entrada = self._fragmentos.get(tipo, {}).get(clave)
+            if entrada is not None and entrada[0] is entidad:
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+        
+        texto = serializar()
+        with self._candado:
+            self._fragmentos.setdefault(tipo, {})[clave] = (entidad, texto)
+        return texto
+    
+    def invalidar(self, tipo: str, clave):
+        """Descarta la entrada de una entidad"""
+        with self._candado:
+            por_clave = self._fragmentos.get(tipo)
+            if por_clave and por_clave.pop(clave, None) is not None:
+                self.invalidaciones += 1
+    
+    def invalidar_tipo(self, tipo: str):
+        """Descarta todas las entradas de un tipo (cambios que afectan a muchas entidades)"""
+        with self._candado:
+            por_clave = self._fragmentos.pop(tipo, None)
+            if por_clave:
+                self.invalidaciones += len(por_clave)
+    
+    def limpiar(self):
+        """Descarta todas las entradas"""
+        for tipo in list(self._fragmentos):
+            self.invalidar_tipo(tipo)
+    
+    def estadisticas(self):
+        """Obtiene aciertos, fallos, tasa de aciertos, invalidaciones y entradas por tipo"""
+        with self._candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                'habilitado': self.habilitado,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'invalidaciones': self.invalidaciones,
+                'entradas': {tipo: len(por_clave) for tipo, por_clave in self._fragmentos.items()}
+            }
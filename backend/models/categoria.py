@@ -1,23 +1,24 @@
 from .configuracion import Configuracion
 
 class Categoria:
+    __slots__ = ('id', 'nombre', 'descripcion', 'carga_trabajo', 'configuraciones', '_configuraciones_por_id')
+    
     def __init__(self, id: int, nombre: str, descripcion: str, carga_trabajo: str):
         self.id = id
         self.nombre = nombre
         self.descripcion = descripcion
         self.carga_trabajo = carga_trabajo
         self.configuraciones = []  # Lista de objetos Configuracion
+        self._configuraciones_por_id = {}  # {configuracion_id: Configuracion}
     
     def agregar_configuracion(self, configuracion: Configuracion):
         """Agrega una configuración a la categoría"""
         self.configuraciones.append(configuracion)
+        self._configuraciones_por_id[configuracion.id] = configuracion
     
     def obtener_configuracion_por_id(self, configuracion_id: int):
         """Obtiene una configuración por su ID"""
-        for config in self.configuraciones:
-            if config.id == configuracion_id:
-                return config
-        return None
+        return self._configuraciones_por_id.get(configuracion_id)
     
     def to_dict(self):
         """Convierte el objeto a diccionario para serialización"""
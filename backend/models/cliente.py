@@ -1,6 +1,8 @@
 from .instancia import Instancia
 
 class Cliente:
+    __slots__ = ('nit', 'nombre', 'usuario', 'clave', 'direccion', 'correo_electronico', 'instancias', '_instancias_por_id')
+    
     def __init__(self, nit: str, nombre: str, usuario: str, clave: str, direccion: str, correo_electronico: str):
         self.nit = nit
         self.nombre = nombre
@@ -9,17 +11,16 @@ class Cliente:
         self.direccion = direccion
         self.correo_electronico = correo_electronico
         self.instancias = []  # Lista de objetos Instancia
+        self._instancias_por_id = {}  # {instancia_id: Instancia}
     
     def agregar_instancia(self, instancia: Instancia):
         """Agrega una instancia al cliente"""
         self.instancias.append(instancia)
+        self._instancias_por_id[instancia.id] = instancia
     
     def obtener_instancia_por_id(self, instancia_id: int):
         """Obtiene una instancia por su ID"""
-        for instancia in self.instancias:
-            if instancia.id == instancia_id:
-                return instancia
-        return None
+        return self._instancias_por_id.get(instancia_id)
     
     def cancelar_instancia(self, instancia_id: int, fecha_final: str):
         """Cancela una instancia del cliente"""
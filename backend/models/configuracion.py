@@ -1,6 +1,30 @@
-from typing import Dict
+from typing import NamedTuple, Tuple
+
+class TarifaRecurso(NamedTuple):
+    """Línea de la tarifa de una configuración: un recurso con su precio vigente"""
+    id_recurso: int
+    nombre_recurso: str
+    cantidad: float
+    valor_x_hora: float
+    costo_hora: float  # valor_x_hora * cantidad
+    
+    def to_dict(self):
+        return self._asdict()
+
+class TarifaConfiguracion(NamedTuple):
+    """Tarifa por hora precalculada de una configuración y su desglose por recurso"""
+    costo_hora: float
+    recursos: Tuple[TarifaRecurso, ...]
+    
+    def to_dict(self):
+        return {
+            'costo_hora': self.costo_hora,
+            'recursos': [linea.to_dict() for linea in self.recursos]
+        }
 
 class Configuracion:
+    __slots__ = ('id', 'nombre', 'descripcion', 'recursos')
+    
     def __init__(self, id: int, nombre: str, descripcion: str):
         self.id = id
         self.nombre = nombre
@@ -11,14 +35,21 @@ class Configuracion:
         """Agrega un recurso a la configuración"""
         self.recursos[recurso_id] = cantidad
     
-    def calcular_costo_hora(self, sistema) -> float:
-        """Calcula el costo por hora de esta configuración"""
+    def calcular_tarifa(self, sistema) -> TarifaConfiguracion:
+        """Calcula la tarifa por hora de esta configuración con los precios actuales"""
         costo_total = 0
+        lineas = []
         for recurso_id, cantidad in self.recursos.items():
             recurso = sistema.obtener_recurso_por_id(recurso_id)
             if recurso:
-                costo_total += recurso.calcular_costo(1, cantidad)
-        return costo_total
+                costo_hora = recurso.calcular_costo(1, cantidad)
+                costo_total += costo_hora
+                lineas.append(TarifaRecurso(recurso.id, recurso.nombre, cantidad, recurso.valor_x_hora, costo_hora))
+        return TarifaConfiguracion(costo_total, tuple(lineas))
+    
+    def calcular_costo_hora(self, sistema) -> float:
+        """Obtiene el costo por hora de esta configuración (tarifa en caché del sistema)"""
+        return sistema.obtener_tarifa_configuracion(self).costo_hora
     
     def to_dict(self):
         """Convierte el objeto a diccionario para serialización"""
@@ -37,5 +68,6 @@ class Configuracion:
             nombre=data['nombre'],
             descripcion=data['descripcion']
         )
-        configuracion.recursos = data.get('recursos', {})
+        # Las claves pueden llegar como texto si el diccionario viene de JSON
+        configuracion.recursos = {int(recurso_id): cantidad for recurso_id, cantidad in data.get('recursos', {}).items()}
         return configuracion
\ No newline at end of file
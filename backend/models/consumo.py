@@ -1,4 +1,6 @@
 class Consumo:
+    __slots__ = ('id', 'nit_cliente', 'id_instancia', 'tiempo', 'fechahora', 'facturado')
+    
     def __init__(self, id: int, nit_cliente: str, id_instancia: int, tiempo: float, fechahora: str, facturado: bool = False):
         self.id = id
         self.nit_cliente = nit_cliente
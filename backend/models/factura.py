@@ -1,19 +1,44 @@
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, NamedTuple
+from .fechas import fecha_a_ordinal
+
+class DetalleRecurso(NamedTuple):
+    """Línea de recurso de un detalle de factura (registro compacto e inmutable)"""
+    id_recurso: int
+    nombre_recurso: str
+    cantidad: float
+    valor_x_hora: float
+    costo: float
+    
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Crea un DetalleRecurso desde un diccionario"""
+        return cls(
+            id_recurso=data['id_recurso'],
+            nombre_recurso=data['nombre_recurso'],
+            cantidad=data['cantidad'],
+            valor_x_hora=data['valor_x_hora'],
+            costo=data['costo']
+        )
 
 class DetalleFactura:
-    def __init__(self, id_instancia: int, nombre_instancia: str, tiempo_consumido: float, monto_instancia: float, detalles_recursos: List[Dict]):
+    __slots__ = ('id_instancia', 'nombre_instancia', 'tiempo_consumido', 'monto_instancia', 'detalles_recursos')
+    
+    def __init__(self, id_instancia: int, nombre_instancia: str, tiempo_consumido: float, monto_instancia: float, detalles_recursos: List[DetalleRecurso]):
         self.id_instancia = id_instancia
         self.nombre_instancia = nombre_instancia
         self.tiempo_consumido = tiempo_consumido
         self.monto_instancia = monto_instancia
-        self.detalles_recursos = detalles_recursos  # Lista de dicts con info de recursos
+        self.detalles_recursos = detalles_recursos  # Lista de DetalleRecurso
 
 class Factura:
+    __slots__ = ('numero_factura', 'nit_cliente', 'fecha', 'fecha_ordinal', 'monto_total', 'detalles')
+    
     def __init__(self, numero_factura: str, nit_cliente: str, fecha: str, monto_total: float):
         self.numero_factura = numero_factura
         self.nit_cliente = nit_cliente
         self.fecha = fecha
+        self.fecha_ordinal = fecha_a_ordinal(fecha)  # Fecha parseada una sola vez para ordenar y comparar
         self.monto_total = monto_total
         self.detalles = []  # Lista de DetalleFactura
     
@@ -34,7 +59,7 @@ class Factura:
                     'nombre_instancia': detalle.nombre_instancia,
                     'tiempo_consumido': detalle.tiempo_consumido,
                     'monto_instancia': detalle.monto_instancia,
-                    'detalles_recursos': detalle.detalles_recursos
+                    'detalles_recursos': [recurso_det._asdict() for recurso_det in detalle.detalles_recursos]
                 } for detalle in self.detalles
             ]
         }
@@ -55,7 +80,7 @@ class Factura:
                 nombre_instancia=detalle_data['nombre_instancia'],
                 tiempo_consumido=detalle_data['tiempo_consumido'],
                 monto_instancia=detalle_data['monto_instancia'],
-                detalles_recursos=detalle_data['detalles_recursos']
+                detalles_recursos=[DetalleRecurso.from_dict(r) for r in detalle_data['detalles_recursos']]
             )
             factura.agregar_detalle(detalle)
         return factura
\ No newline at end of file
@@ -0,0 +1,224 @@
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Tuple
+from .factura import DetalleRecurso
+
+try:
+    import numpy as np
+except ImportError:  # El motor 'numpy' es opcional
+    np = None
+
+# Motores de cálculo disponibles para generar_facturacion
+MOTORES_FACTURACION = ('python', 'numpy')
+
+# Cálculo puro de facturas: no depende del Sistema, por lo que puede ejecutarse
+# tanto en el proceso principal como en los procesos de un pool (que además
+# agrupan y suman los consumos de su partición de clientes).
+#
+# Cada factura se describe como una lista de instancias:
+#   (id_instancia, nombre_instancia, tiempo_total, líneas de la tarifa de su configuración [TarifaRecurso])
+# y el resultado es (monto_total, [(id_instancia, nombre_instancia, tiempo_total, monto_instancia, [DetalleRecurso])])
+
+def calcular_factura(instancias: List[Tuple]):
+    """Calcula las líneas y el monto total de la factura de un cliente"""
+    monto_total = 0
+    detalles = []
+    
+    for id_instancia, nombre_instancia, tiempo_total, recursos in instancias:
+        monto_instancia = 0
+        detalles_recursos = []
+        
+        for linea in recursos:
+            costo_recurso = linea.valor_x_hora * tiempo_total * linea.cantidad
+            monto_instancia += costo_recurso
+            detalles_recursos.append(DetalleRecurso(
+                id_recurso=linea.id_recurso,
+                nombre_recurso=linea.nombre_recurso,
+                cantidad=linea.cantidad,
+                valor_x_hora=linea.valor_x_hora,
+                costo=costo_recurso
+            ))
+        
+        monto_total += monto_instancia
+        detalles.append((id_instancia, nombre_instancia, tiempo_total, monto_instancia, detalles_recursos))
+    
+    return monto_total, detalles
+
+# Consumos del rango a partir de los cuales se factura en varios procesos: por debajo, crear
+# los procesos y repartirles los consumos cuesta más que calcular todo en el proceso principal
+MIN_CONSUMOS_PARALELO = 200_000
+
+def _clave_orden(epoch: float, fila: int):
+    """Orden del índice temporal: por epoch y, a igual epoch, por fila; las filas sin fecha al final"""
+    return (1, 0.0, fila) if epoch != epoch else (0, epoch, fila)
+
+def facturar_particion(memoria: str, n_filas: int, particion: List[Tuple], desde: float, hasta: float):
+    """Filtra, ordena, suma y calcula las facturas de una partición de clientes (unidad de trabajo de cada proceso).
+    
+    `memoria` es el nombre del bloque de memoria compartida con las columnas de
+    horas y epochs del almacén (n_filas valores de cada una, en ese orden) y
+    `particion` son los clientes en orden de NIT como (nit, [(id_instancia,
+    (nombre_instancia, líneas de la tarifa) o None, filas pendientes)]). Se toman
+    las filas con epoch en [desde, hasta] o sin fecha, en el orden del índice
+    temporal, y las instancias en el orden de su primera fila, como el cálculo
+    serial. Las instancias sin tarifa se devuelven (sus consumos se marcan
+    facturados) pero no generan líneas. Devuelve, por cada cliente con consumos en
+    el rango, (nit, resultado de calcular_factura, filas por instancia), en el
+    mismo orden.
+    """
+    bloque = shared_memory.SharedMemory(name=memoria)
+    try:
+        with bloque.buf.cast('d') as valores:
+            return [
+                (nit, calcular_factura(instancias), por_instancia)
+                for nit, instancias, por_instancia in _agrupar_cliente_en_rango(valores, n_filas, particion, desde, hasta)
+            ]
+    finally:
+        bloque.close()
+
+def _agrupar_cliente_en_rango(valores, n_filas: int, particion: List[Tuple], desde: float, hasta: float):
+    """Para cada cliente con filas en el rango genera (nit, instancias para calcular_factura, filas por instancia)"""
+    for nit, instancias_cliente in particion:
+        candidatas = []
+        for id_instancia, tarifa, filas in instancias_cliente:
+            filas_rango = []
+            for fila in filas:
+                epoch = valores[n_filas + fila]
+                # Una fila sin fecha tiene epoch NaN: no cumple ninguna comparación y es distinta de sí misma
+                if desde <= epoch <= hasta or epoch != epoch:
+                    filas_rango.append(_clave_orden(epoch, fila))
+            if filas_rango:
+                filas_rango.sort()
+                candidatas.append((filas_rango, id_instancia, tarifa))
+        if not candidatas:
+            continue
+        candidatas.sort(key=lambda candidata: candidata[0][0])
+        
+        por_instancia = {}
+        instancias = []
+        for filas_rango, id_instancia, tarifa in candidatas:
+            filas_instancia = por_instancia[id_instancia] = array('q', (orden[2] for orden in filas_rango))
+            if tarifa is not None:
+                nombre_instancia, recursos = tarifa
+                instancias.append((id_instancia, nombre_instancia, sum(valores[f] for f in filas_instancia), recursos))
+        yield nit, instancias, por_instancia
+
+def facturar_particiones(tiempos: array, epochs: array, particiones: List[List[Tuple]], desde: float, hasta: float):
+    """Ejecuta facturar_particion en un pool de procesos, uno por partición.
+    
+    Las columnas de horas y epochs se copian una sola vez a un bloque de memoria
+    compartida que los procesos leen sin copiarlo; cada partición lleva solo las
+    filas pendientes de sus clientes. Los procesos se crean con 'spawn' (no
+    heredan los hilos ni los candados del servidor). El resultado concatena las
+    particiones en orden, así que conserva el orden de NIT.
+    """
+    n_filas = len(tiempos)
+    bloque = shared_memory.SharedMemory(create=True, size=2 * n_filas * tiempos.itemsize)
+    try:
+        with bloque.buf.cast('d') as valores:
+            valores[:n_filas] = tiempos
+            valores[n_filas:] = epochs
+        
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(particiones), mp_context=contexto) as pool:
+            futuros = [
+                pool.submit(facturar_particion, bloque.name, n_filas, particion, desde, hasta)
+                for particion in particiones
+            ]
+            return [resultado for futuro in futuros for resultado in futuro.result()]
+    finally:
+        bloque.close()
+        bloque.unlink()
+
+def calcular_facturas_numpy(facturas: List[List[Tuple]], tiempos):
+    """Calcula todas las facturas con operaciones vectorizadas de NumPy.
+    
+    Cada factura es una lista de instancias
+    (id_instancia, nombre_instancia, filas de consumo, id_configuracion, líneas de la tarifa)
+    y `tiempos` es la columna de horas del almacén de consumos. Se suman las horas
+    por instancia con un bincount, se arma la matriz configuración x recurso de
+    cantidades y se multiplica por el vector de precios para obtener todas las
+    líneas a la vez. El resultado tiene el mismo formato que calcular_factura
+    para cada factura; los montos coinciden con los del motor 'python' salvo por
+    el redondeo de coma flotante (bincount suma las horas en otro orden), por lo
+    que deben compararse con tolerancia.
+    """
+    if np is None:
+        raise RuntimeError("El motor de facturación 'numpy' requiere tener NumPy instalado")
+    
+    # Una posición por instancia facturada, en el orden de las facturas
+    filas = []
+    longitudes = []
+    indice_configuracion = {}  # {id_configuracion: fila de la matriz}
+    tarifas = []
+    columnas = {}  # {id_recurso: columna de la matriz}
+    configuracion_por_posicion = []
+    
+    for instancias in facturas:
+        for _, _, filas_instancia, id_configuracion, lineas in instancias:
+            filas.extend(filas_instancia)
+            longitudes.append(len(filas_instancia))
+            if id_configuracion not in indice_configuracion:
+                indice_configuracion[id_configuracion] = len(tarifas)
+                tarifas.append(lineas)
+                for linea in lineas:
+                    columnas.setdefault(linea.id_recurso, len(columnas))
+            configuracion_por_posicion.append(indice_configuracion[id_configuracion])
+    
+    if not longitudes:
+        return [(0, []) for _ in facturas]
+    
+    # Horas por instancia: suma de los tiempos de sus filas
+    columna_tiempos = np.frombuffer(tiempos, dtype=np.float64)
+    tiempos_filas = columna_tiempos[np.array(filas, dtype=np.int64)]
+    del columna_tiempos  # liberar el buffer del array para que el almacén pueda crecer
+    grupos = np.repeat(np.arange(len(longitudes)), longitudes)
+    horas = np.bincount(grupos, weights=tiempos_filas, minlength=len(longitudes))
+    
+    # Matriz configuración x recurso de cantidades y vector de precios
+    cantidades = np.zeros((len(tarifas), len(columnas)))
+    precios = np.zeros(len(columnas))
+    for fila_configuracion, lineas in enumerate(tarifas):
+        for linea in lineas:
+            columna = columnas[linea.id_recurso]
+            cantidades[fila_configuracion, columna] = linea.cantidad
+            precios[columna] = linea.valor_x_hora
+    
+    # Costo de cada línea: (valor_x_hora * horas) * cantidad, como en el cálculo serial
+    costos = (precios[np.newaxis, :] * horas[:, np.newaxis]) * cantidades[np.array(configuracion_por_posicion, dtype=np.int64)]
+    horas = horas.tolist()
+    costos = costos.tolist()
+    
+    # Armar el resultado con el mismo formato que calcular_factura
+    resultados = []
+    posicion = 0
+    for instancias in facturas:
+        monto_total = 0
+        detalles = []
+        
+        for id_instancia, nombre_instancia, _, _, lineas in instancias:
+            tiempo_total = horas[posicion]
+            costos_instancia = costos[posicion]
+            posicion += 1
+            
+            monto_instancia = 0
+            detalles_recursos = []
+            for linea in lineas:
+                costo_recurso = costos_instancia[columnas[linea.id_recurso]]
+                monto_instancia += costo_recurso
+                detalles_recursos.append(DetalleRecurso(
+                    id_recurso=linea.id_recurso,
+                    nombre_recurso=linea.nombre_recurso,
+                    cantidad=linea.cantidad,
+                    valor_x_hora=linea.valor_x_hora,
+                    costo=costo_recurso
+                ))
+            
+            monto_total += monto_instancia
+            detalles.append((id_instancia, nombre_instancia, tiempo_total, monto_instancia, detalles_recursos))
+        
+        resultados.append((monto_total, detalles))
+    
+    return resultados
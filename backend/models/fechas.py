@@ -0,0 +1,35 @@
+from datetime import datetime, date, timedelta
+
+# Conversión de las fechas del sistema ('dd/mm/yyyy' y 'dd/mm/yyyy hh:mm') a
+# valores numéricos que se pueden comparar, ordenar y buscar con bisect
+
+_EPOCA = datetime(1970, 1, 1)
+
+def fechahora_a_epoch(fechahora: str) -> float:
+    """Convierte 'dd/mm/yyyy[ hh:mm]' a segundos desde la época; NaN si no tiene ese formato"""
+    try:
+        fecha = datetime(int(fechahora[6:10]), int(fechahora[3:5]), int(fechahora[0:2]))
+        if len(fechahora) >= 16:
+            fecha = fecha.replace(hour=int(fechahora[11:13]), minute=int(fechahora[14:16]))
+        return (fecha - _EPOCA).total_seconds()
+    except (TypeError, ValueError, IndexError):
+        return float('nan')
+
+def epoch_a_fechahora(segundos: float) -> str:
+    """Convierte segundos desde la época al formato 'dd/mm/yyyy hh:mm'"""
+    return (_EPOCA + timedelta(seconds=segundos)).strftime("%d/%m/%Y %H:%M")
+
+def fecha_a_ordinal(fecha: str) -> int:
+    """Convierte 'dd/mm/yyyy' (se ignora la hora) a ordinal de día; None si no tiene ese formato"""
+    try:
+        return date(int(fecha[6:10]), int(fecha[3:5]), int(fecha[0:2])).toordinal()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def fecha_a_epoch_inicio(fecha: str) -> float:
+    """Epoch del primer minuto del día 'dd/mm/yyyy'"""
+    return fechahora_a_epoch(fecha[:10])
+
+def fecha_a_epoch_fin(fecha: str) -> float:
+    """Epoch del último segundo del día 'dd/mm/yyyy'"""
+    return fechahora_a_epoch(fecha[:10]) + 86399
@@ -1,8 +0,0 @@
-from .recurso import Recurso
-from .categoria import Categoria
-from .configuracion import Configuracion
-from .cliente import Cliente
-from .instancia import Instancia
-from .consumo import Consumo
-from .factura import Factura, DetalleFactura
-from .sistema import Sistema
\ No newline at end of file
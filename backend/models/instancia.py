@@ -1,6 +1,8 @@
 from datetime import datetime
 
 class Instancia:
+    __slots__ = ('id', 'id_configuracion', 'nombre', 'fecha_inicio', 'estado', 'fecha_final', 'consumos', 'configuracion')
+    
     def __init__(self, id: int, id_configuracion: int, nombre: str, fecha_inicio: str, estado: str = "Vigente", fecha_final: str = None):
         self.id = id
         self.id_configuracion = id_configuracion
@@ -9,6 +11,7 @@ class Instancia:
         self.estado = estado  # "Vigente" o "Cancelada"
         self.fecha_final = fecha_final
         self.consumos = []  # Lista de horas consumidas
+        self.configuracion = None  # Configuracion resuelta por el Sistema
     
     def cancelar(self, fecha_final: str):
         """Cancela la instancia"""
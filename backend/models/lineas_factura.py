@@ -0,0 +1,219 @@
+from array import array
+from typing import Dict, List
+from .fechas import fecha_a_ordinal
+
+# Funciones de agregación y columnas numéricas que se pueden agregar
+FUNCIONES_MEDIDA = ('sum', 'count', 'avg')
+CAMPOS_MEDIDA = ('costo', 'cantidad', 'valor_x_hora')
+
+# Dimensiones por las que se puede agrupar o filtrar
+DIMENSIONES = (
+    'factura', 'cliente', 'fecha', 'mes', 'anio',
+    'instancia', 'configuracion', 'categoria', 'recurso', 'tipo_recurso'
+)
+
+class LineasFactura:
+    """Vista columnar de las líneas de recurso de todas las facturas.
+    
+    Cada fila es un DetalleRecurso junto con su factura y su instancia. Se
+    construye una vez desde sistema.facturas y se extiende con cada factura
+    nueva; las consultas agrupan, filtran y agregan en una sola pasada.
+    Las dimensiones derivadas (configuración, categoría, tipo de recurso)
+    se resuelven con el estado actual del sistema, una vez por valor distinto.
+    """
+    
+    def __init__(self):
+        # Datos de cada factura (una entrada por factura, referenciada por posición)
+        self.numeros: List[str] = []
+        self.nits: List[str] = []
+        self.fechas: List[str] = []
+        
+        # Columnas por línea
+        self.posiciones_factura = array('i')
+        self.ordinales = array('i')  # Ordinal de la fecha de factura (-1 si no es válida)
+        self.ids_instancia = array('q')
+        self.ids_recurso = array('q')
+        self.cantidades = array('d')
+        self.valores_x_hora = array('d')
+        self.costos = array('d')
+    
+    def __len__(self):
+        return len(self.costos)
+    
+    def agregar_factura(self, factura):
+        """Agrega las líneas de recurso de una factura"""
+        posicion = len(self.numeros)
+        self.numeros.append(factura.numero_factura)
+        self.nits.append(factura.nit_cliente)
+        self.fechas.append(factura.fecha)
+        ordinal = factura.fecha_ordinal if factura.fecha_ordinal is not None else -1
+        
+        for detalle in factura.detalles:
+            for recurso_det in detalle.detalles_recursos:
+                self.posiciones_factura.append(posicion)
+                self.ordinales.append(ordinal)
+                self.ids_instancia.append(detalle.id_instancia)
+                self.ids_recurso.append(recurso_det.id_recurso)
+                self.cantidades.append(recurso_det.cantidad)
+                self.valores_x_hora.append(recurso_det.valor_x_hora)
+                self.costos.append(recurso_det.costo)
+    
+    @classmethod
+    def desde_facturas(cls, facturas):
+        """Construye la vista a partir de una lista de facturas"""
+        lineas = cls()
+        for factura in facturas:
+            lineas.agregar_factura(factura)
+        return lineas
+    
+    def _columna_dimension(self, dimension: str, sistema):
+        """Devuelve (columna base, función que traduce un valor base al valor de la dimensión)"""
+        if dimension == 'factura':
+            return self.posiciones_factura, self.numeros.__getitem__
+        if dimension == 'cliente':
+            return self.posiciones_factura, self.nits.__getitem__
+        if dimension == 'fecha':
+            return self.posiciones_factura, self.fechas.__getitem__
+        if dimension == 'mes':
+            return self.posiciones_factura, lambda p: _parte_fecha(self.fechas[p], 2)
+        if dimension == 'anio':
+            return self.posiciones_factura, lambda p: _parte_fecha(self.fechas[p], 1)
+        if dimension == 'instancia':
+            return self.ids_instancia, None
+        if dimension == 'configuracion':
+            return self.ids_instancia, lambda i: _configuracion_de(sistema, i)
+        if dimension == 'categoria':
+            categoria_por_configuracion = {
+                configuracion.id: categoria.id
+                for categoria in sistema.categorias
+                for configuracion in categoria.configuraciones
+            }
+            return self.ids_instancia, lambda i: categoria_por_configuracion.get(_configuracion_de(sistema, i))
+        if dimension == 'recurso':
+            return self.ids_recurso, None
+        if dimension == 'tipo_recurso':
+            return self.ids_recurso, lambda r: _tipo_recurso_de(sistema, r)
+        raise ValueError(f"Dimensión desconocida: {dimension} (opciones: {', '.join(DIMENSIONES)})")
+    
+    def _extractor(self, dimension: str, sistema):
+        """Función fila -> valor de la dimensión, con memo por valor base"""
+        columna, traducir = self._columna_dimension(dimension, sistema)
+        if traducir is None:
+            return columna.__getitem__
+        memo = {}
+        
+        def extraer(fila):
+            base = columna[fila]
+            try:
+                return memo[base]
+            except KeyError:
+                valor = memo[base] = traducir(base)
+                return valor
+        return extraer
+    
+    def consultar(self, sistema, dimensiones: List[str], medidas: List[Dict], filtros: Dict = None):
+        """Agrupa las líneas por las dimensiones y calcula las medidas en una sola pasada.
+        
+        medidas: [{'funcion': 'sum'|'count'|'avg', 'campo': 'costo'|'cantidad'|'valor_x_hora'}]
+        filtros: {'fecha_inicio': 'dd/mm/yyyy', 'fecha_fin': 'dd/mm/yyyy', <dimensión>: valor o lista}
+        """
+        filtros = dict(filtros or {})
+        if not medidas:
+            medidas = [{'funcion': 'sum', 'campo': 'costo'}]
+        
+        # Validar medidas
+        columnas_medida = []
+        for medida in medidas:
+            funcion = medida.get('funcion')
+            campo = medida.get('campo', 'costo')
+            if funcion not in FUNCIONES_MEDIDA:
+                raise ValueError(f"Función de medida desconocida: {funcion} (opciones: {', '.join(FUNCIONES_MEDIDA)})")
+            if campo not in CAMPOS_MEDIDA:
+                raise ValueError(f"Campo de medida desconocido: {campo} (opciones: {', '.join(CAMPOS_MEDIDA)})")
+            columnas_medida.append((funcion, campo, self._columna_medida(campo)))
+        
+        # Rango de fechas
+        desde = hasta = None
+        if filtros.get('fecha_inicio'):
+            desde = fecha_a_ordinal(filtros.pop('fecha_inicio'))
+            if desde is None:
+                raise ValueError("Fecha de inicio inválida")
+        if filtros.get('fecha_fin'):
+            hasta = fecha_a_ordinal(filtros.pop('fecha_fin'))
+            if hasta is None:
+                raise ValueError("Fecha de fin inválida")
+        filtros.pop('fecha_inicio', None)
+        filtros.pop('fecha_fin', None)
+        
+        # Filtros por dimensión (se comparan como texto para aceptar ids numéricos o no)
+        condiciones = []
+        for dimension, valores in filtros.items():
+            if not isinstance(valores, (list, tuple)):
+                valores = [valores]
+            condiciones.append((self._extractor(dimension, sistema), {str(valor) for valor in valores}))
+        
+        extractores = [self._extractor(dimension, sistema) for dimension in dimensiones]
+        
+        # Pasada única: {clave de grupo: [suma, cuenta] por medida}
+        grupos = {}
+        ordinales = self.ordinales
+        escaneadas = 0
+        for fila in range(len(self.costos)):
+            if desde is not None and ordinales[fila] < desde:
+                continue
+            if hasta is not None and (ordinales[fila] > hasta or ordinales[fila] < 0):
+                continue
+            if condiciones and not all(str(extraer(fila)) in permitidos for extraer, permitidos in condiciones):
+                continue
+            escaneadas += 1
+            
+            clave = tuple(extraer(fila) for extraer in extractores)
+            acumulados = grupos.get(clave)
+            if acumulados is None:
+                acumulados = grupos[clave] = [[0, 0] for _ in columnas_medida]
+            for acumulado, (_, _, columna) in zip(acumulados, columnas_medida):
+                acumulado[0] += columna[fila]
+                acumulado[1] += 1
+        
+        filas = []
+        for clave in sorted(grupos, key=lambda c: tuple((valor is None, valor) for valor in c)):
+            resultado = dict(zip(dimensiones, clave))
+            for (funcion, campo, _), (suma, cuenta) in zip(columnas_medida, grupos[clave]):
+                if funcion == 'sum':
+                    valor = suma
+                elif funcion == 'count':
+                    valor = cuenta
+                else:
+                    valor = suma / cuenta if cuenta else None
+                resultado[f"{funcion}_{campo}"] = valor
+            filas.append(resultado)
+        
+        return {
+            'dimensiones': dimensiones,
+            'lineas_totales': len(self.costos),
+            'lineas_filtradas': escaneadas,
+            'filas': filas
+        }
+    
+    def _columna_medida(self, campo: str):
+        if campo == 'costo':
+            return self.costos
+        if campo == 'cantidad':
+            return self.cantidades
+        return self.valores_x_hora
+
+def _parte_fecha(fecha: str, partes: int):
+    """'dd/mm/yyyy' -> 'yyyy' (1 parte) o 'yyyy-mm' (2 partes)"""
+    try:
+        dia, mes, anio = fecha.split('/')
+    except (AttributeError, ValueError):
+        return None
+    return anio if partes == 1 else f"{anio}-{mes}"
+
+def _configuracion_de(sistema, id_instancia: int):
+    instancia = sistema.obtener_instancia_por_id(id_instancia)
+    return instancia.id_configuracion if instancia else None
+
+def _tipo_recurso_de(sistema, id_recurso: int):
+    recurso = sistema.obtener_recurso_por_id(id_recurso)
+    return recurso.tipo if recurso else None
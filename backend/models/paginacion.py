@@ -0,0 +1,20 @@
+from bisect import bisect_right
+from typing import NamedTuple, Sequence
+
+class Pagina(NamedTuple):
+    """Página de un listado: elementos, total de coincidencias y cursor de la siguiente página"""
+    elementos: list
+    total: int
+    siguiente_cursor: object  # None en la última página
+
+def paginar(claves_ordenadas: Sequence, cursor=None, limite: int = None):
+    """Corta una secuencia ordenada de claves después de `cursor` (la última clave entregada).
+    
+    Devuelve (claves de la página, siguiente cursor). La búsqueda del cursor es
+    binaria, así que el costo no depende de la posición de la página.
+    """
+    inicio = bisect_right(claves_ordenadas, cursor) if cursor is not None else 0
+    fin = len(claves_ordenadas) if limite is None else min(len(claves_ordenadas), inicio + limite)
+    claves = list(claves_ordenadas[inicio:fin])
+    siguiente = claves[-1] if claves and fin < len(claves_ordenadas) else None
+    return claves, siguiente
@@ -1,4 +1,6 @@
 class Recurso:
+    __slots__ = ('id', 'nombre', 'abreviatura', 'metrica', 'tipo', 'valor_x_hora')
+    
     def __init__(self, id: int, nombre: str, abreviatura: str, metrica: str, tipo: str, valor_x_hora: float):
         self.id = id
         self.nombre = nombre
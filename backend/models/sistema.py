@@ -1,75 +1,663 @@
-from typing import List
+import os
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+from typing import Callable, List, Dict, Iterable, Tuple
 from .recurso import Recurso
 from .categoria import Categoria
-from .configuracion import Configuracion
+from .configuracion import Configuracion, TarifaConfiguracion
 from .cliente import Cliente
 from .instancia import Instancia
 from .consumo import Consumo
+from .almacen_consumos import AlmacenConsumos, ConsumoVista
+from .fechas import fecha_a_ordinal, fecha_a_epoch_inicio, fecha_a_epoch_fin
 from .factura import Factura, DetalleFactura
+from .agregados_ingresos import AgregadosIngresos
+from .lineas_factura import LineasFactura
+from .paginacion import Pagina, paginar
+from .cache_serializacion import CacheSerializacion
+from . import facturacion
+from .facturacion import MOTORES_FACTURACION, calcular_factura, calcular_facturas_numpy, facturar_particiones
+
+# Colecciones persistidas por separado y la colección que modifica cada operación
+COLECCIONES = ('recursos', 'categorias', 'clientes', 'consumos', 'facturas')
+_COLECCION_POR_OPERACION = {
+    'agregar_recurso': 'recursos',
+    'eliminar_recurso': 'recursos',
+    'agregar_categoria': 'categorias',
+    'agregar_configuracion': 'categorias',
+    'eliminar_categoria': 'categorias',
+    'agregar_cliente': 'clientes',
+    'agregar_instancia': 'clientes',
+    'cancelar_instancia': 'clientes',
+    'eliminar_cliente': 'clientes',
+    'agregar_consumo': 'consumos',
+    'marcar_facturado': 'consumos',
+    'agregar_factura': 'facturas',
+}
 
 class Sistema:
     def __init__(self):
         self.recursos: List[Recurso] = []
         self.categorias: List[Categoria] = []
         self.clientes: List[Cliente] = []
-        self.consumos: List[Consumo] = []
+        self.consumos = AlmacenConsumos()
         self.facturas: List[Factura] = []
         self.proximo_id_factura = 1
         self.proximo_id_consumo = 1
+        
+        # Índices hash para búsquedas O(1)
+        self._recursos_por_id: Dict[int, Recurso] = {}
+        self._categorias_por_id: Dict[int, Categoria] = {}
+        self._configuraciones_por_id: Dict[int, Configuracion] = {}
+        self._clientes_por_nit: Dict[str, Cliente] = {}
+        self._instancias_por_id: Dict[int, Instancia] = {}
+        self._cliente_por_instancia: Dict[int, Cliente] = {}
+        self._facturas_por_numero: Dict[str, Factura] = {}
+        # Claves ordenadas para la paginación por cursor
+        self._nits_ordenados: List[str] = []
+        self._ids_instancia_ordenados: List[int] = []
+        self._ids_configuracion_ordenados: List[int] = []
+        self._instancias_por_estado: Dict[str, set] = {}
+        self._categoria_por_configuracion: Dict[int, Categoria] = {}
+        # Posiciones en self.facturas por número y por cliente
+        self._posicion_por_numero: Dict[str, int] = {}
+        self._facturas_por_nit: Dict[str, List[int]] = {}
+        # Índice temporal de facturas: (fecha_ordinal, posición en self.facturas) ordenado
+        self._facturas_por_fecha: List[tuple] = []
+        # Filas del almacén pendientes de facturar: {nit_cliente: {id_instancia: [fila]}}
+        self._consumos_no_facturados: Dict[str, Dict[int, List[int]]] = {}
+        # Ingresos por día de factura para los análisis de ventas
+        self._ingresos = AgregadosIngresos()
+        # Vista columnar de las líneas de factura para consultas agrupadas. Se construye en la primera
+        # consulta, que corre con el bloqueo compartido: el candado evita que dos lectores la construyan a la vez
+        self._lineas_factura: LineasFactura = None
+        self._candado_lineas_factura = threading.Lock()
+        # Tarifas por hora precalculadas por configuración y configuraciones que usan cada recurso
+        self._tarifas: Dict[int, TarifaConfiguracion] = {}
+        self._configuraciones_por_recurso: Dict[int, set] = {}
+        # Texto JSON ya serializado de cada entidad para los listados de la API
+        self.cache_json = CacheSerializacion()
+        
+        # Registro de cambios para el journal (desactivado por defecto)
+        self.ultima_secuencia_journal = 0
+        self._registrar_cambios = False
+        self._cambios: List[Dict] = []
+        # IDs de consumo presentes mientras se reproduce el journal (se descarta al activar el registro)
+        self._ids_consumo_reproduccion: set = None
+        
+        # Colecciones modificadas desde el último guardado (un sistema nuevo debe escribirse completo)
+        # y, de las que se modificaron solo por mutaciones conocidas, las claves de las entidades que
+        # cambiaron, en orden de modificación: ID, NIT o número (fila del almacén para los consumos).
+        # Sin claves = completa.
+        self._colecciones_modificadas = set(COLECCIONES)
+        self._claves_modificadas: Dict[str, dict] = {}
+        
+        # Sello de versión de los datos guardados (global y de cada colección). Lo sube el
+        # almacenamiento en cada guardado; con varios procesos indica cuándo hay que recargar.
+        # La generación identifica el conjunto de datos: un directorio nuevo o un reset la cambian,
+        # y se guarda junto al sello para que todos los procesos que lo cargan la compartan.
+        self.version_datos = 0
+        self.versiones_datos: Dict[str, int] = dict.fromkeys(COLECCIONES, 0)
+        self.generacion_datos = uuid.uuid4().hex[:12]
+        
+        # Contador de mutaciones y hora de la última de cada colección (ETag / Last-Modified), y el
+        # valor del contador que ya quedó en el sello guardado. Las mutaciones aún sin sellar solo
+        # existen en este proceso: el origen las distingue de las de cualquier otro (ver renovar_origen).
+        self.origen_versiones = uuid.uuid4().hex[:12]
+        self._versiones: Dict[str, int] = dict.fromkeys(COLECCIONES, 0)
+        self._versiones_selladas: Dict[str, int] = dict.fromkeys(COLECCIONES, 0)
+        self._modificado_en: Dict[str, float] = dict.fromkeys(COLECCIONES, time.time())
+    
+    def marcar_modificada(self, coleccion: str):
+        """Marca una colección como modificada por completo desde el último guardado"""
+        self._colecciones_modificadas.add(coleccion)
+        self._claves_modificadas.pop(coleccion, None)
+    
+    def extraer_colecciones_modificadas(self) -> set:
+        """Devuelve y limpia el conjunto de colecciones modificadas"""
+        return set(self.extraer_modificaciones())
+    
+    def extraer_modificaciones(self) -> Dict[str, dict]:
+        """Devuelve y limpia las modificaciones pendientes: {colección: claves modificadas, o None si es completa}"""
+        modificaciones = {
+            coleccion: self._claves_modificadas.get(coleccion)
+            for coleccion in self._colecciones_modificadas
+        }
+        self._colecciones_modificadas = set()
+        self._claves_modificadas = {}
+        return modificaciones
+    
+    def restaurar_modificaciones(self, modificaciones: Dict[str, dict]):
+        """Vuelve a marcar como pendientes modificaciones extraídas que no se pudieron guardar"""
+        for coleccion, claves in modificaciones.items():
+            if claves is None:
+                self.marcar_modificada(coleccion)
+            elif coleccion not in self._colecciones_modificadas:
+                self._colecciones_modificadas.add(coleccion)
+                self._claves_modificadas[coleccion] = dict(claves)
+            elif coleccion in self._claves_modificadas:
+                self._claves_modificadas[coleccion] = {**claves, **self._claves_modificadas[coleccion]}
+    
+    def colecciones_recargadas(self, colecciones: Iterable[str]):
+        """Reconstruye los índices después de reemplazar colecciones con lo guardado por otro proceso
+        y sube sus versiones (ETag) sin marcarlas como pendientes de guardar"""
+        self.reconstruir_indices()
+        ahora = time.time()
+        for coleccion in colecciones:
+            self._versiones[coleccion] += 1
+            self._modificado_en[coleccion] = ahora
+        self.versiones_selladas(colecciones)
+    
+    def versiones_selladas(self, colecciones: Iterable[str]):
+        """Indica que el contenido actual de las colecciones es el de su sello en versiones_datos
+        (recién guardadas o recargadas); desde aquí su etiqueta es solo la generación y el sello"""
+        for coleccion in colecciones:
+            self._versiones_selladas[coleccion] = self._versiones[coleccion]
+    
+    def renovar_origen(self):
+        """Cambia el origen de las mutaciones sin sellar; cada proceso creado con fork debe llamarlo
+        para que sus etiquetas no coincidan con las de sus hermanos"""
+        self.origen_versiones = uuid.uuid4().hex[:12]
+    
+    def version_colecciones(self, colecciones: Iterable[str] = COLECCIONES) -> Tuple[str, float]:
+        """Obtiene la etiqueta de versión y la hora de última modificación de un conjunto de colecciones.
+        
+        La etiqueta es la generación de los datos y el sello guardado de cada
+        colección, igual en todos los procesos que tengan el mismo contenido; si
+        alguna tiene mutaciones que aún no se guardaron se agregan su cantidad y
+        el origen de este proceso.
+        """
+        colecciones = tuple(colecciones)
+        partes = []
+        sin_sellar = False
+        for coleccion in colecciones:
+            pendientes = self._versiones[coleccion] - self._versiones_selladas[coleccion]
+            if pendientes:
+                sin_sellar = True
+                partes.append(f"{self.versiones_datos[coleccion]}+{pendientes}")
+            else:
+                partes.append(str(self.versiones_datos[coleccion]))
+        etiqueta = self.generacion_datos + '-' + '.'.join(partes)
+        if sin_sellar:
+            etiqueta += '-' + self.origen_versiones
+        return etiqueta, max(self._modificado_en[c] for c in colecciones)
+    
+    def activar_registro_cambios(self):
+        """Activa el registro de mutaciones para el journal"""
+        self._registrar_cambios = True
+        self._ids_consumo_reproduccion = None
+    
+    def extraer_cambios(self) -> List[Dict]:
+        """Devuelve y limpia los cambios registrados desde la última extracción"""
+        cambios = self._cambios
+        self._cambios = []
+        return cambios
+    
+    def _registrar(self, operacion: str, claves: Iterable, datos: Callable[[], object]):
+        """Registra una mutación, marca las entidades que modifica y sube la versión de su colección.
+        
+        `datos` construye el registro del journal; solo se llama con el journal activo.
+        """
+        coleccion = _COLECCION_POR_OPERACION[operacion]
+        if coleccion not in self._colecciones_modificadas:
+            self._colecciones_modificadas.add(coleccion)
+            self._claves_modificadas[coleccion] = {}
+        claves_coleccion = self._claves_modificadas.get(coleccion)
+        if claves_coleccion is not None:
+            claves_coleccion.update(dict.fromkeys(claves))
+        self._versiones[coleccion] += 1
+        self._modificado_en[coleccion] = time.time()
+        if self._registrar_cambios:
+            self._cambios.append({'op': operacion, 'datos': datos()})
+    
+    def aplicar_cambio(self, operacion: str, datos):
+        """Aplica un cambio registrado en el journal sobre el sistema.
+        
+        Es idempotente: lo que el snapshot ya contiene (por ID, NIT o número) se
+        omite. Un checkpoint interrumpido puede dejar colecciones guardadas con
+        cambios cuyo registro sigue en el journal, y volver a reproducirlo no debe
+        duplicarlos.
+        """
+        if operacion == 'agregar_recurso':
+            if datos['id'] not in self._recursos_por_id:
+                self.agregar_recurso(Recurso.from_dict(datos))
+        elif operacion == 'agregar_categoria':
+            if datos['id'] not in self._categorias_por_id:
+                self.agregar_categoria(Categoria.from_dict(datos))
+        elif operacion == 'agregar_configuracion':
+            categoria = self.obtener_categoria_por_id(datos['categoria_id'])
+            if categoria and datos['configuracion']['id'] not in self._configuraciones_por_id:
+                self.agregar_configuracion(categoria, Configuracion.from_dict(datos['configuracion']))
+        elif operacion == 'agregar_cliente':
+            if datos['nit'] not in self._clientes_por_nit:
+                self.agregar_cliente(Cliente.from_dict(datos))
+        elif operacion == 'agregar_instancia':
+            cliente = self.obtener_cliente_por_nit(datos['nit'])
+            if cliente and datos['instancia']['id'] not in self._instancias_por_id:
+                self.agregar_instancia(cliente, Instancia.from_dict(datos['instancia']))
+        elif operacion == 'cancelar_instancia':
+            self.cancelar_instancia(datos['nit'], datos['instancia_id'], datos['fecha_final'])
+        elif operacion == 'eliminar_recurso':
+            self.eliminar_recurso(datos)
+        elif operacion == 'eliminar_categoria':
+            self.eliminar_categoria(datos)
+        elif operacion == 'eliminar_cliente':
+            self.eliminar_cliente(datos)
+        elif operacion == 'agregar_consumo':
+            if self._ids_consumo_reproduccion is None:
+                self._ids_consumo_reproduccion = set(self.consumos.ids)
+            if datos['consumo']['id'] not in self._ids_consumo_reproduccion:
+                self.agregar_consumo(Consumo.from_dict(datos['consumo']))
+                self._ids_consumo_reproduccion.add(datos['consumo']['id'])
+            self.proximo_id_consumo = max(self.proximo_id_consumo, datos['proximo_id_consumo'])
+        elif operacion == 'agregar_factura':
+            if datos['factura']['numero_factura'] not in self._facturas_por_numero:
+                self.agregar_factura(Factura.from_dict(datos['factura']))
+            self.proximo_id_factura = max(self.proximo_id_factura, datos['proximo_id_factura'])
+        elif operacion == 'marcar_facturado':
+            # Las filas ya facturadas no están en el índice de pendientes
+            ids = set(datos['ids'])
+            ids_fila = self.consumos.ids
+            filas_por_instancia = {}
+            for id_instancia, filas in self._consumos_no_facturados.get(datos['nit'], {}).items():
+                facturadas = [fila for fila in filas if ids_fila[fila] in ids]
+                if facturadas:
+                    filas_por_instancia[id_instancia] = facturadas
+            if filas_por_instancia:
+                self._marcar_filas_facturadas(datos['nit'], filas_por_instancia)
+        else:
+            raise ValueError(f"Operación de journal desconocida: {operacion}")
+    
+    def reconstruir_indices(self):
+        """Reconstruye todos los índices a partir de las listas del sistema"""
+        self._recursos_por_id = {recurso.id: recurso for recurso in self.recursos}
+        self._categorias_por_id = {}
+        self._configuraciones_por_id = {}
+        self._categoria_por_configuracion = {}
+        for categoria in self.categorias:
+            self._indexar_categoria(categoria)
+        self._clientes_por_nit = {}
+        self._instancias_por_id = {}
+        self._cliente_por_instancia = {}
+        self._instancias_por_estado = {}
+        for cliente in self.clientes:
+            self._indexar_cliente(cliente)
+        self._nits_ordenados = sorted(self._clientes_por_nit)
+        self._ids_instancia_ordenados = sorted(self._instancias_por_id)
+        self._ids_configuracion_ordenados = sorted(self._configuraciones_por_id)
+        self._facturas_por_numero = {factura.numero_factura: factura for factura in self.facturas}
+        self._posicion_por_numero = {}
+        self._facturas_por_nit = {}
+        for posicion, factura in enumerate(self.facturas):
+            self._posicion_por_numero[factura.numero_factura] = posicion
+            self._facturas_por_nit.setdefault(factura.nit_cliente, []).append(posicion)
+        self._facturas_por_fecha = sorted(
+            (factura.fecha_ordinal, posicion)
+            for posicion, factura in enumerate(self.facturas)
+            if factura.fecha_ordinal is not None
+        )
+        self._consumos_no_facturados = {}
+        for fila in self.consumos.filtrar(facturado=False):
+            self._indexar_consumo(fila)
+        self._tarifas = {}
+        self._configuraciones_por_recurso = {}
+        self._ingresos.reconstruir(self.facturas)
+        self._lineas_factura = None
+        self.cache_json.limpiar()
+    
+    def _indexar_categoria(self, categoria: Categoria):
+        """Registra una categoría y sus configuraciones en los índices"""
+        self._categorias_por_id[categoria.id] = categoria
+        for configuracion in categoria.configuraciones:
+            self._configuraciones_por_id[configuracion.id] = configuracion
+            self._categoria_por_configuracion[configuracion.id] = categoria
+            self._tarifas.pop(configuracion.id, None)
+    
+    def _indexar_cliente(self, cliente: Cliente):
+        """Registra un cliente y sus instancias en los índices"""
+        self._clientes_por_nit[cliente.nit] = cliente
+        for instancia in cliente.instancias:
+            self._indexar_instancia(cliente, instancia)
+    
+    def _indexar_consumo(self, fila: int):
+        """Registra una fila pendiente del almacén en el índice de no facturados"""
+        if self.consumos.facturados[fila]:
+            return
+        nit_cliente = self.consumos.nits[self.consumos.claves_cliente[fila]]
+        por_instancia = self._consumos_no_facturados.setdefault(nit_cliente, {})
+        por_instancia.setdefault(self.consumos.ids_instancia[fila], []).append(fila)
+    
+    def _indexar_instancia(self, cliente: Cliente, instancia: Instancia):
+        """Registra una instancia y resuelve su configuración"""
+        self._instancias_por_id[instancia.id] = instancia
+        self._cliente_por_instancia[instancia.id] = cliente
+        self._instancias_por_estado.setdefault(instancia.estado, set()).add(instancia.id)
+        instancia.configuracion = self._configuraciones_por_id.get(instancia.id_configuracion)
+    
+    @staticmethod
+    def _insertar_ordenado(claves: List, clave):
+        """Inserta una clave en una lista ordenada si no está"""
+        posicion = bisect_left(claves, clave)
+        if posicion == len(claves) or claves[posicion] != clave:
+            claves.insert(posicion, clave)
+    
+    @staticmethod
+    def _quitar_ordenado(claves: List, clave):
+        """Quita una clave de una lista ordenada si está"""
+        posicion = bisect_left(claves, clave)
+        if posicion < len(claves) and claves[posicion] == clave:
+            del claves[posicion]
     
     # MÉTODOS FALTANTES AGREGADOS
     def agregar_recurso(self, recurso: Recurso):
         """Agrega un recurso al sistema"""
         self.recursos.append(recurso)
+        self._recursos_por_id[recurso.id] = recurso
+        self._invalidar_tarifas_recurso(recurso.id)
+        self._invalidar_json_recurso(recurso.id)
+        self._registrar('agregar_recurso', (recurso.id,), recurso.to_dict)
     
     def agregar_categoria(self, categoria: Categoria):
         """Agrega una categoría al sistema"""
         self.categorias.append(categoria)
+        self._indexar_categoria(categoria)
+        for configuracion in categoria.configuraciones:
+            self._insertar_ordenado(self._ids_configuracion_ordenados, configuracion.id)
+            self.cache_json.invalidar('configuracion', configuracion.id)
+        self.cache_json.invalidar('categoria', categoria.id)
+        self._registrar('agregar_categoria', (categoria.id,), categoria.to_dict)
+    
+    def agregar_configuracion(self, categoria: Categoria, configuracion: Configuracion):
+        """Agrega una configuración a una categoría del sistema"""
+        categoria.agregar_configuracion(configuracion)
+        self._configuraciones_por_id[configuracion.id] = configuracion
+        self._categoria_por_configuracion[configuracion.id] = categoria
+        self._insertar_ordenado(self._ids_configuracion_ordenados, configuracion.id)
+        self._tarifas.pop(configuracion.id, None)
+        self._invalidar_json_configuracion(categoria, configuracion.id)
+        self._registrar('agregar_configuracion', (categoria.id,), lambda: {'categoria_id': categoria.id, 'configuracion': configuracion.to_dict()})
     
     def agregar_cliente(self, cliente: Cliente):
         """Agrega un cliente al sistema"""
         self.clientes.append(cliente)
+        self._indexar_cliente(cliente)
+        self._insertar_ordenado(self._nits_ordenados, cliente.nit)
+        for instancia in cliente.instancias:
+            self._insertar_ordenado(self._ids_instancia_ordenados, instancia.id)
+            self.cache_json.invalidar('instancia', instancia.id)
+        self.cache_json.invalidar('cliente', cliente.nit)
+        self._registrar('agregar_cliente', (cliente.nit,), cliente.to_dict)
+    
+    def agregar_instancia(self, cliente: Cliente, instancia: Instancia):
+        """Agrega una instancia a un cliente del sistema"""
+        cliente.agregar_instancia(instancia)
+        self._indexar_instancia(cliente, instancia)
+        self._insertar_ordenado(self._ids_instancia_ordenados, instancia.id)
+        self.cache_json.invalidar('instancia', instancia.id)
+        self.cache_json.invalidar('cliente', cliente.nit)
+        self._registrar('agregar_instancia', (cliente.nit,), lambda: {'nit': cliente.nit, 'instancia': instancia.to_dict()})
+    
+    def cancelar_instancia(self, nit: str, instancia_id: int, fecha_final: str) -> bool:
+        """Cancela una instancia de un cliente del sistema"""
+        cliente = self.obtener_cliente_por_nit(nit)
+        instancia = cliente.obtener_instancia_por_id(instancia_id) if cliente else None
+        estado_anterior = instancia.estado if instancia else None
+        if not cliente or not cliente.cancelar_instancia(instancia_id, fecha_final):
+            return False
+        self._instancias_por_estado.get(estado_anterior, set()).discard(instancia_id)
+        self._instancias_por_estado.setdefault(instancia.estado, set()).add(instancia_id)
+        self.cache_json.invalidar('instancia', instancia_id)
+        self.cache_json.invalidar('cliente', nit)
+        self._registrar('cancelar_instancia', (nit,), lambda: {'nit': nit, 'instancia_id': instancia_id, 'fecha_final': fecha_final})
+        return True
     
     def agregar_factura(self, factura: Factura):
         """Agrega una factura al sistema"""
         self.facturas.append(factura)
+        self._facturas_por_numero[factura.numero_factura] = factura
+        self._posicion_por_numero[factura.numero_factura] = len(self.facturas) - 1
+        self._facturas_por_nit.setdefault(factura.nit_cliente, []).append(len(self.facturas) - 1)
+        if factura.fecha_ordinal is not None:
+            insort(self._facturas_por_fecha, (factura.fecha_ordinal, len(self.facturas) - 1))
+        self._ingresos.agregar_factura(factura)
+        if self._lineas_factura is not None:
+            self._lineas_factura.agregar_factura(factura)
+        self._registrar('agregar_factura', (factura.numero_factura,), lambda: {'factura': factura.to_dict(), 'proximo_id_factura': self.proximo_id_factura})
+    
+    def eliminar_recurso(self, recurso_id: int):
+        """Elimina un recurso del sistema"""
+        self.recursos = [r for r in self.recursos if r.id != recurso_id]
+        self._recursos_por_id.pop(recurso_id, None)
+        self._invalidar_tarifas_recurso(recurso_id)
+        self._invalidar_json_recurso(recurso_id)
+        self._registrar('eliminar_recurso', (recurso_id,), lambda: recurso_id)
+    
+    def eliminar_categoria(self, categoria_id: int):
+        """Elimina una categoría y sus configuraciones del sistema"""
+        categoria = self._categorias_por_id.pop(categoria_id, None)
+        if categoria:
+            for configuracion in categoria.configuraciones:
+                self._configuraciones_por_id.pop(configuracion.id, None)
+                self._categoria_por_configuracion.pop(configuracion.id, None)
+                self._quitar_ordenado(self._ids_configuracion_ordenados, configuracion.id)
+                self._tarifas.pop(configuracion.id, None)
+                self._invalidar_json_configuracion(categoria, configuracion.id)
+        self.cache_json.invalidar('categoria', categoria_id)
+        self.categorias = [c for c in self.categorias if c.id != categoria_id]
+        self._registrar('eliminar_categoria', (categoria_id,), lambda: categoria_id)
+    
+    def eliminar_cliente(self, nit: str):
+        """Elimina un cliente y sus instancias del sistema"""
+        cliente = self._clientes_por_nit.pop(nit, None)
+        if cliente:
+            self._quitar_ordenado(self._nits_ordenados, nit)
+            for instancia in cliente.instancias:
+                self._instancias_por_id.pop(instancia.id, None)
+                self._cliente_por_instancia.pop(instancia.id, None)
+                self._quitar_ordenado(self._ids_instancia_ordenados, instancia.id)
+                self._instancias_por_estado.get(instancia.estado, set()).discard(instancia.id)
+                self.cache_json.invalidar('instancia', instancia.id)
+        self.cache_json.invalidar('cliente', nit)
+        self.clientes = [c for c in self.clientes if c.nit != nit]
+        self._registrar('eliminar_cliente', (nit,), lambda: nit)
+    
+    def obtener_tarifa_configuracion(self, configuracion: Configuracion) -> TarifaConfiguracion:
+        """Obtiene la tarifa por hora de una configuración, calculándola solo si no está en caché"""
+        tarifa = self._tarifas.get(configuracion.id)
+        if tarifa is None:
+            tarifa = configuracion.calcular_tarifa(self)
+            self._tarifas[configuracion.id] = tarifa
+            for recurso_id in configuracion.recursos:
+                self._configuraciones_por_recurso.setdefault(recurso_id, set()).add(configuracion.id)
+        return tarifa
+    
+    def _invalidar_tarifas_recurso(self, recurso_id: int):
+        """Descarta las tarifas de las configuraciones que usan un recurso cuyo precio cambió"""
+        for configuracion_id in self._configuraciones_por_recurso.pop(recurso_id, ()):
+            self._tarifas.pop(configuracion_id, None)
+    
+    def _invalidar_json_recurso(self, recurso_id: int):
+        """Descarta el JSON de un recurso y el de las entidades que muestran tarifas (configuraciones e instancias)"""
+        self.cache_json.invalidar('recurso', recurso_id)
+        self.cache_json.invalidar_tipo('configuracion')
+        self.cache_json.invalidar_tipo('instancia')
+    
+    def _invalidar_json_configuracion(self, categoria: Categoria, configuracion_id: int):
+        """Descarta el JSON de una configuración, de su categoría y de las instancias (que muestran su costo por hora)"""
+        self.cache_json.invalidar('configuracion', configuracion_id)
+        self.cache_json.invalidar('categoria', categoria.id)
+        self.cache_json.invalidar_tipo('instancia')
     
     def obtener_recurso_por_id(self, recurso_id: int):
         """Obtiene un recurso por su ID"""
-        for recurso in self.recursos:
-            if recurso.id == recurso_id:
-                return recurso
-        return None
+        return self._recursos_por_id.get(recurso_id)
     
     def obtener_categoria_por_id(self, categoria_id: int):
         """Obtiene una categoría por su ID"""
-        for categoria in self.categorias:
-            if categoria.id == categoria_id:
-                return categoria
-        return None
+        return self._categorias_por_id.get(categoria_id)
     
     def obtener_cliente_por_nit(self, nit: str):
         """Obtiene un cliente por su NIT"""
-        for cliente in self.clientes:
-            if cliente.nit == nit:
-                return cliente
-        return None
+        return self._clientes_por_nit.get(nit)
     
     def obtener_configuracion_por_id(self, configuracion_id: int):
         """Obtiene una configuración por su ID"""
-        for categoria in self.categorias:
-            for configuracion in categoria.configuraciones:
-                if configuracion.id == configuracion_id:
-                    return configuracion
-        return None
+        return self._configuraciones_por_id.get(configuracion_id)
     
     def obtener_instancia_por_id(self, instancia_id: int):
         """Obtiene una instancia por su ID"""
-        for cliente in self.clientes:
-            for instancia in cliente.instancias:
-                if instancia.id == instancia_id:
-                    return instancia
-        return None
+        return self._instancias_por_id.get(instancia_id)
+    
+    def obtener_cliente_de_instancia(self, instancia_id: int):
+        """Obtiene el cliente dueño de una instancia"""
+        return self._cliente_por_instancia.get(instancia_id)
+    
+    def obtener_configuracion_de_instancia(self, instancia: Instancia):
+        """Obtiene la configuración de una instancia y actualiza su referencia resuelta.
+        
+        La referencia se compara por identidad con el índice: si la configuración
+        se eliminó o se volvió a agregar con el mismo id, la referencia guardada
+        ya no es la del índice y se reemplaza.
+        """
+        configuracion = self._configuraciones_por_id.get(instancia.id_configuracion)
+        if instancia.configuracion is not configuracion:
+            instancia.configuracion = configuracion
+        return configuracion
+    
+    def obtener_factura_por_numero(self, numero_factura: str):
+        """Obtiene una factura por su número"""
+        return self._facturas_por_numero.get(numero_factura)
+    
+    def obtener_facturas_en_rango(self, fecha_inicio: str, fecha_fin: str) -> List[Factura]:
+        """Obtiene las facturas con fecha entre fecha_inicio y fecha_fin ('dd/mm/yyyy'), en O(log n + k)"""
+        inicio = fecha_a_ordinal(fecha_inicio)
+        fin = fecha_a_ordinal(fecha_fin)
+        if inicio is None or fin is None:
+            return []
+        desde = bisect_left(self._facturas_por_fecha, (inicio, -1))
+        hasta = bisect_right(self._facturas_por_fecha, (fin, len(self.facturas)))
+        return [self.facturas[posicion] for _, posicion in self._facturas_por_fecha[desde:hasta]]
+    
+    def obtener_ingresos_por_configuracion(self, fecha_inicio: str, fecha_fin: str) -> Dict[int, float]:
+        """Obtiene el ingreso facturado por configuración entre dos fechas ('dd/mm/yyyy')"""
+        inicio = fecha_a_ordinal(fecha_inicio)
+        fin = fecha_a_ordinal(fecha_fin)
+        if inicio is None or fin is None:
+            return {}
+        return self._ingresos.sumar_por_configuracion(inicio, fin, self.obtener_instancia_por_id)
+    
+    def obtener_ingresos_por_recurso(self, fecha_inicio: str, fecha_fin: str) -> Dict[int, float]:
+        """Obtiene el ingreso facturado por recurso entre dos fechas ('dd/mm/yyyy')"""
+        inicio = fecha_a_ordinal(fecha_inicio)
+        fin = fecha_a_ordinal(fecha_fin)
+        if inicio is None or fin is None:
+            return {}
+        return self._ingresos.sumar_por_recurso(inicio, fin)
+    
+    def consultar_lineas_factura(self, dimensiones: List[str], medidas: List[Dict], filtros: Dict = None) -> Dict:
+        """Agrupa las líneas de recurso de las facturas por dimensiones y calcula medidas"""
+        lineas = self._lineas_factura
+        if lineas is None:
+            with self._candado_lineas_factura:
+                if self._lineas_factura is None:
+                    self._lineas_factura = LineasFactura.desde_facturas(self.facturas)
+                lineas = self._lineas_factura
+        return lineas.consultar(self, dimensiones, medidas, filtros)
+    
+    def obtener_categoria_de_configuracion(self, configuracion_id: int):
+        """Obtiene la categoría a la que pertenece una configuración"""
+        return self._categoria_por_configuracion.get(configuracion_id)
+    
+    def listar_clientes(self, nits: List[str] = None, cursor: str = None, limite: int = None) -> Pagina:
+        """Lista clientes ordenados por NIT, opcionalmente solo los NITs indicados"""
+        if nits is not None:
+            claves = sorted(nit for nit in set(nits) if nit in self._clientes_por_nit)
+        else:
+            claves = self._nits_ordenados
+        pagina, siguiente = paginar(claves, cursor, limite)
+        return Pagina([self._clientes_por_nit[nit] for nit in pagina], len(claves), siguiente)
+    
+    def listar_instancias(self, ids: List[int] = None, nits: List[str] = None, estado: str = None,
+                          cursor: int = None, limite: int = None) -> Pagina:
+        """Lista instancias ordenadas por ID, filtradas por IDs, NIT del cliente y estado"""
+        candidatos = None
+        if ids is not None:
+            candidatos = {id_instancia for id_instancia in ids if id_instancia in self._instancias_por_id}
+        if nits is not None:
+            del_cliente = set()
+            for nit in nits:
+                cliente = self._clientes_por_nit.get(nit)
+                if cliente:
+                    del_cliente.update(instancia.id for instancia in cliente.instancias)
+            candidatos = del_cliente if candidatos is None else candidatos & del_cliente
+        if estado is not None:
+            por_estado = self._instancias_por_estado.get(estado, set())
+            candidatos = por_estado if candidatos is None else candidatos & por_estado
+        
+        claves = self._ids_instancia_ordenados if candidatos is None else sorted(candidatos)
+        pagina, siguiente = paginar(claves, cursor, limite)
+        return Pagina([self._instancias_por_id[id_instancia] for id_instancia in pagina], len(claves), siguiente)
+    
+    def listar_configuraciones(self, ids: List[int] = None, id_categoria: int = None,
+                               cursor: int = None, limite: int = None) -> Pagina:
+        """Lista configuraciones ordenadas por ID, filtradas por IDs y categoría"""
+        candidatos = None
+        if ids is not None:
+            candidatos = {id_configuracion for id_configuracion in ids if id_configuracion in self._configuraciones_por_id}
+        if id_categoria is not None:
+            categoria = self._categorias_por_id.get(id_categoria)
+            de_categoria = {configuracion.id for configuracion in categoria.configuraciones} if categoria else set()
+            candidatos = de_categoria if candidatos is None else candidatos & de_categoria
+        
+        claves = self._ids_configuracion_ordenados if candidatos is None else sorted(candidatos)
+        pagina, siguiente = paginar(claves, cursor, limite)
+        return Pagina([self._configuraciones_por_id[id_configuracion] for id_configuracion in pagina], len(claves), siguiente)
+    
+    def listar_facturas(self, numeros: List[str] = None, nits: List[str] = None, fecha_inicio: str = None,
+                        fecha_fin: str = None, cursor: int = None, limite: int = None) -> Pagina:
+        """Lista facturas en orden de emisión, filtradas por número, NIT y rango de fechas.
+        
+        El cursor es la posición de la última factura entregada (las facturas no se eliminan).
+        """
+        candidatos = None
+        if numeros is not None:
+            candidatos = {self._posicion_por_numero[numero] for numero in numeros if numero in self._posicion_por_numero}
+        if nits is not None:
+            del_cliente = set()
+            for nit in nits:
+                del_cliente.update(self._facturas_por_nit.get(nit, ()))
+            candidatos = del_cliente if candidatos is None else candidatos & del_cliente
+        
+        if fecha_inicio is not None or fecha_fin is not None:
+            inicio = fecha_a_ordinal(fecha_inicio) if fecha_inicio is not None else float('-inf')
+            fin = fecha_a_ordinal(fecha_fin) if fecha_fin is not None else float('inf')
+            if inicio is None or fin is None:
+                return Pagina([], 0, None)
+            if candidatos is None:
+                # Solo rango de fechas: el índice temporal da las posiciones (y el total) directamente
+                desde = bisect_left(self._facturas_por_fecha, (inicio, -1))
+                hasta = bisect_right(self._facturas_por_fecha, (fin, len(self.facturas)))
+                claves = sorted(posicion for _, posicion in self._facturas_por_fecha[desde:hasta])
+            else:
+                claves = sorted(
+                    posicion for posicion in candidatos
+                    if self.facturas[posicion].fecha_ordinal is not None
+                    and inicio <= self.facturas[posicion].fecha_ordinal <= fin
+                )
+        else:
+            claves = range(len(self.facturas)) if candidatos is None else sorted(candidatos)
+        
+        pagina, siguiente = paginar(claves, cursor, limite)
+        return Pagina([self.facturas[posicion] for posicion in pagina], len(claves), siguiente)
+    
+    def obtener_consumos_en_rango(self, fecha_inicio: str, fecha_fin: str) -> List[ConsumoVista]:
+        """Obtiene los consumos entre el inicio de fecha_inicio y el final de fecha_fin, en orden temporal"""
+        filas = self.consumos.filas_en_rango(fecha_a_epoch_inicio(fecha_inicio), fecha_a_epoch_fin(fecha_fin))
+        return [self.consumos.vista(fila) for fila in filas]
     
     def generar_numero_factura(self):
         """Genera un número de factura único"""
@@ -84,26 +672,84 @@ class Sistema:
         return id_actual
     
     def agregar_consumo(self, consumo: Consumo):
-        """Agrega un consumo al sistema"""
-        self.consumos.append(consumo)
+        """Agrega un consumo al sistema (se copia al almacén columnar)"""
+        fila = self.consumos.append(consumo)
+        self._indexar_consumo(fila)
+        self._registrar('agregar_consumo', (fila,), lambda: {'consumo': consumo.to_dict(), 'proximo_id_consumo': self.proximo_id_consumo})
+    
+    def marcar_como_facturado(self, consumo: ConsumoVista):
+        """Marca un consumo del almacén como facturado y lo retira del índice de pendientes"""
+        consumo.marcar_como_facturado()
+        self._registrar('marcar_facturado', (consumo.fila,), lambda: {'nit': consumo.nit_cliente, 'ids': [consumo.id]})
+        por_instancia = self._consumos_no_facturados.get(consumo.nit_cliente)
+        if not por_instancia:
+            return
+        pendientes = por_instancia.get(consumo.id_instancia)
+        if pendientes and consumo.fila in pendientes:
+            pendientes.remove(consumo.fila)
+            if not pendientes:
+                del por_instancia[consumo.id_instancia]
+        if not por_instancia:
+            del self._consumos_no_facturados[consumo.nit_cliente]
+    
+    def _marcar_filas_facturadas(self, nit_cliente: str, filas_por_instancia: Dict[int, List[int]]):
+        """Marca como facturadas filas de un cliente y las retira del índice de pendientes"""
+        pendientes_cliente = self._consumos_no_facturados.get(nit_cliente, {})
+        filas = []
+        for id_instancia, filas_instancia in filas_por_instancia.items():
+            filas.extend(filas_instancia)
+            pendientes = pendientes_cliente.get(id_instancia)
+            if pendientes:
+                facturadas = set(filas_instancia)
+                restantes = [fila for fila in pendientes if fila not in facturadas]
+                if restantes:
+                    pendientes_cliente[id_instancia] = restantes
+                else:
+                    del pendientes_cliente[id_instancia]
+        if not pendientes_cliente:
+            self._consumos_no_facturados.pop(nit_cliente, None)
+        
+        self.consumos.marcar_facturados(filas)
+        ids = self.consumos.ids
+        self._registrar('marcar_facturado', filas, lambda: {'nit': nit_cliente, 'ids': [ids[fila] for fila in filas]})
     
     def obtener_consumos_no_facturados(self, nit_cliente: str = None):
         """Obtiene consumos no facturados, opcionalmente filtrados por cliente"""
-        consumos_no_facturados = [c for c in self.consumos if not c.facturado]
-        
         if nit_cliente:
-            consumos_no_facturados = [c for c in consumos_no_facturados if c.nit_cliente == nit_cliente]
+            por_instancia = self._consumos_no_facturados.get(nit_cliente, {})
+            return [self.consumos.vista(f) for filas in por_instancia.values() for f in filas]
         
-        return consumos_no_facturados
+        return [
+            self.consumos.vista(f)
+            for por_instancia in self._consumos_no_facturados.values()
+            for filas in por_instancia.values()
+            for f in filas
+        ]
     
     def obtener_consumos_por_instancia(self, id_instancia: int):
         """Obtiene todos los consumos de una instancia"""
-        return [c for c in self.consumos if c.id_instancia == id_instancia]
+        return [self.consumos.vista(f) for f in self.consumos.filtrar(id_instancia=id_instancia)]
     
-    def generar_facturacion(self, fecha_inicio: str, fecha_fin: str):
-        """Genera facturas para todos los clientes con consumos no facturados en el rango de fechas"""
+    def generar_facturacion(self, fecha_inicio: str, fecha_fin: str, resumen: dict = None, trabajadores: int = 1,
+                            motor: str = 'python'):
+        """Genera facturas para todos los clientes con consumos no facturados en el rango de fechas.
+        
+        Solo se recorren los consumos del rango (índice temporal); los de fuera del
+        rango quedan pendientes. Con el motor 'python', trabajadores > 1 (como
+        máximo uno por CPU) y al menos facturacion.MIN_CONSUMOS_PARALELO consumos
+        en el rango, los clientes se reparten en particiones contiguas por NIT y
+        cada proceso filtra, agrupa, suma y calcula las facturas de la suya; el motor
+        'numpy' las calcula vectorizadas en este proceso. Los números se asignan
+        siempre aquí, en orden de NIT, por lo que el resultado en procesos es
+        idéntico al serial y el del motor 'numpy' solo difiere en el redondeo de
+        los montos. Si se pasa `resumen`, se llena con los consumos escaneados,
+        facturados y sin fecha válida.
+        """
         from utils.validators import Validador
         
+        if motor not in MOTORES_FACTURACION:
+            raise ValueError(f"Motor de facturación desconocido: {motor}")
+        
         facturas_generadas = []
         
         # Extraer fechas válidas
@@ -113,92 +759,165 @@ class Sistema:
         if not fecha_inicio_dt or not fecha_fin_dt:
             raise ValueError("Fechas inválidas")
         
-        # Para cada cliente, generar factura si tiene consumos no facturados
-        for cliente in self.clientes:
-            consumos_cliente = self.obtener_consumos_no_facturados(cliente.nit)
-            
-            if consumos_cliente:
-                factura = self._generar_factura_cliente(cliente, consumos_cliente, fecha_fin)
-                if factura:
-                    facturas_generadas.append(factura)
-                    
-                    # Marcar consumos como facturados
-                    for consumo in consumos_cliente:
-                        consumo.marcar_como_facturado()
+        # Consumos del rango. Los guardados con una fecha que no existe no caben en
+        # ningún rango: se incluyen en cualquier facturación y se reportan
+        filas_rango = self.consumos.filas_en_rango(fecha_a_epoch_inicio(fecha_inicio_dt), fecha_a_epoch_fin(fecha_fin_dt))
+        facturados = self.consumos.facturados
+        sin_fecha = [fila for fila in self.consumos.filas_sin_fecha if not facturados[fila]]
+        
+        # Agrupar los pendientes por cliente e instancia y calcular las líneas (en este proceso o repartido)
+        trabajadores = max(1, min(trabajadores, os.cpu_count() or 1))
+        candidatos = len(filas_rango) + len(sin_fecha)
+        if motor == 'python' and trabajadores > 1 and candidatos >= facturacion.MIN_CONSUMOS_PARALELO:
+            facturables = self._facturar_en_procesos(
+                fecha_a_epoch_inicio(fecha_inicio_dt), fecha_a_epoch_fin(fecha_fin_dt), trabajadores
+            )
+        else:
+            facturables = self._facturar_en_proceso(chain(filas_rango, sin_fecha), motor == 'numpy')
+        
+        # Crear las facturas y asignar números en este proceso, en orden de NIT
+        consumos_facturados = 0
+        for nit, (monto_total, detalles), consumos_por_instancia in facturables:
+            factura = self._crear_factura(nit, monto_total, detalles, fecha_fin)
+            if factura:
+                facturas_generadas.append(factura)
+                
+                # Marcar consumos como facturados
+                self._marcar_filas_facturadas(nit, consumos_por_instancia)
+                consumos_facturados += sum(len(filas) for filas in consumos_por_instancia.values())
+        
+        if resumen is not None:
+            resumen['consumos_escaneados'] = len(filas_rango)
+            resumen['consumos_facturados'] = consumos_facturados
+            resumen['consumos_sin_fecha'] = len(sin_fecha)
         
         return facturas_generadas
     
-    def _generar_factura_cliente(self, cliente: Cliente, consumos: List[Consumo], fecha_factura: str):
-        """Genera una factura para un cliente específico"""
-        monto_total = 0
-        detalles_factura = []
+    def _facturar_en_proceso(self, filas: Iterable[int], vectorizado: bool):
+        """Agrupa las filas pendientes por cliente e instancia y calcula las facturas en este proceso.
+        
+        Devuelve (nit, (monto_total, detalles), filas por instancia) por cliente, en orden de NIT.
+        """
+        facturados = self.consumos.facturados
+        claves_cliente = self.consumos.claves_cliente
+        ids_instancia = self.consumos.ids_instancia
+        nits = self.consumos.nits
+        
+        pendientes: Dict[str, Dict[int, List[int]]] = {}
+        for fila in filas:
+            if not facturados[fila]:
+                por_instancia = pendientes.setdefault(nits[claves_cliente[fila]], {})
+                por_instancia.setdefault(ids_instancia[fila], []).append(fila)
+        
+        # Preparar la entrada de cada factura en orden de NIT (el orden de numeración)
+        nits_facturables = []
+        entradas = []
+        for nit in sorted(pendientes):
+            cliente = self.obtener_cliente_por_nit(nit)
+            if cliente:
+                nits_facturables.append(nit)
+                entradas.append(self._preparar_factura_cliente(cliente, pendientes[nit], vectorizado))
+        
+        if vectorizado:
+            resultados = calcular_facturas_numpy(entradas, self.consumos.tiempos)
+        else:
+            resultados = [calcular_factura(instancias) for instancias in entradas]
+        return [(nit, resultado, pendientes[nit]) for nit, resultado in zip(nits_facturables, resultados)]
+    
+    def _facturar_en_procesos(self, desde: float, hasta: float, trabajadores: int):
+        """Reparte los clientes con consumos pendientes en particiones contiguas por NIT y
+        factura cada una en un proceso (filtro por rango, orden, suma de horas y líneas).
+        
+        Este proceso solo resuelve las tarifas de las instancias y toma las filas
+        pendientes de cada cliente del índice de no facturados, sin recorrerlas una
+        a una; cada partición viaja solo con las filas de sus clientes. Las
+        particiones se equilibran por cantidad de filas. Devuelve lo mismo que
+        _facturar_en_proceso.
+        """
+        clientes = []  # (nit, [(id_instancia, tarifa o None, filas pendientes)], cantidad de filas)
+        total_filas = 0
+        for nit in sorted(self._consumos_no_facturados):
+            cliente = self.obtener_cliente_por_nit(nit)
+            if not cliente:
+                continue
+            instancias = []
+            cantidad = 0
+            for id_instancia, filas in self._consumos_no_facturados[nit].items():
+                tarifa = None
+                instancia = cliente.obtener_instancia_por_id(id_instancia)
+                configuracion = self.obtener_configuracion_de_instancia(instancia) if instancia else None
+                if configuracion:
+                    tarifa = (instancia.nombre, self.obtener_tarifa_configuracion(configuracion).recursos)
+                instancias.append((id_instancia, tarifa, filas))
+                cantidad += len(filas)
+            clientes.append((nit, instancias, cantidad))
+            total_filas += cantidad
+        if not clientes:
+            return []
+        
+        particiones = [[]]
+        objetivo = total_filas / trabajadores
+        acumuladas = 0
+        for nit, instancias, cantidad in clientes:
+            if acumuladas >= objetivo * len(particiones) and len(particiones) < trabajadores:
+                particiones.append([])
+            particiones[-1].append((nit, instancias))
+            acumuladas += cantidad
+        
+        return facturar_particiones(self.consumos.tiempos, self.consumos.epochs, particiones, desde, hasta)
+    
+    def _preparar_factura_cliente(self, cliente: Cliente, consumos_por_instancia: Dict[int, List[int]], vectorizado: bool = False):
+        """Resuelve instancias, configuraciones y recursos de un cliente para el cálculo de su factura.
         
-        # Agrupar consumos por instancia
-        consumos_por_instancia = {}
-        for consumo in consumos:
-            if consumo.id_instancia not in consumos_por_instancia:
-                consumos_por_instancia[consumo.id_instancia] = []
-            consumos_por_instancia[consumo.id_instancia].append(consumo)
+        Para el motor vectorizado se entregan las filas de consumo y la configuración
+        en lugar del tiempo total, que se suma con NumPy.
+        """
+        instancias = []
         
-        # Procesar cada instancia
-        for id_instancia, consumos_instancia in consumos_por_instancia.items():
+        for id_instancia, filas_instancia in consumos_por_instancia.items():
             instancia = cliente.obtener_instancia_por_id(id_instancia)
             if not instancia:
                 continue
-                
-            configuracion = self.obtener_configuracion_por_id(instancia.id_configuracion)
+            
+            configuracion = self.obtener_configuracion_de_instancia(instancia)
             if not configuracion:
                 continue
             
-            # Calcular tiempo total de la instancia
-            tiempo_total = sum(consumo.tiempo for consumo in consumos_instancia)
-            
-            # Calcular costo de la instancia y detalle de recursos
-            monto_instancia = 0
-            detalles_recursos = []
-            
-            for recurso_id, cantidad in configuracion.recursos.items():
-                recurso = self.obtener_recurso_por_id(recurso_id)
-                if recurso:
-                    costo_recurso = recurso.calcular_costo(tiempo_total, cantidad)
-                    monto_instancia += costo_recurso
-                    
-                    detalles_recursos.append({
-                        'id_recurso': recurso.id,
-                        'nombre_recurso': recurso.nombre,
-                        'cantidad': cantidad,
-                        'valor_x_hora': recurso.valor_x_hora,
-                        'costo': costo_recurso
-                    })
-            
-            monto_total += monto_instancia
+            tarifa = self.obtener_tarifa_configuracion(configuracion)
+            if vectorizado:
+                instancias.append((instancia.id, instancia.nombre, filas_instancia, configuracion.id, tarifa.recursos))
+                continue
             
-            # Crear detalle de factura para esta instancia
-            detalle = DetalleFactura(
-                id_instancia=instancia.id,
-                nombre_instancia=instancia.nombre,
-                tiempo_consumido=tiempo_total,
-                monto_instancia=monto_instancia,
-                detalles_recursos=detalles_recursos
-            )
-            detalles_factura.append(detalle)
+            # Calcular tiempo total de la instancia
+            tiempo_total = self.consumos.sumar_tiempo(filas_instancia)
+            instancias.append((instancia.id, instancia.nombre, tiempo_total, tarifa.recursos))
         
+        return instancias
+    
+    def _crear_factura(self, nit_cliente: str, monto_total: float, detalles: List[tuple], fecha_factura: str):
+        """Crea y registra la factura calculada de un cliente si tiene monto"""
         if monto_total > 0:
             factura = Factura(
                 numero_factura=self.generar_numero_factura(),
-                nit_cliente=cliente.nit,
+                nit_cliente=nit_cliente,
                 fecha=fecha_factura,
                 monto_total=monto_total
             )
             
-            for detalle in detalles_factura:
-                factura.agregar_detalle(detalle)
+            for id_instancia, nombre_instancia, tiempo_total, monto_instancia, detalles_recursos in detalles:
+                factura.agregar_detalle(DetalleFactura(
+                    id_instancia=id_instancia,
+                    nombre_instancia=nombre_instancia,
+                    tiempo_consumido=tiempo_total,
+                    monto_instancia=monto_instancia,
+                    detalles_recursos=detalles_recursos
+                ))
             
             self.agregar_factura(factura)
             return factura
         
         return None
-
+    
     def to_dict(self):
         """Convierte todo el sistema a diccionario para serialización"""
         return {
@@ -211,6 +930,17 @@ class Sistema:
             'proximo_id_consumo': self.proximo_id_consumo
         }
     
+    def iterar_datos(self):
+        """Recorre el contenido de to_dict clave por clave; las colecciones se entregan como
+        iterables de entidades (con to_dict) para serializarlas sin materializar las listas"""
+        yield 'recursos', iter(self.recursos)
+        yield 'categorias', iter(self.categorias)
+        yield 'clientes', iter(self.clientes)
+        yield 'consumos', iter(self.consumos)
+        yield 'facturas', iter(self.facturas)
+        yield 'proximo_id_factura', self.proximo_id_factura
+        yield 'proximo_id_consumo', self.proximo_id_consumo
+    
     @classmethod
     def from_dict(cls, data: dict):
         """Reconstruye el sistema desde un diccionario"""
@@ -234,7 +964,7 @@ class Sistema:
         # Reconstruir consumos
         for consumo_data in data.get('consumos', []):
             consumo = Consumo.from_dict(consumo_data)
-            sistema.consumos.append(consumo)
+            sistema.agregar_consumo(consumo)
         
         # Reconstruir facturas
         for factura_data in data.get('facturas', []):
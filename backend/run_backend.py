@@ -1,12 +1,26 @@
+import argparse
 import subprocess
 import sys
 import os
 
-def run_backend():
-    """Ejecuta el backend Flask"""
-    backend_dir = os.path.join(os.path.dirname(__file__), 'backend')
-    os.chdir(backend_dir)
-    subprocess.run([sys.executable, 'app.py'])
+def run_backend(produccion=False, trabajadores=None):
+    """Ejecuta el backend Flask (servidor de desarrollo) o, en producción, con gunicorn y varios procesos"""
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if not produccion:
+        subprocess.run([sys.executable, 'app.py'])
+        return
+    
+    # gunicorn.conf.py activa el modo multiproceso y precarga el sistema antes de crear los trabajadores
+    entorno = dict(os.environ)
+    if trabajadores:
+        entorno['SERVIDOR_TRABAJADORES'] = str(trabajadores)
+    subprocess.run([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], env=entorno)
 
 if __name__ == '__main__':
-    run_backend()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ejecuta el backend")
+    parser.add_argument('--produccion', action='store_true',
+                        help="varios procesos con gunicorn en lugar del servidor de desarrollo")
+    parser.add_argument('--trabajadores', type=int, default=None,
+                        help="procesos trabajadores en producción (por defecto SERVIDOR_TRABAJADORES)")
+    argumentos = parser.parse_args()
+    run_backend(argumentos.produccion, argumentos.trabajadores)
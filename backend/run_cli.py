@@ -0,0 +1,153 @@
+"""Facturación y reportes sin el servidor, directamente sobre el almacenamiento.
+
+Carga el directorio de datos (config.DATABASE_PATH) con el mismo almacenamiento
+que el servidor, ejecuta la operación y escribe el resultado. Toma el mismo
+bloqueo de archivo que app.py, así que no corre mientras el servidor esté
+levantado (salvo con --esperar, que espera a que se libere). Ejemplos:
+
+    python run_cli.py facturar 01/01/2024 31/01/2024 --trabajadores 4 --salida facturas.json
+    python run_cli.py analisis categorias 01/01/2024 31/12/2024 --pdf
+"""
+import argparse
+import json
+import sys
+import time
+import config
+from models.facturacion import MOTORES_FACTURACION
+from utils.validators import Validador
+from utils.xml_manager import XMLManager
+from utils.sqlite_manager import SQLiteManager
+from utils.journal_manager import JournalManager
+from utils.bloqueo_archivo import BloqueoArchivo, BloqueoOcupadoError
+from utils.analisis import obtener_datos_analisis
+
+def _abrir_almacenamiento():
+    """Crea el almacenamiento configurado y, si aplica, su journal"""
+    if config.ALMACENAMIENTO == 'sqlite':
+        almacenamiento = SQLiteManager(config.DATABASE_PATH, politica_fsync=config.FSYNC_POLITICA)
+    else:
+        almacenamiento = XMLManager(
+            config.DATABASE_PATH,
+            politica_fsync=config.FSYNC_POLITICA,
+            intervalo_fsync=config.FSYNC_INTERVALO_MS / 1000.0
+        )
+    journal_manager = None
+    if config.JOURNAL_HABILITADO:
+        journal_manager = JournalManager(almacenamiento, max_bytes=config.JOURNAL_MAX_BYTES, fsync=config.JOURNAL_FSYNC)
+    return almacenamiento, journal_manager
+
+def _extraer_rango(args):
+    """Valida y normaliza el rango de fechas de los argumentos"""
+    fecha_inicio = Validador.extraer_fecha(args.fecha_inicio)
+    fecha_fin = Validador.extraer_fecha(args.fecha_fin)
+    if not fecha_inicio or not fecha_fin:
+        raise ValueError("Fechas inválidas (formato dd/mm/yyyy)")
+    return fecha_inicio, fecha_fin
+
+def _escribir_salida(ruta, datos):
+    """Escribe el resultado en JSON a un archivo o a la salida estándar ('-')"""
+    if ruta == '-':
+        json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+def facturar(sistema, args):
+    """Genera las facturas del rango; devuelve True si el sistema cambió"""
+    fecha_inicio, fecha_fin = _extraer_rango(args)
+    
+    inicio = time.perf_counter()
+    resumen = {}
+    facturas = sistema.generar_facturacion(fecha_inicio, fecha_fin, resumen, args.trabajadores, args.motor)
+    segundos = time.perf_counter() - inicio
+    
+    print(
+        f"Facturas generadas: {len(facturas)} "
+        f"(consumos escaneados: {resumen['consumos_escaneados']}, "
+        f"facturados: {resumen['consumos_facturados']}, sin fecha válida: {resumen['consumos_sin_fecha']}) en {segundos:.3f} s"
+    )
+    if args.salida:
+        _escribir_salida(args.salida, [factura.to_dict() for factura in facturas])
+    return bool(facturas)
+
+def analisis(sistema, args):
+    """Calcula un análisis de ventas y opcionalmente genera su PDF; no modifica el sistema"""
+    fecha_inicio, fecha_fin = _extraer_rango(args)
+    datos = obtener_datos_analisis(sistema, args.tipo, fecha_inicio, fecha_fin)
+    
+    total = sum(item['ingreso_total'] for item in datos)
+    print(f"Análisis por {args.tipo}: {len(datos)} elementos con ingreso, total {total:.2f}")
+    if args.salida:
+        _escribir_salida(args.salida, datos)
+    if args.pdf:
+        from utils.pdf_generator import PDFGenerator
+        rango_fechas = {'inicio': fecha_inicio, 'fin': fecha_fin}
+        filepath = PDFGenerator(cache_max_bytes=config.REPORTES_CACHE_MAX_BYTES).generar_analisis_ventas(args.tipo, datos, rango_fechas)
+        print(f"Reporte PDF: {filepath}")
+    return False
+
+def _crear_parser():
+    parser = argparse.ArgumentParser(description="Facturación y reportes sobre el almacenamiento, sin servidor")
+    parser.add_argument('--esperar', action='store_true', help="esperar a que se libere el bloqueo en lugar de fallar")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    
+    parser_facturar = subparsers.add_parser('facturar', help="generar facturas de un rango de fechas")
+    parser_facturar.add_argument('fecha_inicio')
+    parser_facturar.add_argument('fecha_fin')
+    parser_facturar.add_argument('--trabajadores', type=int, default=config.FACTURACION_TRABAJADORES,
+                                 help="procesos para facturar (motor 'python'; como máximo uno por CPU)")
+    parser_facturar.add_argument('--motor', choices=MOTORES_FACTURACION, default=config.FACTURACION_MOTOR,
+                                 help="motor de cálculo de las facturas")
+    parser_facturar.add_argument('--salida', help="archivo JSON con las facturas generadas ('-' para stdout)")
+    parser_facturar.set_defaults(funcion=facturar)
+    
+    parser_analisis = subparsers.add_parser('analisis', help="análisis de ventas de un rango de fechas")
+    parser_analisis.add_argument('tipo', choices=['categorias', 'recursos'])
+    parser_analisis.add_argument('fecha_inicio')
+    parser_analisis.add_argument('fecha_fin')
+    parser_analisis.add_argument('--salida', help="archivo JSON con los datos del análisis ('-' para stdout)")
+    parser_analisis.add_argument('--pdf', action='store_true', help="generar también el reporte PDF en reports/")
+    parser_analisis.set_defaults(funcion=analisis)
+    
+    return parser
+
+def main(argv=None):
+    args = _crear_parser().parse_args(argv)
+    
+    bloqueo = BloqueoArchivo(config.DATABASE_PATH)
+    try:
+        bloqueo.adquirir(esperar=args.esperar)
+    except BloqueoOcupadoError:
+        print(f"El directorio de datos '{config.DATABASE_PATH}' está en uso (¿servidor en ejecución?). "
+              f"Use --esperar para esperar a que se libere.", file=sys.stderr)
+        return 2
+    
+    almacenamiento = None
+    try:
+        almacenamiento, journal_manager = _abrir_almacenamiento()
+        if journal_manager:
+            sistema = journal_manager.cargar_sistema()
+        else:
+            sistema = almacenamiento.cargar_sistema()
+        
+        try:
+            modificado = args.funcion(sistema, args)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        
+        if modificado:
+            # Sin servidor no hace falta journal: se escribe el snapshot directamente
+            if journal_manager:
+                journal_manager.checkpoint(sistema)
+            else:
+                almacenamiento.guardar_sistema(sistema)
+        return 0
+    finally:
+        if almacenamiento is not None and hasattr(almacenamiento, 'cerrar'):
+            almacenamiento.cerrar()
+        bloqueo.liberar()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+from models import Sistema
+
+# Datos de los análisis de ventas, compartidos por el servidor y la línea de comandos
+
+# Colecciones de las que dependen los análisis: ingresos de las facturas, nombres de recursos,
+# categorías y configuraciones, y la configuración de cada instancia (se resuelve al consultar)
+COLECCIONES_ANALISIS = ('recursos', 'categorias', 'clientes', 'facturas')
+
+def obtener_datos_analisis_categorias(sistema: Sistema, fecha_inicio, fecha_fin):
+    """Obtiene datos para análisis por categorías"""
+    # Ingreso por configuración en el rango (suma de los buckets diarios)
+    ingreso_por_configuracion = sistema.obtener_ingresos_por_configuracion(fecha_inicio, fecha_fin)
+    
+    datos = []
+    for categoria in sistema.categorias:
+        ingreso_categoria = 0
+        configuraciones_data = []
+        
+        for configuracion in categoria.configuraciones:
+            ingreso_config = ingreso_por_configuracion.get(configuracion.id, 0)
+            if ingreso_config > 0:
+                configuraciones_data.append({
+                    'nombre': configuracion.nombre,
+                    'ingreso': ingreso_config
+                })
+                ingreso_categoria += ingreso_config
+        
+        if ingreso_categoria > 0:
+            datos.append({
+                'nombre': categoria.nombre,
+                'descripcion': categoria.descripcion,
+                'carga_trabajo': categoria.carga_trabajo,
+                'ingreso_total': ingreso_categoria,
+                'configuraciones': configuraciones_data
+            })
+    
+    # Ordenar por ingreso descendente
+    datos.sort(key=lambda x: x['ingreso_total'], reverse=True)
+    return datos
+
+def obtener_datos_analisis_recursos(sistema: Sistema, fecha_inicio, fecha_fin):
+    """Obtiene datos para análisis por recursos"""
+    # Ingreso por recurso en el rango (suma de los buckets diarios)
+    ingreso_por_recurso = sistema.obtener_ingresos_por_recurso(fecha_inicio, fecha_fin)
+    
+    datos = []
+    for recurso in sistema.recursos:
+        ingreso_total = ingreso_por_recurso.get(recurso.id, 0)
+        
+        if ingreso_total > 0:
+            datos.append({
+                'nombre': recurso.nombre,
+                'tipo': recurso.tipo,
+                'metrica': recurso.metrica,
+                'valor_x_hora': recurso.valor_x_hora,
+                'ingreso_total': ingreso_total
+            })
+    
+    # Ordenar por ingreso descendente
+    datos.sort(key=lambda x: x['ingreso_total'], reverse=True)
+    return datos
+
+def obtener_datos_analisis(sistema: Sistema, tipo_analisis, fecha_inicio, fecha_fin):
+    """Obtiene los datos del análisis indicado ('categorias' o 'recursos')"""
+    if tipo_analisis == 'categorias':
+        return obtener_datos_analisis_categorias(sistema, fecha_inicio, fecha_fin)
+    return obtener_datos_analisis_recursos(sistema, fecha_inicio, fecha_fin)
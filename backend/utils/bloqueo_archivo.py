@@ -0,0 +1,72 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class BloqueoOcupadoError(Exception):
+    """El bloqueo del directorio de datos lo tiene otro proceso"""
+    pass
+
+class BloqueoArchivo:
+    """Bloqueo exclusivo entre procesos sobre el directorio de datos.
+    
+    Lo toman el servidor (durante toda su vida) y las herramientas de línea
+    de comandos que escriben sobre el almacenamiento, para que nunca haya dos
+    escritores a la vez. El sistema operativo lo libera si el proceso muere.
+    """
+    
+    def __init__(self, base_path, nombre_archivo="sistema.lock"):
+        self.ruta = os.path.join(base_path, nombre_archivo)
+        self._archivo = None
+    
+    @property
+    def adquirido(self) -> bool:
+        return self._archivo is not None
+    
+    def adquirir(self, esperar: bool = False):
+        """Toma el bloqueo; sin esperar lanza BloqueoOcupadoError si está ocupado"""
+        if self._archivo:
+            return
+        
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        archivo = open(self.ruta, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | (0 if esperar else fcntl.LOCK_NB))
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            archivo.close()
+            raise BloqueoOcupadoError(f"Otro proceso tiene el bloqueo {self.ruta}")
+        
+        # PID del dueño, solo informativo
+        archivo.seek(0)
+        archivo.truncate()
+        archivo.write(str(os.getpid()))
+        archivo.flush()
+        self._archivo = archivo
+    
+    def liberar(self):
+        """Libera el bloqueo si se tenía"""
+        if not self._archivo:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+            else:
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._archivo.close()
+            self._archivo = None
+    
+    def __enter__(self):
+        self.adquirir()
+        return self
+    
+    def __exit__(self, tipo, valor, traza):
+        self.liberar()
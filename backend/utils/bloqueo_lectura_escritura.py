@@ -0,0 +1,69 @@
+import threading
+from contextlib import contextmanager
+
+class BloqueoLecturaEscritura:
+    """Bloqueo de lectores y escritor entre los hilos de un proceso.
+    
+    Varios lectores pueden tenerlo a la vez; un escritor lo tiene solo. Cuando
+    un escritor espera, los lectores nuevos esperan detrás de él para que las
+    escrituras no se queden sin turno. No es reentrante: un hilo que ya lo tiene
+    no debe volver a pedirlo.
+    """
+    
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._lectores = 0
+        self._escribiendo = False
+        self._escritores_esperando = 0
+    
+    def adquirir_lectura(self):
+        with self._condicion:
+            self._condicion.wait_for(lambda: not self._escribiendo and not self._escritores_esperando)
+            self._lectores += 1
+    
+    def liberar_lectura(self):
+        with self._condicion:
+            self._lectores -= 1
+            if not self._lectores:
+                self._condicion.notify_all()
+    
+    def adquirir_escritura(self):
+        with self._condicion:
+            self._escritores_esperando += 1
+            try:
+                self._condicion.wait_for(lambda: not self._escribiendo and not self._lectores)
+            finally:
+                self._escritores_esperando -= 1
+            self._escribiendo = True
+    
+    def liberar_escritura(self):
+        with self._condicion:
+            self._escribiendo = False
+            self._condicion.notify_all()
+    
+    @contextmanager
+    def lectura(self):
+        """Bloqueo compartido mientras dura el bloque"""
+        self.adquirir_lectura()
+        try:
+            yield
+        finally:
+            self.liberar_lectura()
+    
+    @contextmanager
+    def escritura(self):
+        """Bloqueo exclusivo mientras dura el bloque"""
+        self.adquirir_escritura()
+        try:
+            yield
+        finally:
+            self.liberar_escritura()
+    
+    def estadisticas(self):
+        """Obtiene el estado actual del bloqueo"""
+        with self._condicion:
+            return {
+                'lectores': self._lectores,
+                'escribiendo': self._escribiendo,
+                'escritores_esperando': self._escritores_esperando
+            }
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, make_response, Response
+from models.sistema import COLECCIONES
+
+class CacheHTTP:
+    """GET condicionales con ETag / Last-Modified a partir de las versiones del sistema.
+    
+    Los listados se validan contra la versión de las colecciones de las que
+    dependen (Cache-Control: no-cache, el cliente revalida y recibe 304 si nada
+    cambió). Las facturas no cambian después de emitirse, así que su detalle y
+    su PDF se marcan como cacheables por `max_age_facturas` segundos.
+    """
+    
+    def __init__(self, obtener_sistema, max_age_facturas: int = 86400):
+        self.obtener_sistema = obtener_sistema  # Callable: el sistema global puede reemplazarse
+        self.max_age_facturas = max_age_facturas
+    
+    def condicional(self, *colecciones):
+        """Decorador: responde 304 si el cliente ya tiene la versión actual de las colecciones"""
+        colecciones = colecciones or COLECCIONES
+        
+        def decorador(vista):
+            @wraps(vista)
+            def envoltura(*args, **kwargs):
+                etag, modificado = self.obtener_sistema().version_colecciones(colecciones)
+                ultima_modificacion = datetime.fromtimestamp(int(modificado), timezone.utc)
+                
+                # If-None-Match tiene prioridad sobre If-Modified-Since
+                if request.if_none_match:
+                    no_modificado = request.if_none_match.contains_weak(etag)
+                else:
+                    no_modificado = request.if_modified_since is not None and ultima_modificacion <= request.if_modified_since
+                if no_modificado:
+                    respuesta = self._no_modificado(etag)
+                else:
+                    respuesta = make_response(vista(*args, **kwargs))
+                    if respuesta.status_code != 200:
+                        return respuesta
+                    respuesta.set_etag(etag)
+                respuesta.last_modified = ultima_modificacion
+                respuesta.cache_control.no_cache = True
+                return respuesta
+            return envoltura
+        return decorador
+    
+    def factura_inmutable(self, vista):
+        """Decorador para vistas de una factura (`numero_factura`): ETag fijo y caché de larga duración"""
+        @wraps(vista)
+        def envoltura(numero_factura, *args, **kwargs):
+            # La generación de los datos cambia con un reset, que vuelve a numerar las facturas desde 1
+            etag = f"{self.obtener_sistema().generacion_datos}-{numero_factura}"
+            if request.if_none_match.contains_weak(etag):
+                respuesta = self._no_modificado(etag)
+            else:
+                respuesta = make_response(vista(numero_factura, *args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+                respuesta.set_etag(etag)
+            respuesta.cache_control.public = True
+            respuesta.cache_control.max_age = self.max_age_facturas
+            return respuesta
+        return envoltura
+    
+    def _no_modificado(self, etag: str) -> Response:
+        respuesta = Response(status=304)
+        respuesta.set_etag(etag)
+        return respuesta
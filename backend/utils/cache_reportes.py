@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+
+def huella_contenido(*partes) -> str:
+    """Resumen SHA-256 del contenido de un reporte (cualquier estructura serializable a JSON)"""
+    texto = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class CacheReportes:
+    """Caché en disco de los PDF generados, direccionada por contenido.
+    
+    El nombre de cada archivo incluye la huella de los datos con los que se
+    generó, así que un acierto es simplemente que el archivo exista: se devuelve
+    sin volver a generarlo. Los archivos se reemplazan con un rename, lo que la
+    hace segura entre hilos y entre procesos que compartan el directorio. Al
+    pasar de `max_bytes` se eliminan los PDF usados hace más tiempo (la fecha de
+    modificación se actualiza en cada acierto).
+    """
+    
+    def __init__(self, directorio, max_bytes: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._candado = threading.Lock()  # Protege los contadores
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+    
+    def buscar(self, nombre):
+        """Devuelve la ruta del PDF `nombre` si ya existe (un acierto) o None, sin generar nada"""
+        ruta = os.path.join(self.directorio, nombre)
+        try:
+            os.utime(ruta)  # Marca el uso para el orden LRU
+        except FileNotFoundError:
+            return None
+        with self._candado:
+            self.aciertos += 1
+        return ruta
+    
+    def obtener(self, nombre, generar):
+        """Devuelve la ruta del PDF `nombre`, generándolo con `generar(nombre_temporal)` si no existe"""
+        ruta = self.buscar(nombre)
+        if ruta is not None:
+            return ruta
+        
+        ruta = os.path.join(self.directorio, nombre)
+        temporal = f"{nombre}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            generar(temporal)
+            os.replace(os.path.join(self.directorio, temporal), ruta)
+        except BaseException:
+            try:
+                os.remove(os.path.join(self.directorio, temporal))
+            except FileNotFoundError:
+                pass
+            raise
+        with self._candado:
+            self.fallos += 1
+        self._desalojar(conservar=ruta)
+        return ruta
+    
+    def _archivos(self):
+        """(fecha de uso, tamaño, ruta) de los PDF del directorio"""
+        archivos = []
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith('.pdf'):
+                    continue
+                try:
+                    estado = entrada.stat()
+                except FileNotFoundError:
+                    continue  # Otro proceso lo eliminó
+                archivos.append((estado.st_mtime_ns, estado.st_size, entrada.path))
+        return archivos
+    
+    def _desalojar(self, conservar=None):
+        """Elimina los PDF menos usados hasta que el directorio quepa en max_bytes"""
+        archivos = self._archivos()
+        total = sum(tamano for _, tamano, _ in archivos)
+        if total <= self.max_bytes:
+            return
+        
+        archivos.sort()
+        for _, tamano, ruta in archivos:
+            if total <= self.max_bytes:
+                break
+            if ruta == conservar:
+                continue
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass  # Ya lo desalojó otro proceso
+            else:
+                with self._candado:
+                    self.desalojos += 1
+            total -= tamano
+    
+    def estadisticas(self):
+        """Obtiene aciertos, fallos, desalojos y ocupación del directorio"""
+        archivos = self._archivos()
+        with self._candado:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'desalojos': self.desalojos,
+                'archivos': len(archivos),
+                'bytes': sum(tamano for _, tamano, _ in archivos),
+                'max_bytes': self.max_bytes
+            }
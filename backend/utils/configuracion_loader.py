@@ -0,0 +1,260 @@
+from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia
+from utils.validators import Validador
+
+class CargaConfiguracion:
+    """Procesa un mensaje XML de configuración en dos fases.
+    
+    La fase de preparación recorre el mensaje completo y lo deja en mapas
+    temporales, acumulando todos los errores (registros inválidos y duplicados)
+    sin tocar el sistema. La fase de aplicación agrega todo lo preparado solo si
+    no hubo errores, de modo que el mensaje se aplica completo o no se aplica.
+    """
+    
+    def __init__(self, sistema: Sistema):
+        self.sistema = sistema
+        self.recursos = {}  # {recurso_id: Recurso}
+        self.categorias = {}  # {categoria_id: Categoria}
+        self.clientes = {}  # {nit: Cliente}
+        self.errores = []
+        self._configuraciones_vistas = set()
+        self._instancias_vistas = set()
+    
+    @staticmethod
+    def _texto(elem, *tags, requerido=True):
+        """Obtiene el texto del primer tag existente; lanza ValueError si es requerido y falta"""
+        for tag in tags:
+            hijo = elem.find(tag)
+            if hijo is not None and hijo.text is not None:
+                return hijo.text.strip()
+        if requerido:
+            raise ValueError(f"falta el campo '{tags[0]}'")
+        return ""
+    
+    @staticmethod
+    def _buscar(elem, *rutas):
+        """Obtiene el primer elemento existente entre varios nombres alternativos"""
+        for ruta in rutas:
+            encontrado = elem.find(ruta)
+            if encontrado is not None:
+                return encontrado
+        return None
+    
+    def preparar(self, root) -> bool:
+        """Fase 1: valida el mensaje completo y lo deja preparado; devuelve True si no hay errores"""
+        lista_recursos = root.find('.//listaRecursos')
+        if lista_recursos is not None:
+            for recurso_elem in lista_recursos.findall('recurso'):
+                self._preparar_recurso(recurso_elem)
+        
+        lista_categorias = self._buscar(root, './/listaCategoria', './/listaCategorias')
+        if lista_categorias is not None:
+            for categoria_elem in lista_categorias.findall('categoria'):
+                self._preparar_categoria(categoria_elem)
+        
+        lista_clientes = root.find('.//listaClientes')
+        if lista_clientes is not None:
+            for cliente_elem in lista_clientes.findall('cliente'):
+                self._preparar_cliente(cliente_elem)
+        
+        return not self.errores
+    
+    def _preparar_recurso(self, recurso_elem):
+        """Valida un recurso del mensaje"""
+        try:
+            recurso_id = int(recurso_elem.get('id'))
+        except (TypeError, ValueError):
+            self.errores.append(f"Recurso con id inválido: {recurso_elem.get('id')}")
+            return
+        
+        if recurso_id in self.recursos:
+            self.errores.append(f"Recurso {recurso_id} duplicado en el mensaje")
+            return
+        # Los recursos ya existentes se ignoran
+        if self.sistema.obtener_recurso_por_id(recurso_id) is not None:
+            return
+        
+        try:
+            tipo = self._texto(recurso_elem, 'tipo')
+            if not Validador.validar_tipo_recurso(tipo):
+                self.errores.append(f"Tipo de recurso inválido: {tipo}")
+                return
+            
+            self.recursos[recurso_id] = Recurso(
+                id=recurso_id,
+                nombre=self._texto(recurso_elem, 'nombre'),
+                abreviatura=self._texto(recurso_elem, 'abreviatura'),
+                metrica=self._texto(recurso_elem, 'metrica'),
+                tipo=Validador.normalizar_tipo_recurso(tipo),
+                valor_x_hora=float(self._texto(recurso_elem, 'valorXhora'))
+            )
+        except ValueError as e:
+            self.errores.append(f"Recurso {recurso_id}: {str(e)}")
+    
+    def _preparar_categoria(self, categoria_elem):
+        """Valida una categoría del mensaje junto con sus configuraciones"""
+        try:
+            categoria_id = int(categoria_elem.get('id'))
+        except (TypeError, ValueError):
+            self.errores.append(f"Categoría con id inválido: {categoria_elem.get('id')}")
+            return
+        
+        if categoria_id in self.categorias:
+            self.errores.append(f"Categoría {categoria_id} duplicada en el mensaje")
+            return
+        if self.sistema.obtener_categoria_por_id(categoria_id) is not None:
+            return
+        
+        categoria = Categoria(
+            id=categoria_id,
+            nombre=self._texto(categoria_elem, 'nombre', requerido=False),
+            descripcion=self._texto(categoria_elem, 'description', 'descripcion', requerido=False),
+            carga_trabajo=self._texto(categoria_elem, 'cargaTrabajo', requerido=False)
+        )
+        
+        valida = True
+        lista_configs = self._buscar(categoria_elem, './/listaConfigurationes', './/listaConfiguraciones')
+        if lista_configs is not None:
+            for config_elem in lista_configs.findall('configuration'):
+                configuracion = self._preparar_configuracion(categoria_id, config_elem)
+                if configuracion is None:
+                    valida = False
+                else:
+                    categoria.agregar_configuracion(configuracion)
+        
+        if valida:
+            self.categorias[categoria_id] = categoria
+    
+    def _preparar_configuracion(self, categoria_id: int, config_elem):
+        """Valida una configuración; devuelve None si es inválida"""
+        try:
+            config_id = int(config_elem.get('id'))
+        except (TypeError, ValueError):
+            self.errores.append(f"Categoría {categoria_id}: configuración con id inválido: {config_elem.get('id')}")
+            return None
+        
+        if config_id in self._configuraciones_vistas or self.sistema.obtener_configuracion_por_id(config_id) is not None:
+            self.errores.append(f"Configuración {config_id} duplicada")
+            return None
+        self._configuraciones_vistas.add(config_id)
+        
+        configuracion = Configuracion(
+            id=config_id,
+            nombre=self._texto(config_elem, 'nombre', requerido=False),
+            descripcion=self._texto(config_elem, 'description', 'descripcion', requerido=False)
+        )
+        
+        recursos_config = self._buscar(config_elem, './/recurso%Configuration', './/recursosConfiguracion')
+        if recursos_config is not None:
+            for recurso_config in recursos_config.findall('recurso'):
+                try:
+                    configuracion.agregar_recurso(int(recurso_config.get('id')), float(recurso_config.text))
+                except (TypeError, ValueError):
+                    self.errores.append(f"Configuración {config_id}: recurso inválido {recurso_config.get('id')}")
+                    return None
+        return configuracion
+    
+    def _preparar_cliente(self, cliente_elem):
+        """Valida un cliente del mensaje junto con sus instancias"""
+        # Manejar diferentes nombres de atributos
+        nit = cliente_elem.get('nlt')
+        if nit is None:
+            nit = cliente_elem.get('nit')
+        
+        if not Validador.validar_nit(nit):
+            self.errores.append(f"NIT inválido: {nit}")
+            return
+        if nit in self.clientes:
+            self.errores.append(f"Cliente {nit} duplicado en el mensaje")
+            return
+        if self.sistema.obtener_cliente_por_nit(nit) is not None:
+            return
+        
+        try:
+            cliente = Cliente(
+                nit=nit,
+                nombre=self._texto(cliente_elem, 'nombre'),
+                usuario=self._texto(cliente_elem, 'usuario'),
+                clave=self._texto(cliente_elem, 'clave'),
+                direccion=self._texto(cliente_elem, 'direccion'),
+                correo_electronico=self._texto(cliente_elem, 'correoElectronico')
+            )
+        except ValueError as e:
+            self.errores.append(f"Cliente {nit}: {str(e)}")
+            return
+        
+        valido = True
+        lista_instancias = self._buscar(cliente_elem, './/listaInstancia', './/listaInstancias')
+        if lista_instancias is not None:
+            for instancia_elem in lista_instancias.findall('instancia'):
+                instancia = self._preparar_instancia(nit, instancia_elem)
+                if instancia is None:
+                    valido = False
+                else:
+                    cliente.agregar_instancia(instancia)
+        
+        if valido:
+            self.clientes[nit] = cliente
+    
+    def _preparar_instancia(self, nit: str, instancia_elem):
+        """Valida una instancia; devuelve None si es inválida"""
+        try:
+            instancia_id = int(instancia_elem.get('id'))
+        except (TypeError, ValueError):
+            self.errores.append(f"Cliente {nit}: instancia con id inválido: {instancia_elem.get('id')}")
+            return None
+        
+        if instancia_id in self._instancias_vistas or self.sistema.obtener_instancia_por_id(instancia_id) is not None:
+            self.errores.append(f"Instancia {instancia_id} duplicada")
+            return None
+        self._instancias_vistas.add(instancia_id)
+        
+        try:
+            # Extraer fecha de inicio
+            fecha_inicio_texto = self._texto(instancia_elem, 'fechaInicio')
+            fecha_inicio = Validador.extraer_fecha(fecha_inicio_texto)
+            if not fecha_inicio:
+                self.errores.append(f"Fecha de inicio inválida: {fecha_inicio_texto}")
+                return None
+            
+            estado = self._texto(instancia_elem, 'estado')
+            if not Validador.validar_estado_instancia(estado):
+                self.errores.append(f"Estado de instancia inválido: {estado}")
+                return None
+            
+            instancia = Instancia(
+                id=instancia_id,
+                id_configuracion=int(self._texto(instancia_elem, 'idConfiguration', 'idConfiguracion')),
+                nombre=self._texto(instancia_elem, 'nombre'),
+                fecha_inicio=fecha_inicio,
+                estado=Validador.normalizar_estado_instancia(estado)
+            )
+        except ValueError as e:
+            self.errores.append(f"Instancia {instancia_id}: {str(e)}")
+            return None
+        
+        # Si tiene fecha final, extraerla
+        fecha_final = Validador.extraer_fecha(self._texto(instancia_elem, 'fechaFinal', requerido=False))
+        if fecha_final:
+            instancia.fecha_final = fecha_final
+        return instancia
+    
+    def aplicar(self):
+        """Fase 2: agrega al sistema todo lo preparado"""
+        if self.errores:
+            raise ValueError("No se puede aplicar una configuración con errores")
+        
+        for recurso in self.recursos.values():
+            self.sistema.agregar_recurso(recurso)
+        for categoria in self.categorias.values():
+            self.sistema.agregar_categoria(categoria)
+        for cliente in self.clientes.values():
+            self.sistema.agregar_cliente(cliente)
+    
+    def resumen(self):
+        """Contadores de lo preparado para la respuesta"""
+        return {
+            "recursos_creados": len(self.recursos),
+            "categorias_creadas": len(self.categorias),
+            "clientes_creados": len(self.clientes),
+            "instancias_creadas": sum(len(cliente.instancias) for cliente in self.clientes.values())
+        }
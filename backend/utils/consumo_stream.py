@@ -0,0 +1,61 @@
+import xml.etree.ElementTree as ET
+
+class TamanoExcedidoError(Exception):
+    """El cuerpo de la petición supera el tamaño máximo permitido"""
+    pass
+
+class LectorLimitado:
+    """Envuelve un stream contando los bytes leídos y cortando al superar el máximo"""
+    
+    def __init__(self, stream, max_bytes: int):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.bytes_leidos = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        datos = self.stream.read(size)
+        self.bytes_leidos += len(datos)
+        if self.bytes_leidos > self.max_bytes:
+            raise TamanoExcedidoError(f"El mensaje supera el máximo de {self.max_bytes} bytes")
+        return datos
+
+def iterar_consumos(stream):
+    """Recorre los elementos <consumo> de un stream XML sin cargar el documento completo.
+    
+    Produce tuplas (nit_cliente, id_instancia, tiempo, fechahora_texto) y libera
+    cada elemento una vez procesado, por lo que la memoria queda acotada por el
+    tamaño de un consumo y no por el del mensaje.
+    """
+    pila = []
+    for evento, elem in ET.iterparse(stream, events=('start', 'end')):
+        if evento == 'start':
+            pila.append(elem)
+            continue
+        
+        pila.pop()
+        if elem.tag != 'consumo':
+            continue
+        
+        # Manejar diferentes nombres de atributos
+        nit_cliente = elem.get('nicClientes')
+        if nit_cliente is None:
+            nit_cliente = elem.get('nitCliente')
+        
+        id_instancia = elem.get('idInstanceia')
+        if id_instancia is None:
+            id_instancia = elem.get('idInstancia')
+        
+        tiempo = float(elem.find('tiempo').text)
+        
+        # Manejar diferentes nombres de tags
+        fechahora_elem = elem.find('fechahora')
+        if fechahora_elem is None:
+            fechahora_elem = elem.find('fechaHora')
+        fechahora_texto = fechahora_elem.text.strip()
+        
+        yield nit_cliente, int(id_instancia), tiempo, fechahora_texto
+        
+        # Liberar el elemento procesado y desprenderlo de su padre
+        elem.clear()
+        if pila:
+            pila[-1].remove(elem)
@@ -0,0 +1,95 @@
+import threading
+import time
+from contextlib import nullcontext
+
+class EscritorPersistencia:
+    """Hilo en segundo plano que agrupa las mutaciones en un solo guardado.
+    
+    Las peticiones solo marcan el sistema como pendiente; el hilo espera
+    `intervalo_ms` para acumular las ráfagas y luego escribe un único snapshot
+    con el almacenamiento. Quien necesite durabilidad antes de responder puede
+    esperar al siguiente commit con `esperar_commit`. Si se indica `bloqueo`
+    (un callable que devuelve un context manager, p. ej. el bloqueo compartido
+    del sistema), cada snapshot se escribe dentro de él.
+    """
+    
+    def __init__(self, almacenamiento, obtener_sistema, intervalo_ms: int = 200, bloqueo=None):
+        self.almacenamiento = almacenamiento  # XMLManager o SQLiteManager
+        self.obtener_sistema = obtener_sistema  # Callable: el sistema global puede reemplazarse
+        self.bloqueo = bloqueo or nullcontext
+        self.intervalo = intervalo_ms / 1000.0
+        self._condicion = threading.Condition()
+        self._generacion = 0  # Se incrementa con cada mutación marcada
+        self._generacion_escrita = 0
+        self._detener = False
+        self._hilo = threading.Thread(target=self._ejecutar, name="escritor-persistencia", daemon=True)
+        self.commits = 0
+        self.ultimo_error = None
+    
+    def iniciar(self):
+        """Inicia el hilo escritor"""
+        self._hilo.start()
+    
+    def marcar_pendiente(self) -> int:
+        """Marca el sistema como modificado y devuelve la generación a esperar"""
+        with self._condicion:
+            self._generacion += 1
+            self._condicion.notify_all()
+            return self._generacion
+    
+    def esperar_commit(self, generacion: int = None, timeout: float = 30.0) -> bool:
+        """Espera a que la generación indicada (por defecto la última) quede escrita"""
+        with self._condicion:
+            if generacion is None:
+                generacion = self._generacion
+            return self._condicion.wait_for(lambda: self._generacion_escrita >= generacion, timeout)
+    
+    def detener(self, timeout: float = None):
+        """Escribe lo pendiente y detiene el hilo (usado al apagar el servidor)"""
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify_all()
+        if self._hilo.is_alive():
+            self._hilo.join(timeout)
+    
+    def estadisticas(self):
+        """Obtiene el estado del escritor"""
+        with self._condicion:
+            return {
+                'commits': self.commits,
+                'generacion': self._generacion,
+                'generacion_escrita': self._generacion_escrita,
+                'ultimo_error': self.ultimo_error
+            }
+    
+    def _ejecutar(self):
+        """Bucle del hilo: espera cambios, los agrupa y los escribe"""
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._generacion != self._generacion_escrita or self._detener)
+                if self._detener and self._generacion == self._generacion_escrita:
+                    return
+                detener = self._detener
+            
+            # Dar tiempo a que llegue el resto de la ráfaga
+            if not detener:
+                time.sleep(self.intervalo)
+            
+            with self._condicion:
+                objetivo = self._generacion
+            
+            try:
+                with self.bloqueo():
+                    self.almacenamiento.guardar_sistema(self.obtener_sistema())
+            except Exception as e:
+                self.ultimo_error = str(e)
+                if detener:
+                    return
+                time.sleep(self.intervalo)
+                continue
+            
+            with self._condicion:
+                self._generacion_escrita = objetivo
+                self.commits += 1
+                self.ultimo_error = None
+                self._condicion.notify_all()
@@ -0,0 +1,92 @@
+import json
+import os
+from models import Sistema
+
+class JournalManager:
+    """Journal de escritura anticipada sobre el snapshot del almacenamiento.
+    
+    Cada mutación del sistema se agrega como una línea JSON al journal y los
+    archivos completos solo se reescriben en los checkpoints. Al iniciar,
+    el journal se reproduce sobre el último snapshot cargado.
+    
+    Un checkpoint escribe las colecciones, después metadata.xml con la última
+    secuencia incluida y por último vacía el journal. Si se interrumpe antes de
+    escribir metadata.xml, las colecciones ya guardadas contienen cambios que
+    se vuelven a reproducir; Sistema.aplicar_cambio omite lo que ya existe.
+    """
+    
+    def __init__(self, almacenamiento, nombre_archivo="journal.log", max_bytes=4 * 1024 * 1024, fsync=True):
+        self.almacenamiento = almacenamiento  # XMLManager o SQLiteManager
+        self.ruta = os.path.join(almacenamiento.base_path, nombre_archivo)
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.secuencia = 0
+    
+    def cargar_sistema(self) -> Sistema:
+        """Carga el último snapshot y reproduce el journal sobre él"""
+        sistema = self.almacenamiento.cargar_sistema()
+        self.secuencia = sistema.ultima_secuencia_journal
+        self.reproducir(sistema)
+        sistema.activar_registro_cambios()
+        
+        if self.tamano_journal() > self.max_bytes:
+            self.checkpoint(sistema)
+        return sistema
+    
+    def reproducir(self, sistema: Sistema) -> int:
+        """Aplica al sistema los registros del journal posteriores al snapshot"""
+        aplicados = 0
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as archivo:
+                for linea in archivo:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        # Última línea incompleta por una escritura interrumpida
+                        break
+                    if registro['seq'] <= sistema.ultima_secuencia_journal:
+                        continue
+                    sistema.aplicar_cambio(registro['op'], registro['datos'])
+                    self.secuencia = registro['seq']
+                    aplicados += 1
+        except FileNotFoundError:
+            pass
+        return aplicados
+    
+    def registrar(self, sistema: Sistema):
+        """Agrega al journal los cambios pendientes del sistema"""
+        cambios = sistema.extraer_cambios()
+        if cambios:
+            lineas = []
+            for cambio in cambios:
+                self.secuencia += 1
+                cambio['seq'] = self.secuencia
+                lineas.append(json.dumps(cambio, ensure_ascii=False))
+            
+            with open(self.ruta, "a", encoding="utf-8") as archivo:
+                archivo.write("\n".join(lineas) + "\n")
+                archivo.flush()
+                if self.fsync:
+                    os.fsync(archivo.fileno())
+        
+        if self.tamano_journal() > self.max_bytes:
+            self.checkpoint(sistema)
+    
+    def checkpoint(self, sistema: Sistema):
+        """Escribe el snapshot completo y vacía el journal"""
+        # Los cambios pendientes quedan incluidos en el snapshot
+        sistema.extraer_cambios()
+        sistema.ultima_secuencia_journal = self.secuencia
+        self.almacenamiento.guardar_sistema(sistema)
+        
+        with open(self.ruta, "w", encoding="utf-8") as archivo:
+            archivo.flush()
+            if self.fsync:
+                os.fsync(archivo.fileno())
+    
+    def tamano_journal(self) -> int:
+        """Obtiene el tamaño actual del journal en bytes"""
+        try:
+            return os.path.getsize(self.ruta)
+        except OSError:
+            return 0
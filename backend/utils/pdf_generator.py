@@ -7,11 +7,14 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import os
 from datetime import datetime
+from utils.cache_reportes import CacheReportes, huella_contenido
 
 class PDFGenerator:
-    def __init__(self, output_path="reports"):
+    def __init__(self, output_path="reports", cache_max_bytes=0):
         self.output_path = output_path
         self.ensure_directory_exists()
+        # Con cache_max_bytes > 0 los reportes sin nombre explícito se reutilizan mientras sus datos no cambien
+        self.cache = CacheReportes(output_path, cache_max_bytes) if cache_max_bytes > 0 else None
     
     def ensure_directory_exists(self):
         """Asegura que el directorio de reportes exista"""
@@ -20,6 +23,16 @@ class PDFGenerator:
     
     def generar_detalle_factura(self, factura, cliente, output_filename=None):
         """Genera un PDF con el detalle de una factura"""
+        if output_filename is None and self.cache:
+            # Número de factura más la huella de lo que se imprime (un /api/reset reutiliza los números)
+            huella = huella_contenido(
+                factura.to_dict(),
+                [cliente.nombre, cliente.direccion, cliente.correo_electronico] if cliente else None
+            )
+            return self.cache.obtener(
+                f"detalle_factura_{factura.numero_factura}_{huella[:16]}.pdf",
+                lambda nombre: self.generar_detalle_factura(factura, cliente, nombre)
+            )
         if output_filename is None:
             output_filename = f"detalle_factura_{factura.numero_factura}.pdf"
         
@@ -108,11 +121,11 @@ class PDFGenerator:
             
             for recurso_det in detalle.detalles_recursos:
                 recursos_data.append([
-                    recurso_det['nombre_recurso'],
-                    str(recurso_det['cantidad']),
-                    f"Q {recurso_det['valor_x_hora']:.2f}",
+                    recurso_det.nombre_recurso,
+                    str(recurso_det.cantidad),
+                    f"Q {recurso_det.valor_x_hora:.2f}",
                     f"{detalle.tiempo_consumido}",
-                    f"Q {recurso_det['costo']:.2f}"
+                    f"Q {recurso_det.costo:.2f}"
                 ])
             
             recursos_table = Table(recursos_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1*inch])
@@ -138,8 +151,30 @@ class PDFGenerator:
         doc.build(elements)
         return filepath
     
-    def generar_analisis_ventas(self, tipo_analisis, datos, rango_fechas, output_filename=None):
-        """Genera un PDF con análisis de ventas"""
+    def analisis_ventas_en_cache(self, tipo_analisis, rango_fechas, version_datos):
+        """Ruta del análisis de ventas ya generado con esa versión de los datos, o None; no calcula nada"""
+        if not self.cache:
+            return None
+        return self.cache.buscar(self._nombre_analisis_ventas(tipo_analisis, rango_fechas, version_datos, None))
+    
+    @staticmethod
+    def _nombre_analisis_ventas(tipo_analisis, rango_fechas, version_datos, datos):
+        """Nombre en caché de un análisis: tipo, rango de fechas y versión de los datos o, sin ella, su huella"""
+        huella = huella_contenido(tipo_analisis, rango_fechas, version_datos if version_datos is not None else datos)
+        return f"analisis_ventas_{tipo_analisis}_{huella[:16]}.pdf"
+    
+    def generar_analisis_ventas(self, tipo_analisis, datos, rango_fechas, output_filename=None, version_datos=None):
+        """Genera un PDF con análisis de ventas.
+        
+        Con `version_datos` (la etiqueta de versión de las colecciones de las que
+        salen los datos) el reporte se reconoce en la caché sin mirar los datos, y
+        analisis_ventas_en_cache permite buscarlo antes de calcularlos.
+        """
+        if output_filename is None and self.cache:
+            return self.cache.obtener(
+                self._nombre_analisis_ventas(tipo_analisis, rango_fechas, version_datos, datos),
+                lambda nombre: self.generar_analisis_ventas(tipo_analisis, datos, rango_fechas, nombre)
+            )
         if output_filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_filename = f"analisis_ventas_{tipo_analisis}_{timestamp}.pdf"
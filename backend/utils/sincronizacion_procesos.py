@@ -0,0 +1,68 @@
+import os
+import threading
+from contextlib import contextmanager
+from utils.bloqueo_archivo import BloqueoArchivo
+
+class SincronizadorProcesos:
+    """Coordina varios procesos servidores sobre el mismo directorio de datos.
+    
+    Cada proceso tiene su propia copia del sistema en memoria. Una escritura
+    toma el bloqueo del directorio, recarga lo que otros procesos hayan guardado,
+    aplica el cambio y lo guarda (subiendo el sello de versión de metadata.xml)
+    antes de soltarlo. Antes de atender una petición cada proceso compara ese
+    sello con el suyo y recarga solo las colecciones que cambiaron.
+    """
+    
+    def __init__(self, almacenamiento, base_path):
+        self.almacenamiento = almacenamiento  # XMLManager
+        self.bloqueo_archivo = BloqueoArchivo(base_path)
+        self.ruta_metadata = os.path.join(base_path, "metadata.xml")
+        self._candado = threading.Lock()  # Un solo hilo del proceso usa el bloqueo del archivo a la vez
+        self._firma_vista = None  # (inodo, mtime, tamaño) de la última metadata ya aplicada
+        self.recargas = 0
+        self.colecciones_recargadas = 0
+    
+    @contextmanager
+    def escritura(self):
+        """Bloqueo entre procesos (y entre hilos de este proceso) mientras dura el bloque"""
+        with self._candado:
+            self.bloqueo_archivo.adquirir(esperar=True)
+            try:
+                yield
+            finally:
+                self.bloqueo_archivo.liberar()
+    
+    def hay_version_nueva(self, sistema) -> bool:
+        """Indica si otro proceso guardó una versión más nueva que la del sistema.
+        
+        Solo lee metadata.xml si cambió desde la última vez (se reemplaza con un
+        rename, así que basta con comparar inodo, fecha y tamaño).
+        """
+        try:
+            estado = os.stat(self.ruta_metadata)
+        except FileNotFoundError:
+            return False
+        firma = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+        if firma == self._firma_vista:
+            return False
+        
+        if self.almacenamiento.cargar_metadata().get('version_datos', 0) > sistema.version_datos:
+            return True
+        self._firma_vista = firma
+        return False
+    
+    def recargar(self, sistema):
+        """Recarga en el sistema las colecciones que cambiaron; devuelve sus nombres"""
+        recargadas = self.almacenamiento.recargar_sistema(sistema)
+        if recargadas:
+            self.recargas += 1
+            self.colecciones_recargadas += len(recargadas)
+        return recargadas
+    
+    def estadisticas(self):
+        """Obtiene los contadores de recargas de este proceso"""
+        return {
+            'pid': os.getpid(),
+            'recargas': self.recargas,
+            'colecciones_recargadas': self.colecciones_recargadas
+        }
@@ -0,0 +1,406 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from models.sistema import COLECCIONES
+from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia, Factura, DetalleFactura, DetalleRecurso
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS recursos (
+    id INTEGER PRIMARY KEY, nombre TEXT, abreviatura TEXT, metrica TEXT, tipo TEXT, valor_x_hora REAL
+);
+CREATE TABLE IF NOT EXISTS categorias (
+    id INTEGER PRIMARY KEY, nombre TEXT, descripcion TEXT, carga_trabajo TEXT
+);
+CREATE TABLE IF NOT EXISTS configuraciones (
+    id INTEGER PRIMARY KEY, categoria_id INTEGER, posicion INTEGER, nombre TEXT, descripcion TEXT
+);
+CREATE TABLE IF NOT EXISTS configuracion_recursos (
+    configuracion_id INTEGER, recurso_id INTEGER, cantidad REAL,
+    PRIMARY KEY (configuracion_id, recurso_id)
+);
+CREATE TABLE IF NOT EXISTS clientes (
+    nit TEXT PRIMARY KEY, nombre TEXT, usuario TEXT, clave TEXT, direccion TEXT, correo_electronico TEXT
+);
+CREATE TABLE IF NOT EXISTS instancias (
+    id INTEGER PRIMARY KEY, nit_cliente TEXT, posicion INTEGER, id_configuracion INTEGER, nombre TEXT,
+    fecha_inicio TEXT, estado TEXT, fecha_final TEXT
+);
+CREATE TABLE IF NOT EXISTS consumos (
+    id INTEGER PRIMARY KEY, nit_cliente TEXT, id_instancia INTEGER, tiempo REAL, fechahora TEXT,
+    fecha_orden TEXT, facturado INTEGER
+);
+CREATE TABLE IF NOT EXISTS facturas (
+    numero TEXT PRIMARY KEY, nit_cliente TEXT, fecha TEXT, fecha_orden TEXT, monto_total REAL
+);
+CREATE TABLE IF NOT EXISTS detalles_factura (
+    numero_factura TEXT, posicion INTEGER, id_instancia INTEGER, nombre_instancia TEXT,
+    tiempo_consumido REAL, monto_instancia REAL,
+    PRIMARY KEY (numero_factura, posicion)
+);
+CREATE TABLE IF NOT EXISTS detalle_recursos (
+    numero_factura TEXT, posicion INTEGER, orden INTEGER, id_recurso INTEGER, nombre_recurso TEXT,
+    cantidad REAL, valor_x_hora REAL, costo REAL,
+    PRIMARY KEY (numero_factura, posicion, orden)
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    clave TEXT PRIMARY KEY, valor TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_instancias_nit ON instancias (nit_cliente);
+CREATE INDEX IF NOT EXISTS idx_consumos_nit ON consumos (nit_cliente);
+CREATE INDEX IF NOT EXISTS idx_consumos_instancia ON consumos (id_instancia);
+CREATE INDEX IF NOT EXISTS idx_consumos_fecha ON consumos (fecha_orden);
+CREATE INDEX IF NOT EXISTS idx_facturas_nit ON facturas (nit_cliente);
+CREATE INDEX IF NOT EXISTS idx_facturas_fecha ON facturas (fecha_orden);
+CREATE INDEX IF NOT EXISTS idx_detalles_instancia ON detalles_factura (id_instancia);
+"""
+
+# Tablas que componen cada colección y sus columnas de clave primaria
+TABLAS_POR_COLECCION = {
+    'recursos': {'recursos': ('id',)},
+    'categorias': {
+        'categorias': ('id',),
+        'configuraciones': ('id',),
+        'configuracion_recursos': ('configuracion_id', 'recurso_id'),
+    },
+    'clientes': {'clientes': ('nit',), 'instancias': ('id',)},
+    'consumos': {'consumos': ('id',)},
+    'facturas': {
+        'facturas': ('numero',),
+        'detalles_factura': ('numero_factura', 'posicion'),
+        'detalle_recursos': ('numero_factura', 'posicion', 'orden'),
+    },
+}
+
+# Filas hijas de cada entidad, que se reescriben completas cuando la entidad cambia
+HIJAS_POR_COLECCION = {
+    'recursos': (),
+    'categorias': (
+        "DELETE FROM configuracion_recursos WHERE configuracion_id IN (SELECT id FROM configuraciones WHERE categoria_id = ?)",
+        "DELETE FROM configuraciones WHERE categoria_id = ?",
+    ),
+    'clientes': ("DELETE FROM instancias WHERE nit_cliente = ?",),
+    'consumos': (),
+    'facturas': (
+        "DELETE FROM detalle_recursos WHERE numero_factura = ?",
+        "DELETE FROM detalles_factura WHERE numero_factura = ?",
+    ),
+}
+
+SINCRONIZACION_POR_FSYNC = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+def _fecha_orden(texto: str) -> str:
+    """Convierte 'dd/mm/yyyy[ hh:mm]' a 'yyyy-mm-dd[ hh:mm]' para ordenar e indexar por fecha"""
+    if not texto or len(texto) < 10:
+        return texto
+    return f"{texto[6:10]}-{texto[3:5]}-{texto[0:2]}{texto[10:]}"
+
+class SQLiteManager:
+    """Almacenamiento en SQLite (modo WAL) con el mismo contrato que XMLManager.
+    
+    Solo se escriben las entidades que el sistema marcó como modificadas (upsert
+    por clave primaria, reescribiendo sus filas hijas), así que un guardado
+    cuesta lo que cambió y no el tamaño de la colección. Las colecciones marcadas
+    completas (sistema nuevo, guardado completo) se comparan con lo que hay en
+    la base de datos dentro de la misma transacción.
+    """
+    
+    def __init__(self, base_path="database", nombre_archivo="sistema.db", politica_fsync="never"):
+        self.base_path = base_path
+        if not os.path.exists(self.base_path):
+            os.makedirs(self.base_path)
+        self.ruta = os.path.join(base_path, nombre_archivo)
+        self._candado = threading.Lock()
+        self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute(f"PRAGMA synchronous={SINCRONIZACION_POR_FSYNC.get(politica_fsync, 'NORMAL')}")
+        self.conexion.executescript(ESQUEMA)
+        
+        self.guardados = 0
+        self.filas_escritas = 0
+        self.filas_eliminadas = 0
+        self.ultimo_guardado = {'filas': 0, 'eliminadas': 0, 'colecciones': []}
+    
+    def guardar_sistema(self, sistema: Sistema, completo: bool = False):
+        """Sincroniza con la base de datos lo modificado desde el último guardado"""
+        modificaciones = sistema.extraer_modificaciones()
+        if completo:
+            modificaciones = dict.fromkeys(COLECCIONES)
+        
+        with self._candado:
+            try:
+                with self.conexion:
+                    filas = 0
+                    eliminadas = 0
+                    escritas = []
+                    for coleccion in COLECCIONES:
+                        if coleccion not in modificaciones:
+                            continue
+                        claves = modificaciones[coleccion]
+                        if claves is None:
+                            escritas_coleccion, eliminadas_coleccion = self._sincronizar_coleccion(sistema, coleccion)
+                        else:
+                            escritas_coleccion, eliminadas_coleccion = self._sincronizar_entidades(sistema, coleccion, claves)
+                        filas += escritas_coleccion
+                        eliminadas += eliminadas_coleccion
+                        escritas.append(coleccion)
+                    self._guardar_metadata(sistema)
+            except Exception:
+                # La transacción se revirtió: lo extraído vuelve a quedar pendiente
+                sistema.restaurar_modificaciones(modificaciones)
+                raise
+        
+        self.guardados += 1
+        self.filas_escritas += filas
+        self.filas_eliminadas += eliminadas
+        self.ultimo_guardado = {'filas': filas, 'eliminadas': eliminadas, 'colecciones': escritas}
+    
+    def estadisticas(self):
+        """Obtiene los contadores de escritura acumulados"""
+        return {
+            'almacenamiento': 'sqlite',
+            'guardados': self.guardados,
+            'filas_escritas': self.filas_escritas,
+            'filas_eliminadas': self.filas_eliminadas,
+            'ultimo_guardado': self.ultimo_guardado
+        }
+    
+    def _sincronizar_coleccion(self, sistema: Sistema, coleccion: str):
+        """Escribe una colección completa y elimina de la base de datos las filas que ya no existen"""
+        escritas = 0
+        eliminadas = 0
+        for tabla, filas_tabla in self._filas_coleccion(coleccion, getattr(sistema, coleccion)).items():
+            claves = TABLAS_POR_COLECCION[coleccion][tabla]
+            escritas += self._upsert(tabla, claves, filas_tabla.values())
+            sobrantes = [
+                clave for clave in self.conexion.execute(f"SELECT {', '.join(claves)} FROM {tabla}")
+                if clave not in filas_tabla
+            ]
+            if sobrantes:
+                condicion = " AND ".join(f"{c} = ?" for c in claves)
+                self.conexion.executemany(f"DELETE FROM {tabla} WHERE {condicion}", sobrantes)
+                eliminadas += len(sobrantes)
+        return escritas, eliminadas
+    
+    def _sincronizar_entidades(self, sistema: Sistema, coleccion: str, claves):
+        """Reescribe las entidades modificadas de una colección y elimina las que ya no existen"""
+        eliminadas = 0
+        if coleccion == 'consumos':
+            # Las claves son filas del almacén; los consumos no se eliminan ni tienen filas hijas
+            entidades = [sistema.consumos.vista(fila) for fila in claves]
+        else:
+            buscar = {
+                'recursos': sistema.obtener_recurso_por_id,
+                'categorias': sistema.obtener_categoria_por_id,
+                'clientes': sistema.obtener_cliente_por_nit,
+                'facturas': sistema.obtener_factura_por_numero,
+            }[coleccion]
+            tabla_entidad, (columna_clave,) = next(iter(TABLAS_POR_COLECCION[coleccion].items()))
+            entidades = []
+            for clave in claves:
+                entidad = buscar(clave)
+                borradas = sum(self.conexion.execute(sql, (clave,)).rowcount for sql in HIJAS_POR_COLECCION[coleccion])
+                if entidad is not None:
+                    entidades.append(entidad)
+                else:
+                    borradas += self.conexion.execute(
+                        f"DELETE FROM {tabla_entidad} WHERE {columna_clave} = ?", (clave,)
+                    ).rowcount
+                    eliminadas += borradas
+        
+        escritas = 0
+        for tabla, filas_tabla in self._filas_coleccion(coleccion, entidades).items():
+            escritas += self._upsert(tabla, TABLAS_POR_COLECCION[coleccion][tabla], filas_tabla.values())
+        return escritas, eliminadas
+    
+    def _upsert(self, tabla: str, claves: tuple, filas) -> int:
+        """Inserta o actualiza filas por clave primaria y devuelve cuántas escribió"""
+        filas = list(filas)
+        if filas:
+            columnas = self._columnas(tabla)
+            no_claves = [c for c in columnas if c not in claves]
+            sql = (
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)}) "
+                f"ON CONFLICT ({', '.join(claves)}) DO UPDATE SET "
+                + ", ".join(f"{c} = excluded.{c}" for c in no_claves)
+            )
+            self.conexion.executemany(sql, filas)
+        return len(filas)
+    
+    def _columnas(self, tabla: str):
+        """Obtiene las columnas de una tabla en orden"""
+        return [fila[1] for fila in self.conexion.execute(f"PRAGMA table_info({tabla})")]
+    
+    def _filas_coleccion(self, coleccion: str, entidades):
+        """Construye las filas de cada tabla para entidades de una colección: {tabla: {clave: fila}}"""
+        if coleccion == 'recursos':
+            return {'recursos': {
+                (r.id,): (r.id, r.nombre, r.abreviatura, r.metrica, r.tipo, r.valor_x_hora)
+                for r in entidades
+            }}
+        
+        if coleccion == 'categorias':
+            categorias, configuraciones, recursos_config = {}, {}, {}
+            for categoria in entidades:
+                categorias[(categoria.id,)] = (categoria.id, categoria.nombre, categoria.descripcion, categoria.carga_trabajo)
+                for posicion, config in enumerate(categoria.configuraciones):
+                    configuraciones[(config.id,)] = (config.id, categoria.id, posicion, config.nombre, config.descripcion)
+                    for recurso_id, cantidad in config.recursos.items():
+                        recursos_config[(config.id, recurso_id)] = (config.id, recurso_id, cantidad)
+            return {'categorias': categorias, 'configuraciones': configuraciones, 'configuracion_recursos': recursos_config}
+        
+        if coleccion == 'clientes':
+            clientes, instancias = {}, {}
+            for cliente in entidades:
+                clientes[(cliente.nit,)] = (
+                    cliente.nit, cliente.nombre, cliente.usuario, cliente.clave, cliente.direccion, cliente.correo_electronico
+                )
+                for posicion, instancia in enumerate(cliente.instancias):
+                    instancias[(instancia.id,)] = (
+                        instancia.id, cliente.nit, posicion, instancia.id_configuracion, instancia.nombre,
+                        instancia.fecha_inicio, instancia.estado, instancia.fecha_final
+                    )
+            return {'clientes': clientes, 'instancias': instancias}
+        
+        if coleccion == 'consumos':
+            return {'consumos': {
+                (c.id,): (c.id, c.nit_cliente, c.id_instancia, c.tiempo, c.fechahora, _fecha_orden(c.fechahora), int(c.facturado))
+                for c in entidades
+            }}
+        
+        facturas, detalles, detalle_recursos = {}, {}, {}
+        for factura in entidades:
+            numero = factura.numero_factura
+            facturas[(numero,)] = (numero, factura.nit_cliente, factura.fecha, _fecha_orden(factura.fecha), factura.monto_total)
+            for posicion, detalle in enumerate(factura.detalles):
+                detalles[(numero, posicion)] = (
+                    numero, posicion, detalle.id_instancia, detalle.nombre_instancia,
+                    detalle.tiempo_consumido, detalle.monto_instancia
+                )
+                for orden, recurso_det in enumerate(detalle.detalles_recursos):
+                    detalle_recursos[(numero, posicion, orden)] = (
+                        numero, posicion, orden, recurso_det.id_recurso, recurso_det.nombre_recurso,
+                        recurso_det.cantidad, recurso_det.valor_x_hora, recurso_det.costo
+                    )
+        return {'facturas': facturas, 'detalles_factura': detalles, 'detalle_recursos': detalle_recursos}
+    
+    def _guardar_metadata(self, sistema: Sistema):
+        """Guarda metadatos del sistema"""
+        valores = [
+            ('proximo_id_factura', str(sistema.proximo_id_factura)),
+            ('proximo_id_consumo', str(sistema.proximo_id_consumo)),
+            ('ultima_secuencia_journal', str(sistema.ultima_secuencia_journal)),
+            ('ultima_actualizacion', datetime.now().strftime("%d/%m/%Y %H:%M")),
+        ]
+        self.conexion.executemany(
+            "INSERT INTO metadata (clave, valor) VALUES (?, ?) ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+            valores
+        )
+    
+    def cargar_sistema(self) -> Sistema:
+        """Carga todo el sistema desde la base de datos"""
+        sistema = Sistema()
+        con = self.conexion
+        
+        with self._candado:
+            for fila in con.execute("SELECT id, nombre, abreviatura, metrica, tipo, valor_x_hora FROM recursos ORDER BY rowid"):
+                sistema.recursos.append(Recurso(*fila))
+            
+            categorias = {}
+            for fila in con.execute("SELECT id, nombre, descripcion, carga_trabajo FROM categorias ORDER BY rowid"):
+                categoria = Categoria(*fila)
+                categorias[categoria.id] = categoria
+                sistema.categorias.append(categoria)
+            
+            configuraciones = {}
+            for config_id, categoria_id, _, nombre, descripcion in con.execute(
+                "SELECT id, categoria_id, posicion, nombre, descripcion FROM configuraciones ORDER BY categoria_id, posicion"
+            ):
+                config = Configuracion(config_id, nombre, descripcion)
+                configuraciones[config_id] = config
+                if categoria_id in categorias:
+                    categorias[categoria_id].agregar_configuracion(config)
+            for config_id, recurso_id, cantidad in con.execute(
+                "SELECT configuracion_id, recurso_id, cantidad FROM configuracion_recursos ORDER BY rowid"
+            ):
+                if config_id in configuraciones:
+                    configuraciones[config_id].agregar_recurso(recurso_id, cantidad)
+            
+            clientes = {}
+            for fila in con.execute(
+                "SELECT nit, nombre, usuario, clave, direccion, correo_electronico FROM clientes ORDER BY rowid"
+            ):
+                cliente = Cliente(*fila)
+                clientes[cliente.nit] = cliente
+                sistema.clientes.append(cliente)
+            for instancia_id, nit, _, id_configuracion, nombre, fecha_inicio, estado, fecha_final in con.execute(
+                "SELECT id, nit_cliente, posicion, id_configuracion, nombre, fecha_inicio, estado, fecha_final "
+                "FROM instancias ORDER BY nit_cliente, posicion"
+            ):
+                if nit in clientes:
+                    clientes[nit].agregar_instancia(
+                        Instancia(instancia_id, id_configuracion, nombre, fecha_inicio, estado, fecha_final)
+                    )
+            
+            for consumo_id, nit, id_instancia, tiempo, fechahora, facturado in con.execute(
+                "SELECT id, nit_cliente, id_instancia, tiempo, fechahora, facturado FROM consumos ORDER BY id"
+            ):
+                sistema.consumos.agregar(consumo_id, nit, id_instancia, tiempo, fechahora, bool(facturado))
+            
+            facturas = {}
+            for numero, nit, fecha, monto_total in con.execute(
+                "SELECT numero, nit_cliente, fecha, monto_total FROM facturas ORDER BY rowid"
+            ):
+                factura = Factura(numero, nit, fecha, monto_total)
+                facturas[numero] = factura
+                sistema.facturas.append(factura)
+            recursos_por_detalle = {}
+            for numero, posicion, _, id_recurso, nombre_recurso, cantidad, valor_x_hora, costo in con.execute(
+                "SELECT numero_factura, posicion, orden, id_recurso, nombre_recurso, cantidad, valor_x_hora, costo "
+                "FROM detalle_recursos ORDER BY numero_factura, posicion, orden"
+            ):
+                recursos_por_detalle.setdefault((numero, posicion), []).append(
+                    DetalleRecurso(id_recurso, nombre_recurso, cantidad, valor_x_hora, costo)
+                )
+            for numero, posicion, id_instancia, nombre_instancia, tiempo_consumido, monto_instancia in con.execute(
+                "SELECT numero_factura, posicion, id_instancia, nombre_instancia, tiempo_consumido, monto_instancia "
+                "FROM detalles_factura ORDER BY numero_factura, posicion"
+            ):
+                if numero in facturas:
+                    facturas[numero].agregar_detalle(DetalleFactura(
+                        id_instancia, nombre_instancia, tiempo_consumido, monto_instancia,
+                        recursos_por_detalle.get((numero, posicion), [])
+                    ))
+            
+            metadata = dict(con.execute("SELECT clave, valor FROM metadata"))
+            sistema.proximo_id_factura = int(metadata.get('proximo_id_factura', 1))
+            sistema.proximo_id_consumo = int(metadata.get('proximo_id_consumo', 1))
+            sistema.ultima_secuencia_journal = int(metadata.get('ultima_secuencia_journal', 0))
+        
+        sistema.reconstruir_indices()
+        # Lo recién cargado ya coincide con la base de datos
+        sistema.extraer_modificaciones()
+        return sistema
+    
+    def cerrar(self):
+        """Cierra la conexión a la base de datos"""
+        with self._candado:
+            self.conexion.close()
+
+def migrar_desde_xml(base_path="database", nombre_archivo="sistema.db") -> SQLiteManager:
+    """Migra de una sola vez los archivos XML existentes a la base de datos SQLite"""
+    from utils.xml_manager import XMLManager
+    
+    sistema = XMLManager(base_path).cargar_sistema()
+    sqlite_manager = SQLiteManager(base_path, nombre_archivo)
+    # El guardado completo también elimina las filas que ya no están en los XML
+    sqlite_manager.guardar_sistema(sistema, completo=True)
+    return sqlite_manager
+
+if __name__ == '__main__':
+    import sys
+    
+    ruta = sys.argv[1] if len(sys.argv) > 1 else "database"
+    manager = migrar_desde_xml(ruta)
+    print(f"Migración completada en {manager.ruta}: {manager.ultimo_guardado['filas']} filas escritas")
+    manager.cerrar()
@@ -26,7 +26,14 @@ class Validador:
             return None
         patron = r'\b(\d{2}/\d{2}/\d{4} \d{2}:\d{2})\b'
         match = re.search(patron, texto)
-        return match.group(1) if match else None
+        if not match:
+            return None
+        # El patrón acepta fechas que no existen (31/02/2024, 10:75); esas no se pueden ubicar en el tiempo
+        try:
+            datetime.strptime(match.group(1), "%d/%m/%Y %H:%M")
+        except ValueError:
+            return None
+        return match.group(1)
     
     @staticmethod
     def validar_estado_instancia(estado: str) -> bool:
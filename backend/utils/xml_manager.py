@@ -1,26 +1,134 @@
 import xml.etree.ElementTree as ET
+import io
 import os
+import time
 from datetime import datetime
-from models import Sistema, Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, DetalleFactura
+from models.sistema import COLECCIONES
+from models import Sistema, AlmacenConsumos, Recurso, Categoria, Configuracion, Cliente, Instancia, Consumo, Factura, DetalleFactura, DetalleRecurso
+
+POLITICAS_FSYNC = ("always", "interval", "never")
 
 class XMLManager:
-    def __init__(self, base_path="database"):
+    def __init__(self, base_path="database", politica_fsync="never", intervalo_fsync=1.0):
+        if politica_fsync not in POLITICAS_FSYNC:
+            raise ValueError(f"Política de fsync inválida: {politica_fsync}")
         self.base_path = base_path
+        self.politica_fsync = politica_fsync
+        self.intervalo_fsync = intervalo_fsync  # Segundos entre fsync con la política "interval"
+        self._ultimo_fsync = 0.0
+        self._fsync_guardado = None  # Decisión de fsync del guardado en curso (None fuera de guardar_sistema)
         self.ensure_directory_exists()
+        
+        # Contadores de escritura para medir el I/O de cada guardado
+        self.guardados = 0
+        self.archivos_escritos = 0
+        self.bytes_escritos = 0
+        self.ultimo_guardado = {'archivos': 0, 'bytes': 0, 'colecciones': []}
     
     def ensure_directory_exists(self):
         """Asegura que el directorio de base de datos exista"""
         if not os.path.exists(self.base_path):
             os.makedirs(self.base_path)
     
-    def guardar_sistema(self, sistema: Sistema):
-        """Guarda todo el sistema en archivos XML"""
-        self.guardar_recursos(sistema.recursos)
-        self.guardar_categorias(sistema.categorias)
-        self.guardar_clientes(sistema.clientes)
-        self.guardar_consumos(sistema.consumos)
-        self.guardar_facturas(sistema.facturas)
-        self.guardar_metadata(sistema)
+    def guardar_sistema(self, sistema: Sistema, completo: bool = False):
+        """Guarda en archivos XML las colecciones modificadas desde el último guardado"""
+        modificadas = sistema.extraer_colecciones_modificadas()
+        if completo:
+            modificadas = set(COLECCIONES)
+        
+        guardadores = {
+            'recursos': lambda: self.guardar_recursos(sistema.recursos),
+            'categorias': lambda: self.guardar_categorias(sistema.categorias),
+            'clientes': lambda: self.guardar_clientes(sistema.clientes),
+            'consumos': lambda: self.guardar_consumos(sistema.consumos),
+            'facturas': lambda: self.guardar_facturas(sistema.facturas),
+        }
+        
+        # Sello de versión: metadata.xml se escribe al final, así que quien lea una versión
+        # nueva encuentra ya escritos los archivos de las colecciones que cambiaron
+        if modificadas:
+            sistema.version_datos += 1
+            for coleccion in modificadas:
+                sistema.versiones_datos[coleccion] = sistema.version_datos
+        
+        archivos = 0
+        bytes_totales = 0
+        escritas = []
+        # La política se aplica al guardado completo: todos sus archivos (metadata.xml incluido) o ninguno
+        self._fsync_guardado = self._debe_fsync()
+        try:
+            for coleccion in COLECCIONES:
+                if coleccion in modificadas:
+                    bytes_totales += guardadores[coleccion]()
+                    archivos += 1
+                    escritas.append(coleccion)
+            bytes_totales += self.guardar_metadata(sistema)
+            archivos += 1
+            if self._fsync_guardado:
+                self._fsync_directorio()
+        except Exception:
+            # Lo no escrito debe volver a intentarse en el siguiente guardado
+            for coleccion in modificadas:
+                if coleccion not in escritas:
+                    sistema.marcar_modificada(coleccion)
+            raise
+        finally:
+            self._fsync_guardado = None
+        sistema.versiones_selladas(escritas)
+        
+        self.guardados += 1
+        self.archivos_escritos += archivos
+        self.bytes_escritos += bytes_totales
+        self.ultimo_guardado = {'archivos': archivos, 'bytes': bytes_totales, 'colecciones': escritas}
+    
+    def estadisticas(self):
+        """Obtiene los contadores de escritura acumulados"""
+        return {
+            'guardados': self.guardados,
+            'archivos_escritos': self.archivos_escritos,
+            'bytes_escritos': self.bytes_escritos,
+            'ultimo_guardado': self.ultimo_guardado
+        }
+    
+    def _escribir_xml(self, root, nombre_archivo: str) -> int:
+        """Escribe un árbol XML de forma atómica (archivo temporal y rename) y devuelve los bytes escritos"""
+        ruta = f"{self.base_path}/{nombre_archivo}"
+        ruta_temporal = f"{ruta}.tmp"
+        sincronizar = self._fsync_guardado
+        if sincronizar is None:
+            sincronizar = self._debe_fsync()
+        # Se serializa en memoria y se escribe de una vez: escribir por bloques suelta el GIL en
+        # cada llamada al sistema y, con hilos lectores ocupados, cada una espera su turno
+        contenido = io.BytesIO()
+        ET.ElementTree(root).write(contenido, encoding="utf-8", xml_declaration=True)
+        with open(ruta_temporal, "wb") as archivo:
+            archivo.write(contenido.getbuffer())
+            archivo.flush()
+            if sincronizar:
+                os.fsync(archivo.fileno())
+        os.replace(ruta_temporal, ruta)
+        return contenido.getbuffer().nbytes
+    
+    def _fsync_directorio(self):
+        """Sincroniza el directorio para que los renames del guardado sobrevivan a una caída"""
+        if os.name == 'nt':
+            return  # En Windows no se puede abrir un directorio para sincronizarlo
+        descriptor = os.open(self.base_path, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+    
+    def _debe_fsync(self) -> bool:
+        """Decide si la escritura actual debe sincronizarse a disco según la política"""
+        if self.politica_fsync == "always":
+            return True
+        if self.politica_fsync == "interval":
+            ahora = time.monotonic()
+            if ahora - self._ultimo_fsync >= self.intervalo_fsync:
+                self._ultimo_fsync = ahora
+                return True
+        return False
     
     def cargar_sistema(self) -> Sistema:
         """Carga todo el sistema desde archivos XML"""
@@ -32,14 +140,53 @@ class XMLManager:
         sistema.clientes = self.cargar_clientes()
         sistema.consumos = self.cargar_consumos()
         sistema.facturas = self.cargar_facturas()
+        sistema.reconstruir_indices()
         
         # Cargar metadata
         metadata = self.cargar_metadata()
         sistema.proximo_id_factura = metadata.get('proximo_id_factura', 1)
         sistema.proximo_id_consumo = metadata.get('proximo_id_consumo', 1)
+        sistema.ultima_secuencia_journal = metadata.get('ultima_secuencia_journal', 0)
+        sistema.version_datos = metadata.get('version_datos', 0)
+        sistema.versiones_datos.update(metadata.get('versiones_datos', {}))
+        sistema.generacion_datos = metadata.get('generacion_datos', sistema.generacion_datos)
+        
+        # Lo recién cargado ya coincide con los archivos
+        sistema.extraer_colecciones_modificadas()
         
         return sistema
     
+    def recargar_sistema(self, sistema: Sistema):
+        """Recarga en el sistema solo las colecciones que otro proceso guardó después de su
+        versión; devuelve la lista de colecciones recargadas"""
+        metadata = self.cargar_metadata()
+        version = metadata.get('version_datos', 0)
+        if version <= sistema.version_datos:
+            return []
+        
+        versiones = metadata.get('versiones_datos', {})
+        cargadores = {
+            'recursos': self.cargar_recursos,
+            'categorias': lambda: self.cargar_categorias(sistema),
+            'clientes': self.cargar_clientes,
+            'consumos': self.cargar_consumos,
+            'facturas': self.cargar_facturas,
+        }
+        recargadas = [
+            coleccion for coleccion in COLECCIONES
+            if versiones.get(coleccion, version) > sistema.versiones_datos[coleccion]
+        ]
+        for coleccion in recargadas:
+            setattr(sistema, coleccion, cargadores[coleccion]())
+        
+        sistema.proximo_id_factura = metadata.get('proximo_id_factura', sistema.proximo_id_factura)
+        sistema.proximo_id_consumo = metadata.get('proximo_id_consumo', sistema.proximo_id_consumo)
+        sistema.version_datos = version
+        sistema.versiones_datos.update(versiones)
+        sistema.generacion_datos = metadata.get('generacion_datos', sistema.generacion_datos)
+        sistema.colecciones_recargadas(recargadas)
+        return recargadas
+    
     def guardar_recursos(self, recursos):
         """Guarda los recursos en XML"""
         root = ET.Element("recursos")
@@ -53,8 +200,7 @@ class XMLManager:
             ET.SubElement(recurso_elem, "tipo").text = recurso.tipo
             ET.SubElement(recurso_elem, "valorXhora").text = str(recurso.valor_x_hora)
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/recursos.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "recursos.xml")
     
     def cargar_recursos(self):
         """Carga los recursos desde XML"""
@@ -103,8 +249,7 @@ class XMLManager:
                     recurso_config_elem.set("id", str(recurso_id))
                     recurso_config_elem.text = str(cantidad)
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/categorias.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "categorias.xml")
     
     def cargar_categorias(self, sistema: Sistema):
         """Carga las categorías desde XML"""
@@ -171,8 +316,7 @@ class XMLManager:
                 if instancia.fecha_final:
                     ET.SubElement(instancia_elem, "fechaFinal").text = instancia.fecha_final
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/clientes.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "clientes.xml")
     
     def cargar_clientes(self):
         """Carga los clientes desde XML"""
@@ -227,8 +371,7 @@ class XMLManager:
             ET.SubElement(consumo_elem, "tiempo").text = str(consumo.tiempo)
             ET.SubElement(consumo_elem, "fechahora").text = consumo.fechahora
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/consumos.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "consumos.xml")
     
     def cargar_consumos(self):
         """Carga los consumos desde XML"""
@@ -236,9 +379,9 @@ class XMLManager:
             tree = ET.parse(f"{self.base_path}/consumos.xml")
             root = tree.getroot()
             
-            consumos = []
+            consumos = AlmacenConsumos()
             for consumo_elem in root.findall("consumo"):
-                consumo = Consumo(
+                consumos.agregar(
                     id=int(consumo_elem.get("id")),
                     nit_cliente=consumo_elem.get("nitCliente"),
                     id_instancia=int(consumo_elem.get("idInstancia")),
@@ -246,11 +389,10 @@ class XMLManager:
                     fechahora=consumo_elem.find("fechahora").text,
                     facturado=consumo_elem.get("facturado", "false").lower() == "true"
                 )
-                consumos.append(consumo)
             
             return consumos
         except (FileNotFoundError, ET.ParseError):
-            return []
+            return AlmacenConsumos()
     
     def guardar_facturas(self, facturas):
         """Guarda las facturas en XML"""
@@ -273,14 +415,13 @@ class XMLManager:
                 recursos_elem = ET.SubElement(detalle_elem, "recursos")
                 for recurso_det in detalle.detalles_recursos:
                     recurso_det_elem = ET.SubElement(recursos_elem, "recurso")
-                    recurso_det_elem.set("id", str(recurso_det['id_recurso']))
-                    recurso_det_elem.set("nombre", recurso_det['nombre_recurso'])
-                    recurso_det_elem.set("cantidad", str(recurso_det['cantidad']))
-                    recurso_det_elem.set("valorXhora", str(recurso_det['valor_x_hora']))
-                    recurso_det_elem.set("costo", str(recurso_det['costo']))
+                    recurso_det_elem.set("id", str(recurso_det.id_recurso))
+                    recurso_det_elem.set("nombre", recurso_det.nombre_recurso)
+                    recurso_det_elem.set("cantidad", str(recurso_det.cantidad))
+                    recurso_det_elem.set("valorXhora", str(recurso_det.valor_x_hora))
+                    recurso_det_elem.set("costo", str(recurso_det.costo))
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/facturas.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "facturas.xml")
     
     def cargar_facturas(self):
         """Carga las facturas desde XML"""
@@ -304,13 +445,13 @@ class XMLManager:
                         recursos_elem = detalle_elem.find("recursos")
                         if recursos_elem is not None:
                             for recurso_elem in recursos_elem.findall("recurso"):
-                                recurso_det = {
-                                    'id_recurso': int(recurso_elem.get("id")),
-                                    'nombre_recurso': recurso_elem.get("nombre"),
-                                    'cantidad': float(recurso_elem.get("cantidad")),
-                                    'valor_x_hora': float(recurso_elem.get("valorXhora")),
-                                    'costo': float(recurso_elem.get("costo"))
-                                }
+                                recurso_det = DetalleRecurso(
+                                    id_recurso=int(recurso_elem.get("id")),
+                                    nombre_recurso=recurso_elem.get("nombre"),
+                                    cantidad=float(recurso_elem.get("cantidad")),
+                                    valor_x_hora=float(recurso_elem.get("valorXhora")),
+                                    costo=float(recurso_elem.get("costo"))
+                                )
                                 detalles_recursos.append(recurso_det)
                         
                         detalle = DetalleFactura(
@@ -333,10 +474,15 @@ class XMLManager:
         root = ET.Element("metadata")
         ET.SubElement(root, "proximoIdFactura").text = str(sistema.proximo_id_factura)
         ET.SubElement(root, "proximoIdConsumo").text = str(sistema.proximo_id_consumo)
+        ET.SubElement(root, "ultimaSecuenciaJournal").text = str(sistema.ultima_secuencia_journal)
+        ET.SubElement(root, "versionDatos").text = str(sistema.version_datos)
+        ET.SubElement(root, "generacionDatos").text = sistema.generacion_datos
+        versiones_elem = ET.SubElement(root, "versionesColecciones")
+        for coleccion in COLECCIONES:
+            ET.SubElement(versiones_elem, coleccion).text = str(sistema.versiones_datos[coleccion])
         ET.SubElement(root, "ultimaActualizacion").text = datetime.now().strftime("%d/%m/%Y %H:%M")
         
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.base_path}/metadata.xml", encoding="utf-8", xml_declaration=True)
+        return self._escribir_xml(root, "metadata.xml")
     
     def cargar_metadata(self):
         """Carga metadatos del sistema"""
@@ -353,6 +499,22 @@ class XMLManager:
             if proximo_id_consumo is not None:
                 metadata['proximo_id_consumo'] = int(proximo_id_consumo.text)
             
+            ultima_secuencia_journal = root.find("ultimaSecuenciaJournal")
+            if ultima_secuencia_journal is not None:
+                metadata['ultima_secuencia_journal'] = int(ultima_secuencia_journal.text)
+            
+            version_datos = root.find("versionDatos")
+            if version_datos is not None:
+                metadata['version_datos'] = int(version_datos.text)
+            
+            versiones_elem = root.find("versionesColecciones")
+            if versiones_elem is not None:
+                metadata['versiones_datos'] = {elem.tag: int(elem.text) for elem in versiones_elem}
+            
+            generacion_datos = root.find("generacionDatos")
+            if generacion_datos is not None and generacion_datos.text:
+                metadata['generacion_datos'] = generacion_datos.text
+            
             return metadata
         except (FileNotFoundError, ET.ParseError):
             return {'proximo_id_factura': 1, 'proximo_id_consumo': 1}
\ No newline at end of file